@@ -1,23 +1,139 @@
 import streamlit as st
 import pandas as pd
 from strategies import apply_selected_indicators
-from utils import load_stock_data  # assume you have a function to load data
-from visualizer import plot_price_with_indicators, plot_volume, plot_rsi, plot_macd, plot_atr, plot_bbands, plot_ema, plot_obv, plot_stoch, plot_cumulative_return, plot_drawdown
-from signals import generate_signals
-from performance import calculate_performance, plot_win_rate, calculate_pnl
+from cache import IndicatorCache
+from utils import CachedBarLoader
+from visualizer import plot_price_with_indicators, plot_volume, plot_rsi, plot_macd, plot_atr, plot_bbands, plot_ema, plot_obv, plot_stoch, plot_cumulative_return, plot_drawdown, plot_win_rate, plot_strategy_equity
+from signals import generate_signals, STRATEGY_NAMES
+from performance import BacktestResult, calculate_pnl
+from compare import compare_strategies, indicator_superset, summary_table
+from resample import BarPyramid
+import profiling
 import io
+import json
+import hashlib
 
 st.title("📈 Hybrid Financial Analyst")
 
+# Diagnostics: time every pipeline stage that runs during this rerun
+stale = profiling.active()
+if stale is not None:
+    # A previous rerun stopped early (st.stop or an error) while recording
+    stale.stop()
+
+run_recorder = None
+with st.sidebar:
+    if st.toggle("🩺 Diagnostics", key="diagnostics"):
+        track_memory = st.checkbox("Track allocations (slower)", key="diagnostics_memory")
+        profiler = st.selectbox("Profiler", ["Off", "cprofile", "pyinstrument"], key="diagnostics_profiler")
+        try:
+            run_recorder = profiling.Recorder(memory=track_memory, profile=None if profiler == "Off" else profiler)
+            run_recorder.start()
+        except ValueError as e:
+            st.error(str(e))
+            run_recorder = profiling.Recorder(memory=track_memory).start()
+
+
+def show_chart(fig):
+    # Serialising a figure for the browser is part of its cost
+    with profiling.span("app.show_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
+
+@st.cache_resource
+def get_indicator_cache():
+    # Shared across reruns so unchanged indicators aren't recomputed
+    return IndicatorCache(max_bytes=256 * 1024**2)
+
+
+@st.cache_resource
+def get_bar_loader():
+    # Bars are cached on disk; reruns only hit Yahoo for ranges not fetched yet
+    return CachedBarLoader(root="data/cache")
+
+
+# Pipeline stages. Each is cached on the hashable arguments that determine
+# it (underscored arguments are passed along but not hashed), so a widget
+# change only recomputes the stages downstream of it. Results are shared
+# between sessions and must be treated as read-only.
+
+@st.cache_resource(ttl=15 * 60, max_entries=8)
+def load_data(source, _csv_bytes=None):
+    if _csv_bytes is not None:
+        return pd.read_csv(io.BytesIO(_csv_bytes))
+    return get_bar_loader().load("BTC-USD", start="2022-01-01")  # fallback or sample
+
+
+@st.cache_resource(max_entries=8)
+def get_bar_pyramid(source, _df):
+    # Zoom levels for the price chart, aggregated once per data source
+    return BarPyramid(_df)
+
+
+@st.cache_resource(max_entries=32)
+def compute_indicators(source, indicators, params_json, _df):
+    if not indicators:
+        return _df
+    return apply_selected_indicators(_df.copy(), list(indicators), json.loads(params_json), cache=get_indicator_cache())
+
+
+@st.cache_resource(max_entries=64)
+def compute_signals(source, indicators, params_json, strategy, _df):
+    return generate_signals(_df, strategy_name=strategy)
+
+
+@st.cache_resource(max_entries=64)
+def compute_backtest(source, indicators, params_json, strategy, _df, _signals):
+    buy_signals = _signals[_signals['Signal'] == 'Buy']
+    sell_signals = _signals[_signals['Signal'] == 'Sell']
+    if buy_signals.empty or sell_signals.empty:
+        return pd.DataFrame(), None
+
+    trades_df = calculate_pnl(_df, {'Buy': buy_signals, 'Sell': sell_signals})
+    result = BacktestResult(_df, trades_df) if not trades_df.empty else None
+    return trades_df, result
+
+
+@st.cache_resource(max_entries=8)
+def compute_comparison(source, params_json, _df):
+    # The indicators every strategy reads, once, then all strategies in one backtest pass
+    indicators = tuple(indicator_superset())
+    return compare_strategies(compute_indicators(source, indicators, params_json, _df=_df))
+
+
+def data_key(source, df):
+    # load_data's ttl can hand back newer bars for the same source, so stages are keyed on the bars they get
+    if df.empty:
+        return f"{source}#empty"
+    last = df.iloc[-1]
+    return f"{source}#{len(df)}:{last.get('Date', '')}:{last.get('Close', '')}"
+
+
+@st.cache_data(max_entries=16)
+def trade_log_csv(source, indicators, params_json, strategy, _trades_df):
+    return _trades_df.to_csv(index=False)
+
+
 # Load user CSV or example
 uploaded = st.file_uploader("Upload OHLCV CSV", type="csv")
 if uploaded:
-    df = pd.read_csv(uploaded)
+    csv_bytes = uploaded.getvalue()
+    source = f"upload:{hashlib.md5(csv_bytes).hexdigest()}"
+    df = load_data(source, _csv_bytes=csv_bytes)
 else:
-    df = load_stock_data("BTC-USD")  # fallback or sample
+    source = "sample:BTC-USD"
+    try:
+        df = load_data(source)
+    except Exception as e:
+        st.error(f"❌ Could not load sample data: {e}")
+        st.stop()
 
-if "df_with_indicators" not in st.session_state:
-    st.session_state.df_with_indicators = df.copy()
+if st.session_state.get("indicator_source") != source:
+    # New data: start again from the raw bars
+    st.session_state.indicator_source = source
+    st.session_state.indicator_config = ((), "{}")
+
+data_source = data_key(source, df)
 
 
 st.subheader("Choose Indicators")
@@ -53,10 +169,9 @@ if "OBV" in selected_indicators:
     params["OBV"] = {}  # No params for OBV
 
 if st.button("Apply Indicators"):
-    df_with_indicators = apply_selected_indicators(df.copy(), selected_indicators, params)
-    st.session_state.df_with_indicators = df_with_indicators
+    st.session_state.indicator_config = (tuple(selected_indicators), json.dumps(params, sort_keys=True))
     st.success("Indicators applied successfully!")
-    st.dataframe(df_with_indicators)
+    st.dataframe(compute_indicators(data_source, *st.session_state.indicator_config, _df=df))
 
 
     # numeric_cols = df.select_dtypes(include=['number']).columns
@@ -70,96 +185,62 @@ if st.button("Apply Indicators"):
 
 st.subheader("📊 Visualizations")
 
-df = st.session_state.get("df_with_indicators", None)
+stage_key = (data_source, *st.session_state.indicator_config)
+bars = df
+df = compute_indicators(*stage_key, _df=df)
 
 if df is not None and not df.empty:
-    strategy_for_signals = st.selectbox("Select Strategy for Signal Generation", [
-        "None", "EMA + RSI", "MACD + RSI", "EMA Crossover", "MACD + BBands",
-        "Stoch + ATR", "OBV + RSI", "EMA + MACD", "EMA", "RSI", "Stoch",
-        "BBands", "ATR", "MACD", "OBV"
-    ])
+    strategy_for_signals = st.selectbox("Select Strategy for Signal Generation", ["None"] + STRATEGY_NAMES)
 
     signals = None
-    signals_dict = {'buy': pd.Series(dtype=float), 'sell': pd.Series(dtype=float)}  # empty default
-    
+    trades_df = pd.DataFrame()
+    result = None
 
     if strategy_for_signals != "None":
-        signals = generate_signals(df, strategy_name=strategy_for_signals)
-        # df, signals = generate_dummy_signals(df)
-        # st.write("Generated signals:", signals)
-
-        # # Extract buy and sell signals indices
-        # buy_indices = signals.index[signals['Signal'] == 1]
-        # sell_indices = signals.index[signals['Signal'] == -1]
-
-        # buy_signals = df.loc[buy_indices, 'Close'] if not buy_indices.empty else pd.Series(dtype=float)
-        # sell_signals = df.loc[sell_indices, 'Close'] if not sell_indices.empty else pd.Series(dtype=float)
-
-        buy_signals = signals[signals['Signal'] == 'Buy']
-        sell_signals = signals[signals['Signal'] == 'Sell']
-
-
-        signals_dict = {'Buy': buy_signals, 'Sell': sell_signals}
-        # st.write("signals_dict:", signals_dict)
-        
-
-        # Calculate PnL only if both buy and sell signals exist
-        if not buy_signals.empty and not sell_signals.empty:
-            trades_df = calculate_pnl(df, signals_dict)
-            # st.write(trades_df.tail(10))
-        else:
+        signals = compute_signals(*stage_key, strategy_for_signals, _df=df)
+        trades_df, result = compute_backtest(*stage_key, strategy_for_signals, _df=df, _signals=signals)
+        if not ((signals['Signal'] == 'Buy').any() and (signals['Signal'] == 'Sell').any()):
             st.info("No buy/sell signals generated with the selected strategy.")
 
+    # Charts only ship the bars in this range, downsampled to the screen
+    x_range = None
+    pyramid = None
+    if "Date" in df.columns and pd.api.types.is_datetime64_any_dtype(df["Date"]) and len(df) > 1:
+        first, last = df["Date"].iloc[0].to_pydatetime(), df["Date"].iloc[-1].to_pydatetime()
+        x_range = st.slider("Visible range", min_value=first, max_value=last, value=(first, last))
+        if df["Date"].is_monotonic_increasing and df["Date"].is_unique:
+            pyramid = get_bar_pyramid(data_source, _df=df)
+
     # Plot chart — check signals DataFrame safely before passing
     if signals is not None and not signals.empty:
-        fig = plot_price_with_indicators(df, indicators=selected_indicators, signals=signals)
+        fig = plot_price_with_indicators(df, indicators=selected_indicators, signals=signals, x_range=x_range, pyramid=pyramid)
     else:
-        fig = plot_price_with_indicators(df, indicators=selected_indicators, signals=None)
-
-    st.plotly_chart(fig, use_container_width=True)
-
-    # Other charts (Volume, RSI, MACD, etc.) — check if each returns a figure before plotting
-    with st.expander("📈 Volume"):
-        st.plotly_chart(plot_volume(df), use_container_width=True)
-
-    with st.expander("📉 RSI"):
-        rsi_chart = plot_rsi(df)
-        if rsi_chart is not None:
-            st.plotly_chart(rsi_chart, use_container_width=True)
-
-    with st.expander("📉 MACD"):
-        macd_chart = plot_macd(df)
-        if macd_chart is not None:
-            st.plotly_chart(macd_chart, use_container_width=True)
-
-    with st.expander("📉 EMA"):
-        ema_chart = plot_ema(df)
-        if ema_chart is not None:
-            st.plotly_chart(ema_chart, use_container_width=True)
-
-    with st.expander("📉 BBANDS"):
-        bbands_chart = plot_bbands(df)
-        if bbands_chart is not None:
-            st.plotly_chart(bbands_chart, use_container_width=True)
-
-    with st.expander("📉 STOCH"):
-        stoch_chart = plot_stoch(df)
-        if stoch_chart is not None:
-            st.plotly_chart(stoch_chart, use_container_width=True)
-
-    with st.expander("📉 ATR"):
-        atr_chart = plot_atr(df)
-        if atr_chart is not None:
-            st.plotly_chart(atr_chart, use_container_width=True)
-
-    with st.expander("📉 OBV"):
-        obv_chart = plot_obv(df)
-        if obv_chart is not None:
-            st.plotly_chart(obv_chart, use_container_width=True)
+        fig = plot_price_with_indicators(df, indicators=selected_indicators, signals=None, x_range=x_range, pyramid=pyramid)
+
+    show_chart(fig)
+
+    # Other charts (Volume, RSI, MACD, etc.) — a figure is only built while its toggle is on
+    indicator_charts = [
+        ("📈 Volume", plot_volume),
+        ("📉 RSI", plot_rsi),
+        ("📉 MACD", plot_macd),
+        ("📉 EMA", plot_ema),
+        ("📉 BBANDS", plot_bbands),
+        ("📉 STOCH", plot_stoch),
+        ("📉 ATR", plot_atr),
+        ("📉 OBV", plot_obv),
+    ]
+    for label, plot in indicator_charts:
+        if st.toggle(label, key=f"show_{plot.__name__}"):
+            chart = plot(df, x_range=x_range)
+            if chart is not None:
+                show_chart(chart)
+            else:
+                st.info(f"Apply the indicator to see {label}.")
 
     # Performance metrics & charts
     if signals is not None and strategy_for_signals != "None":
-        metrics = calculate_performance(df, signals)
+        metrics = result.summary() if result is not None else None
 
         if metrics:
             st.subheader("📊 Strategy Performance Summary")
@@ -176,43 +257,54 @@ if df is not None and not df.empty:
         else:
             st.info("⚠️ Not enough signals to calculate performance.")
 
-        st.subheader("📊 Strategy Charts")
-        # trades_df = pd.DataFrame(signals["trade_log"]) if signals is not None and "trade_log" in signals else pd.DataFrame()
-
-        col1, col2 = st.columns(2)
-
         if trades_df.empty:
             st.warning("⚠️ trades_df is empty! No trades executed.")
-        elif "pnl" not in trades_df.columns:
-            st.error("❌ 'pnl' column still missing before plotting!")
+        elif st.toggle("📊 Strategy Charts", value=True, key="show_strategy_charts"):
+            col1, col2 = st.columns(2)
+            with col1:
+                show_chart(plot_cumulative_return(result, x_range=x_range))
+            with col2:
+                show_chart(plot_drawdown(result, x_range=x_range))
 
-        with col1:
-            st.plotly_chart(plot_cumulative_return(trades_df), use_container_width=True)
-        with col2:
-            st.plotly_chart(plot_drawdown(trades_df), use_container_width=True)
-
-        st.plotly_chart(plot_win_rate(trades_df), use_container_width=True)
+            show_chart(plot_win_rate(trades_df))
 
         st.subheader("📥 Export Results")
 
         # Trade Logs CSV
-        csv = trades_df.to_csv(index=False)
         st.download_button(
             label="Download Trade Log CSV",
-            data=csv,
+            data=trade_log_csv(*stage_key, strategy_for_signals, _trades_df=trades_df),
             file_name="trade_log.csv",
             mime="text/csv"
         )
 
-        # Result PNG: save plot to image
-        import io
-        img_buffer = io.BytesIO()
-        plot_cumulative_return(trades_df).write_image(img_buffer, format='png')
-        st.download_button("Download Equity Chart (PNG)", data=img_buffer, file_name="equity_chart.png", mime="image/png")
+        # Result PNG: rendering is slow, so only on request
+        if result is not None and st.button("Prepare Equity Chart (PNG)"):
+            img_buffer = io.BytesIO()
+            plot_cumulative_return(result).write_image(img_buffer, format='png')
+            st.download_button("Download Equity Chart (PNG)", data=img_buffer, file_name="equity_chart.png", mime="image/png")
+
+    if st.toggle("🔀 Compare all strategies", key="compare_all"):
+        st.subheader("🔀 Strategy Comparison")
+        st.caption("Every strategy on the same bars, with the indicators they need (your parameters where set).")
+        comparison = compute_comparison(data_source, st.session_state.indicator_config[1], _df=bars)
+        st.dataframe(summary_table(comparison.metrics), hide_index=True)
+        show_chart(plot_strategy_equity(comparison, x_range=x_range))
 
 else:
     st.warning("No indicators have been applied yet. Please apply indicators before generating visualizations.")
 
+if run_recorder is not None:
+    report = run_recorder.stop().report()
+    with st.expander("🩺 Diagnostics", expanded=True):
+        st.caption(f"This rerun took {report['meta']['wall_s'] * 1000:.0f} ms. "
+                   "Stages served from Streamlit's cache don't run, so they don't appear.")
+        st.dataframe(pd.DataFrame(report["stages"]), hide_index=True)
+        st.download_button("Download Report (JSON)", data=json.dumps(report, indent=2),
+                           file_name="diagnostics.json", mime="application/json")
+        if report["profile"]:
+            st.code(report["profile"])
+
 st.markdown("---")
 st.markdown("""
 **📌 Disclaimer:** This is a demo financial analysis tool. The data and strategies used are for educational purposes only and do not constitute financial advice.
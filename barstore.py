@@ -0,0 +1,203 @@
+"""
+Local columnar OHLCV store backed by memory-mapped .npy files.
+
+Layout (one directory per symbol and year):
+
+    <root>/<SYMBOL>/<YEAR>/ts.npy       int64 nanoseconds since epoch
+    <root>/<SYMBOL>/<YEAR>/Open.npy     float64 (or float32)
+    <root>/<SYMBOL>/<YEAR>/High.npy ...
+
+Opening a partition only reads the .npy headers; the DataFrame handed back
+wraps the read-only memmaps without copying, so indicators and signals read
+straight from the page cache.
+
+Example:
+    python barstore.py import btc.csv --symbol BTC-USD --root data/bars
+"""
+import argparse
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+TIMESTAMP_FILE = "ts.npy"
+
+
+class BarStore:
+    def __init__(self, root="data/bars"):
+        self.root = root
+
+    def _partition_dir(self, symbol, year):
+        return os.path.join(self.root, symbol, str(year))
+
+    def symbols(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def years(self, symbol):
+        symbol_dir = os.path.join(self.root, symbol)
+        if not os.path.isdir(symbol_dir):
+            return []
+        return sorted(int(d) for d in os.listdir(symbol_dir) if d.isdigit())
+
+    def write(self, symbol, df, dtype=np.float64):
+        """
+        Store an OHLCV frame (with a 'Date' column) for `symbol`, split by year.
+        Bars are merged into existing partitions; on duplicate timestamps the new bar wins.
+        """
+        if df.empty:
+            return
+        ts = pd.to_datetime(df["Date"]).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        years = pd.DatetimeIndex(ts.view("datetime64[ns]")).year.to_numpy()
+
+        for year in np.unique(years):
+            mask = years == year
+            new = {"ts": ts[mask]}
+            for col in PRICE_COLUMNS:
+                new[col] = df[col].to_numpy(dtype=dtype)[mask]
+
+            if year in self.years(symbol):
+                old = self.open_partition(symbol, year)
+                merged = {
+                    "ts": np.concatenate([old["Date"].to_numpy().view(np.int64), new["ts"]]),
+                    **{col: np.concatenate([old[col].to_numpy(), new[col]]) for col in PRICE_COLUMNS},
+                }
+                new = merged
+
+            # Sort by time, keeping the last occurrence of each timestamp
+            order = np.argsort(new["ts"], kind="stable")
+            sorted_ts = new["ts"][order]
+            keep = np.ones(len(order), dtype=bool)
+            keep[:-1] = sorted_ts[1:] != sorted_ts[:-1]
+            order = order[keep]
+
+            self._write_partition(symbol, year, {key: values[order] for key, values in new.items()})
+
+    def _write_partition(self, symbol, year, arrays):
+        final_dir = self._partition_dir(symbol, year)
+        tmp_dir = f"{final_dir}.tmp-{os.getpid()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        np.save(os.path.join(tmp_dir, TIMESTAMP_FILE), np.ascontiguousarray(arrays["ts"], dtype=np.int64))
+        for col in PRICE_COLUMNS:
+            np.save(os.path.join(tmp_dir, f"{col}.npy"), np.ascontiguousarray(arrays[col]))
+
+        if os.path.isdir(final_dir):
+            shutil.rmtree(final_dir)
+        os.replace(tmp_dir, final_dir)
+
+    def _partition_arrays(self, symbol, year, fields=PRICE_COLUMNS):
+        part = self._partition_dir(symbol, year)
+        ts = np.load(os.path.join(part, TIMESTAMP_FILE), mmap_mode="r")
+        columns = {"Date": ts.view("datetime64[ns]")}
+        for col in fields:
+            columns[col] = np.load(os.path.join(part, f"{col}.npy"), mmap_mode="r")
+        return columns
+
+    def open_partition(self, symbol, year):
+        """Zero-copy DataFrame over one year of bars (read-only memmaps)."""
+        return pd.DataFrame(self._partition_arrays(symbol, year), copy=False)
+
+    def arrays(self, symbol, start=None, end=None, fields=PRICE_COLUMNS):
+        """
+        load() as a dict of a "Date" array plus the `fields` arrays, without
+        building a DataFrame; only those columns' files are opened.
+        """
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        years = [
+            y for y in self.years(symbol)
+            if (start is None or y >= start.year) and (end is None or y <= end.year)
+        ]
+        if not years:
+            return None
+
+        parts = []
+        for year in years:
+            columns = self._partition_arrays(symbol, year, fields)
+            ts = columns["Date"]
+            lo = np.searchsorted(ts, start.to_datetime64(), "left") if start is not None else 0
+            hi = np.searchsorted(ts, end.to_datetime64(), "right") if end is not None else len(ts)
+            parts.append({col: values[lo:hi] for col, values in columns.items()})
+
+        if len(parts) == 1:
+            return parts[0]
+        return {col: np.concatenate([p[col] for p in parts]) for col in parts[0]}
+
+    def load(self, symbol, start=None, end=None):
+        """
+        Bars for `symbol` between `start` and `end` (inclusive, optional).
+        A range inside one year is a zero-copy slice of the memmaps; ranges
+        spanning several years are concatenated into memory.
+        """
+        columns = self.arrays(symbol, start, end)
+        if columns is None:
+            return pd.DataFrame(columns=["Date"] + PRICE_COLUMNS)
+        return pd.DataFrame(columns, copy=False)
+
+    def tail(self, symbol, bars):
+        """
+        The last `bars` bars for `symbol`, reading only the latest years'
+        partitions. Zero-copy when they all fall in one year.
+        """
+        parts = []
+        needed = bars
+        for year in reversed(self.years(symbol)):
+            if needed <= 0:
+                break
+            columns = self._partition_arrays(symbol, year)
+            take = min(needed, len(columns["Date"]))
+            parts.append({col: values[len(values) - take:] for col, values in columns.items()})
+            needed -= take
+
+        if not parts:
+            return pd.DataFrame(columns=["Date"] + PRICE_COLUMNS)
+        if len(parts) == 1:
+            return pd.DataFrame(parts[0], copy=False)
+        parts.reverse()
+        return pd.DataFrame({col: np.concatenate([p[col] for p in parts]) for col in parts[0]}, copy=False)
+
+    def import_csv(self, symbol, path, dtype=np.float64):
+        """Import a CSV in the plain OHLCV or yfinance-export layout (see utils.load_csv_data)."""
+        from utils import load_csv_data
+
+        self.write(symbol, load_csv_data(path), dtype=dtype)
+
+    def import_yfinance(self, symbol, start="2022-01-01", end=None, dtype=np.float64):
+        """Download bars with utils.YahooSource and store them; raises if the download fails."""
+        from utils import YahooSource
+
+        self.write(symbol, YahooSource().fetch(symbol, start, end), dtype=dtype)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local columnar bar store.")
+    parser.add_argument("--root", default="data/bars", help="Store directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import", help="Import a CSV file")
+    imp.add_argument("path")
+    imp.add_argument("--symbol", required=True)
+    imp.add_argument("--float32", action="store_true", help="Store prices as float32")
+
+    fetch = sub.add_parser("fetch", help="Download tickers from Yahoo Finance into the store")
+    fetch.add_argument("tickers", nargs="+")
+    fetch.add_argument("--start", default="2022-01-01")
+
+    sub.add_parser("list", help="List stored symbols and years")
+    args = parser.parse_args(argv)
+
+    store = BarStore(args.root)
+    if args.command == "import":
+        store.import_csv(args.symbol, args.path, dtype=np.float32 if args.float32 else np.float64)
+    elif args.command == "fetch":
+        for ticker in args.tickers:
+            store.import_yfinance(ticker, start=args.start)
+    for symbol in store.symbols():
+        print(symbol, store.years(symbol))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Headless batch backtest over a universe of symbols.
+
+Runs load -> apply_selected_indicators -> generate_signals -> calculate_pnl for
+each symbol on a process pool. Only a bounded number of symbols are in flight
+at once, so memory stays flat however large the universe is. Each symbol's
+strategies append their trades to one reused TradeLog (performance.trade_log),
+which a TradeLogWriter streams to <out>/trades/<SYMBOL>.parquet after every
+strategy; the 'run' column is the strategy's position in `strategies`.
+Per-symbol metrics are collected into <out>/metrics.parquet at the end.
+
+Example:
+    python batch.py --symbols-file universe.txt --source store:data/bars \\
+        --indicators EMA RSI --strategies "EMA + RSI" RSI --out results/
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+from performance import BacktestResult, trade_log
+from signals import generate_signals
+from strategies import apply_selected_indicators
+from tradelog import TradeLog, TradeLogWriter
+
+
+def load_symbol(source, symbol, start=None, end=None):
+    """
+    Load bars for one symbol. `source` is one of:
+    - "store:<root>"  the local bar store (barstore.BarStore)
+    - "csv:<dir>"     <dir>/<symbol>.csv (see utils.load_csv_data)
+    - "yahoo"         utils.load_stock_data
+    `start` and `end` are inclusive.
+    """
+    kind, _, location = source.partition(":")
+    if kind == "store":
+        from barstore import BarStore
+
+        return BarStore(location).load(symbol, start=start, end=end)
+    if kind == "csv":
+        from utils import load_csv_data
+
+        df = load_csv_data(os.path.join(location, f"{symbol}.csv"))
+        if start is not None:
+            df = df[df["Date"] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df["Date"] <= pd.Timestamp(end)]
+        return df.reset_index(drop=True)
+    if kind == "yahoo":
+        from utils import load_stock_data
+
+        return load_stock_data(symbol, start=start or "2022-01-01", end=end)
+    raise ValueError(f"❌ Unknown data source '{source}'.")
+
+
+def _remove_stale(path):
+    # Don't leave a previous run's trades behind
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def run_symbol(symbol, config):
+    """Backtest one symbol; write its trade log and return its metrics rows."""
+    trades_path = os.path.join(config["out"], "trades", f"{symbol}.parquet")
+    try:
+        df = load_symbol(config["source"], symbol, config.get("start"), config.get("end"))
+    except Exception:
+        _remove_stale(trades_path)
+        raise
+    if df.empty:
+        _remove_stale(trades_path)
+        return symbol, 0, [], "no data"
+
+    df = apply_selected_indicators(df, config["indicators"], config.get("params", {}))
+    initial_balance = config.get("initial_balance", 10000)
+    dates = df["Date"].to_numpy()
+
+    rows = []
+    log = TradeLog()
+    writer = None
+    try:
+        for run, strategy in enumerate(config["strategies"]):
+            signals = generate_signals(df, strategy_name=strategy)
+            trade_log(df, signals, config.get("trade_size_pct", 0.10), initial_balance, log=log.clear(), run=run)
+            metrics = BacktestResult(df, log.to_frame(dates), initial_balance=initial_balance).metrics()
+            rows.append({"symbol": symbol, "strategy": strategy, "bars": len(df), **metrics})
+            if len(log):
+                writer = writer or TradeLogWriter(trades_path, "parquet", dates=dates)
+                writer.write(log)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        _remove_stale(trades_path)
+    return symbol, len(df), rows, None
+
+
+def run_batch(symbols, config, max_workers=None, max_in_flight=None, progress_every=5.0):
+    """
+    Backtest every symbol in `symbols` (any iterable, consumed lazily).
+
+    `config` holds source, indicators, params, strategies, out (output directory)
+    and optionally start/end, initial_balance, trade_size_pct.
+    Returns the metrics DataFrame, which is also written to <out>/metrics.parquet.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or max_workers * 2
+    os.makedirs(os.path.join(config["out"], "trades"), exist_ok=True)
+
+    rows = []
+    failures = {}
+    done = bars = 0
+    started = last_report = time.perf_counter()
+
+    def report(final=False):
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        print(
+            f"{'✅' if final else '⏳'} {done} symbols, {bars:,} bars in {elapsed:.1f}s "
+            f"({done / elapsed:.1f} symbols/s, {bars / elapsed:,.0f} bars/s, {len(failures)} failed)",
+            file=sys.stderr,
+        )
+
+    symbols = iter(symbols)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        while True:
+            # Keep the pool fed without materialising the whole universe
+            for symbol in symbols:
+                pending[executor.submit(run_symbol, symbol, config)] = symbol
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                symbol = pending.pop(future)
+                try:
+                    _, n_bars, symbol_rows, error = future.result()
+                except Exception as e:
+                    error, n_bars, symbol_rows = repr(e), 0, []
+                if error:
+                    failures[symbol] = error
+                rows.extend(symbol_rows)
+                done += 1
+                bars += n_bars
+
+            if time.perf_counter() - last_report >= progress_every:
+                report()
+                last_report = time.perf_counter()
+
+    report(final=True)
+    for symbol, error in failures.items():
+        print(f"⚠️ Warning: {symbol} failed: {error}", file=sys.stderr)
+
+    metrics = pd.DataFrame(rows, columns=[
+        "symbol", "strategy", "bars", "total_pnl", "total_return",
+        "sharpe_ratio", "max_drawdown", "num_trades", "win_rate"
+    ])
+    metrics.to_parquet(os.path.join(config["out"], "metrics.parquet"), index=False)
+    return metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest a universe of symbols headlessly.")
+    parser.add_argument("--symbols", nargs="*", default=[], help="Symbols to run")
+    parser.add_argument("--symbols-file", default=None, help="File with one symbol per line")
+    parser.add_argument("--source", default="store:data/bars", help="store:<root>, csv:<dir> or yahoo")
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--indicators", nargs="+", required=True, help="Keys of strategies.INDICATOR_FUNCTIONS")
+    parser.add_argument("--params", default="{}", help="Indicator params as JSON")
+    parser.add_argument("--strategies", nargs="+", required=True, help="Strategy names for generate_signals")
+    parser.add_argument("--out", default="results", help="Output directory")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-in-flight", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    def universe():
+        yield from args.symbols
+        if args.symbols_file:
+            with open(args.symbols_file) as f:
+                for line in f:
+                    if line.strip():
+                        yield line.strip()
+
+    config = {
+        "source": args.source,
+        "start": args.start,
+        "end": args.end,
+        "indicators": args.indicators,
+        "params": json.loads(args.params),
+        "strategies": args.strategies,
+        "out": args.out,
+    }
+    metrics = run_batch(universe(), config, max_workers=args.workers, max_in_flight=args.max_in_flight)
+    print(metrics.sort_values("sharpe_ratio", ascending=False).head(20).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
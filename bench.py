@@ -0,0 +1,585 @@
+"""
+Benchmarks for the indicator -> signal -> PnL pipeline.
+
+Times each `indicators.compute_*` function, apply_selected_indicators,
+generate_signals, calculate_pnl and calculate_performance on synthetic
+random-walk OHLCV of several sizes (and on btc.csv), recording wall time,
+peak RSS and peak Python allocations. Every (benchmark, size) case runs in a
+fresh process so peak RSS belongs to that case alone.
+
+Results are written as JSON; pass a previous run as --baseline to flag
+regressions (exit code 1 if any case got slower or allocates more than the
+threshold allows).
+
+--checks runs the CHECKS instead: rewritten hot paths compared against the
+code they replaced (kept here as references), and regression cases for bugs
+that were fixed. Exit code 1 if any fails.
+
+--imports checks cold-start cost instead: each library module is imported in
+a fresh interpreter and must stay under its IMPORT_BUDGETS time without
+loading any of HEAVY_MODULES (plotting, network and JIT packages that only
+load on first use). Batch and sweep workers are spawned per job, so every
+module they import is paid for in every process. Exit code 1 on a violation.
+
+Example:
+    python bench.py --sizes 10000 100000 1000000 --out bench.json
+    python bench.py --baseline bench.json --threshold 0.2
+    python bench.py --imports
+    python bench.py --checks
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SIZES = ["10000", "100000", "1000000", "10000000", "btc"]
+INDICATOR_NAMES = ["compute_ema", "compute_macd", "compute_rsi", "compute_stoch",
+                   "compute_bbands", "compute_atr", "compute_obv"]
+ALL_INDICATORS = ["EMA", "MACD", "RSI", "Stochastic", "Bollinger Bands", "ATR", "OBV"]
+
+
+def synthetic_ohlcv(n, seed=0):
+    """Random-walk OHLCV bars at 1-minute spacing."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.0005, n))
+    return pd.DataFrame({
+        "Date": pd.date_range("2000-01-01", periods=n, freq="min"),
+        "Open": open_,
+        "High": np.maximum(open_, close) * (1 + spread),
+        "Low": np.minimum(open_, close) * (1 - spread),
+        "Close": close,
+        "Volume": rng.integers(1_000, 1_000_000, n).astype(np.float64),
+    })
+
+
+def load_dataset(size):
+    if size == "btc":
+        from utils import load_csv_data
+
+        return load_csv_data(os.path.join(os.path.dirname(os.path.abspath(__file__)), "btc.csv"))
+    return synthetic_ohlcv(int(size))
+
+
+def _with_indicators(df):
+    from strategies import apply_selected_indicators
+
+    return apply_selected_indicators(df.copy(), ["EMA", "MACD", "RSI"], {})
+
+
+# Each benchmark is setup(df) -> zero-argument callable that does the timed work
+
+def _bench_compute(name, backend=None):
+    def setup(df):
+        import indicators
+
+        func = getattr(indicators, name)
+        return lambda: func(df, backend=backend)
+
+    return setup
+
+
+def _bench_apply_selected_indicators(df):
+    from strategies import apply_selected_indicators
+
+    return lambda: apply_selected_indicators(df.copy(), ALL_INDICATORS, {})
+
+
+def _bench_apply_indicator_graph(df):
+    from indicator_graph import apply_indicator_graph
+
+    return lambda: apply_indicator_graph(df.copy(), ALL_INDICATORS, {})
+
+
+def _bench_generate_signals(df):
+    from signals import generate_signals
+
+    df = _with_indicators(df)
+    return lambda: generate_signals(df, "MACD")
+
+
+def _bench_calculate_pnl(df):
+    from performance import calculate_pnl
+    from signals import generate_signals
+
+    df = _with_indicators(df)
+    signals = generate_signals(df, "MACD")
+    return lambda: calculate_pnl(df, signals)
+
+
+def _bench_calculate_performance(df):
+    from performance import calculate_performance
+    from signals import generate_signals
+
+    df = _with_indicators(df)
+    signals = generate_signals(df, "MACD")
+    return lambda: calculate_performance(df, signals)
+
+
+def reference_calculate_pnl(df, signals, trade_size_pct=0.10, initial_balance=10000):
+    """The two-pointer loop calculate_pnl used before trade matching was vectorized."""
+    buy_times = signals.index[signals["Signal"] == "Buy"].tolist()
+    sell_times = signals.index[signals["Signal"] == "Sell"].tolist()
+
+    trades = []
+    i = j = 0
+    while i < len(buy_times) and j < len(sell_times):
+        buy_time = buy_times[i]
+        sell_time = sell_times[j]
+
+        if sell_time > buy_time and buy_time in df.index and sell_time in df.index:
+            entry_price = df.loc[buy_time, "Close"]
+            exit_price = df.loc[sell_time, "Close"]
+            qty = trade_size_pct * initial_balance / entry_price
+            trades.append({
+                "entry_time": df.loc[buy_time, "Date"],
+                "exit_time": df.loc[sell_time, "Date"],
+                "entry_price": entry_price,
+                "exit_price": exit_price,
+                "qty": qty,
+                "pnl": (exit_price - entry_price) * qty,
+            })
+            i += 1
+            j += 1
+        else:
+            j += 1  # Skip unmatched sell
+
+    return pd.DataFrame(trades)
+
+
+def _bench_reference_calculate_pnl(df):
+    from signals import generate_signals
+
+    df = _with_indicators(df)
+    signals = generate_signals(df, "MACD")
+    return lambda: reference_calculate_pnl(df, signals)
+
+
+BENCHMARKS = {
+    **{
+        f"indicators.{name}": _bench_compute(name)
+        for name in INDICATOR_NAMES
+    },
+    **{
+        f"indicators.{name}[pandas_ta]": _bench_compute(name, backend="pandas_ta")
+        for name in INDICATOR_NAMES
+    },
+    "strategies.apply_selected_indicators": _bench_apply_selected_indicators,
+    "indicator_graph.apply_indicator_graph": _bench_apply_indicator_graph,
+    "signals.generate_signals": _bench_generate_signals,
+    "performance.calculate_pnl": _bench_calculate_pnl,
+    "performance.calculate_pnl[loop]": _bench_reference_calculate_pnl,
+    "performance.calculate_performance": _bench_calculate_performance,
+}
+
+
+# Each check returns a list of failure messages (empty when it passes)
+
+def _check_calculate_pnl():
+    """calculate_pnl against the loop it replaced: every strategy on btc.csv, then random signal sets."""
+    from performance import match_trades, calculate_pnl
+    from signals import STRATEGY_NAMES, generate_signals
+    from strategies import apply_selected_indicators
+
+    failures = []
+    df = apply_selected_indicators(load_dataset("btc"), ALL_INDICATORS, {})
+    for name in STRATEGY_NAMES:
+        signals = generate_signals(df, name)
+        expected = reference_calculate_pnl(df, signals)
+        actual = calculate_pnl(df, signals)
+        if expected.empty != actual.empty or (not expected.empty and not expected.equals(actual)):
+            failures.append(f"calculate_pnl differs from the reference loop for {name} on btc.csv")
+
+    rng = np.random.default_rng(0)
+    for case in range(2000):
+        n = int(rng.integers(1, 200))
+        codes = rng.choice(np.array(["Buy", "Sell", "Hold"], dtype=object), n, p=rng.dirichlet([1, 1, 1]))
+        bars = pd.DataFrame({"Date": np.arange(n), "Close": rng.uniform(1, 2, n)})
+        signals = pd.DataFrame({"Signal": codes})
+        expected = reference_calculate_pnl(bars, signals)
+        entry_pos, exit_pos = match_trades(np.flatnonzero(codes == "Buy"), np.flatnonzero(codes == "Sell"))
+        if not (np.array_equal(entry_pos, expected.get("entry_time", []))
+                and np.array_equal(exit_pos, expected.get("exit_time", []))):
+            failures.append(f"match_trades differs from the reference loop in random case {case}")
+    return failures
+
+
+def _check_simulator_same_bar_reentry():
+    """A stop-loss exit and a new entry on the same bar: one closed trade per bar after the first."""
+    from kernels import HAVE_NUMBA
+    from signals import BUY
+    from simulator import simulate
+
+    n = 20
+    close = np.full(n, 100.0)
+    bars = pd.DataFrame({
+        "Date": pd.date_range("2024-01-01", periods=n), "Open": close,
+        "High": close, "Low": 0.98 * close, "Close": close,
+    })
+    failures = []
+    for backend in ["python"] + (["numba"] if HAVE_NUMBA else []):
+        trades = simulate(bars, np.full(n, BUY), stop_loss_pct=0.01, backend=backend).trades
+        if len(trades) != n - 1 or not (trades["exit_reason"] == "stop_loss").all():
+            failures.append(f"{backend} backend closed {len(trades)} trades, expected {n - 1} stop-loss exits")
+        elif not (trades["exit_time"].to_numpy()[:-1] == trades["entry_time"].to_numpy()[1:]).all():
+            failures.append(f"{backend} backend did not re-enter on the bar of each stop-loss exit")
+    return failures
+
+
+def _check_barstore_yahoo_multiindex():
+    """A yf.download-shaped frame ((Price, Ticker) columns, tz-aware dates) stores and loads back intact."""
+    import tempfile
+
+    from barstore import PRICE_COLUMNS, BarStore
+    from utils import yahoo_frame
+
+    n = 30
+    dates = pd.date_range("2023-12-20", periods=n, tz="America/New_York", name="Date")
+    prices = np.random.default_rng(0).uniform(90, 110, (n, len(PRICE_COLUMNS)))
+    columns = pd.MultiIndex.from_product([PRICE_COLUMNS, ["AAPL"]], names=["Price", "Ticker"])
+    download = pd.DataFrame(prices, index=dates, columns=columns)
+
+    with tempfile.TemporaryDirectory() as root:
+        store = BarStore(root)
+        store.write("AAPL", yahoo_frame(download))
+        loaded = store.load("AAPL")
+    failures = []
+    if not np.array_equal(loaded["Date"].to_numpy(), dates.tz_localize(None).to_numpy()):
+        failures.append("stored dates differ from the download's")
+    if not np.array_equal(loaded[PRICE_COLUMNS].to_numpy(), prices):
+        failures.append("stored prices differ from the download's")
+    return failures
+
+
+def _check_kernel_parity():
+    """numba kernels vs pandas_ta, and vs the same kernels without numba, on btc.csv and degenerate inputs."""
+    from kernels import HAVE_NUMBA, parity_report
+
+    columns = ["Open", "High", "Low", "Close", "Volume"]
+    cases = {
+        "btc.csv": load_dataset("btc"),
+        "empty": pd.DataFrame({col: np.empty(0) for col in columns}),
+        "all-NaN": pd.DataFrame({col: np.full(60, np.nan) for col in columns}),
+        "5 bars": load_dataset("btc").head(5),
+    }
+    references = ["pandas_ta"] + (["python"] if HAVE_NUMBA else [])
+    failures = []
+    for case, df in cases.items():
+        for reference in references:
+            for name, col, same_nans, max_diff in parity_report(df, "numba", reference):
+                if same_nans is None:
+                    # pandas_ta itself fails on some degenerate inputs (e.g. ATR on all-NaN bars)
+                    if reference != "pandas_ta":
+                        failures.append(f"{name} raised with the {reference} backend on {case}")
+                elif not same_nans or max_diff > 1e-9:
+                    failures.append(f"{name} {col} differs from {reference} on {case} "
+                                    f"(NaNs match: {same_nans}, max |diff|: {max_diff:.3g})")
+    return failures
+
+
+def _check_streaming_from_batch():
+    """Streams seeded by from_batch and fed the rest of the bars vs indicator_graph over all of them."""
+    from indicator_graph import IndicatorGraph, default_params
+    from streaming import STREAMING_INDICATORS
+
+    df = load_dataset("btc").head(600)
+    # Missing closes at the end of the seeding batch: pandas keeps decaying EWM weights over them
+    df.loc[497:499, "Close"] = np.nan
+    split = 500
+    # Rolling sums restart from the replayed window, so those only match to rounding
+    exact = {"EMA", "MACD", "RSI", "ATR", "OBV"}
+
+    failures = []
+    for name, cls in STREAMING_INDICATORS.items():
+        params = default_params(name)
+        stream = cls.from_batch(df.iloc[:split], **params)
+        streamed = [stream.update(bar) for bar in df.iloc[split:].to_dict("records")]
+        expected = IndicatorGraph(df).compute(name, **params).iloc[split:]
+        if isinstance(expected, pd.Series):
+            expected, streamed = expected.to_frame(), pd.DataFrame({expected.name: streamed})
+        else:
+            streamed = pd.DataFrame(streamed)[list(expected.columns)]
+        expected, streamed = expected.to_numpy(dtype=np.float64), streamed.to_numpy(dtype=np.float64)
+        if name in exact:
+            same = np.array_equal(expected, streamed, equal_nan=True)
+        else:
+            same = np.allclose(expected, streamed, rtol=1e-9, atol=1e-9, equal_nan=True)
+        if not same:
+            diff = np.nanmax(np.abs(expected - streamed))
+            failures.append(f"{name} streamed after from_batch differs from indicator_graph (max |diff|: {diff:.3g})")
+    return failures
+
+
+def _check_portfolio_panel_indicators():
+    """Indicators over a ragged AssetPanel in one packed pass vs each asset's own bars through the 1-D kernels."""
+    from kernels import KERNELS, indicator_arrays
+    from portfolio import align_assets, apply_panel_indicators
+
+    btc = load_dataset("btc")
+    gappy = btc.drop(index=btc.index[100:140])
+    gappy.loc[gappy.index[300:310], "Close"] = np.nan
+    frames = {"full": btc, "late": btc.iloc[700:], "short": btc.iloc[:14], "tiny": btc.iloc[50:59],
+              "gappy": gappy, "empty": btc.iloc[:0]}
+    panel = apply_panel_indicators(align_assets(frames), list(KERNELS), backend="numba")
+
+    failures = []
+    for j, symbol in enumerate(panel.symbols):
+        rows = panel.valid[:, j]
+        df = frames[symbol]
+        for name in KERNELS:
+            arrays = {col: df[col].to_numpy(dtype=np.float64) for col in KERNELS[name][0]}
+            for col, expected in indicator_arrays(arrays, name).items():
+                values = panel[col][:, j]
+                if not np.array_equal(values[rows], expected, equal_nan=True) or not np.isnan(values[~rows]).all():
+                    failures.append(f"{col} for '{symbol}' differs from its single-asset kernel")
+    return failures
+
+
+CHECKS = {
+    "performance.calculate_pnl": _check_calculate_pnl,
+    "simulator.same_bar_reentry": _check_simulator_same_bar_reentry,
+    "barstore.yahoo_multiindex": _check_barstore_yahoo_multiindex,
+    "kernels.parity": _check_kernel_parity,
+    "streaming.from_batch": _check_streaming_from_batch,
+    "portfolio.panel_indicators": _check_portfolio_panel_indicators,
+}
+
+
+def run_checks(names=None):
+    """Run CHECKS (default: all); returns [(check, failure)]."""
+    failures = []
+    for name in names or CHECKS:
+        try:
+            problems = CHECKS[name]()
+        except Exception as e:
+            problems = [repr(e)]
+        print(f"{'❌' if problems else '✅'} {name}", file=sys.stderr)
+        failures.extend((name, problem) for problem in problems)
+    return failures
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak / (1024**2 if sys.platform == "darwin" else 1024)
+
+
+def run_case(name, size, repeat=3):
+    """Run one benchmark on one dataset size (meant to be called in a fresh process)."""
+    try:
+        run = BENCHMARKS[name](load_dataset(size))
+        run()  # warm-up: imports, caches, JIT
+
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        run()
+        _, alloc_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    except Exception as e:
+        return {"error": repr(e)}
+
+    return {
+        "wall_s": min(times),
+        "wall_s_median": float(np.median(times)),
+        "peak_rss_mb": _peak_rss_mb(),
+        "alloc_peak_mb": alloc_peak / 1024**2,
+    }
+
+
+def run_benchmarks(names=None, sizes=None, repeat=3, isolate=True):
+    names = names or list(BENCHMARKS)
+    sizes = sizes or DEFAULT_SIZES
+    results = {}
+    context = multiprocessing.get_context("spawn")
+
+    for size in sizes:
+        for name in names:
+            if isolate:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    result = executor.submit(run_case, name, size, repeat).result()
+            else:
+                result = run_case(name, size, repeat)
+            results[f"{name}@{size}"] = result
+
+            if "error" in result:
+                print(f"⚠️ {name}@{size}: {result['error']}", file=sys.stderr)
+            else:
+                print(f"{name}@{size}: {result['wall_s'] * 1000:.1f} ms, "
+                      f"rss {result['peak_rss_mb']:.0f} MB, alloc {result['alloc_peak_mb']:.1f} MB",
+                      file=sys.stderr)
+
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=0.2):
+    """
+    Cases whose wall time or allocation peak grew by more than `threshold`
+    (a fraction) relative to the baseline, or that now fail.
+    """
+    regressions = []
+    for case, base in baseline["results"].items():
+        now = current["results"].get(case)
+        if now is None or "error" in base:
+            continue
+        if "error" in now:
+            regressions.append((case, "error", base.get("wall_s"), now["error"]))
+            continue
+        for metric in ("wall_s", "alloc_peak_mb"):
+            if base[metric] > 0 and now[metric] > base[metric] * (1 + threshold):
+                regressions.append((case, metric, base[metric], now[metric]))
+    return regressions
+
+
+# Seconds to import each library module in a fresh interpreter (pandas + numpy alone are ~0.4s)
+IMPORT_BUDGETS = {
+    "profiling": 0.1,
+    "kernels": 0.2,
+    "indicators": 0.6,
+    "indicator_graph": 0.6,
+    "strategies": 0.6,
+    "signals": 0.6,
+    "performance": 0.6,
+    "tradelog": 0.6,
+    "simulator": 0.6,
+    "portfolio": 0.6,
+    "robustness": 0.6,
+    "cache": 0.6,
+    "streaming": 0.6,
+    "barstore": 0.6,
+    "resample": 0.6,
+    "decimate": 0.6,
+    "utils": 0.6,
+    "compare": 0.6,
+    "optimizer": 0.75,
+    "batch": 0.75,
+    "walkforward": 0.75,
+    "screener": 0.75,
+}
+
+# Packages library modules must not import at load time
+HEAVY_MODULES = ("plotly", "pandas_ta", "yfinance", "numba", "streamlit", "matplotlib", "talib")
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_s": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(module, repeat=3):
+    """Best-of-`repeat` cold import time of `module`, and which HEAVY_MODULES it loaded."""
+    best = None
+    for _ in range(repeat):
+        probe = _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)
+        out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        if out.returncode != 0:
+            return {"error": out.stderr.strip().splitlines()[-1]}
+        result = json.loads(out.stdout)
+        if best is None or result["import_s"] < best["import_s"]:
+            best = result
+    return best
+
+
+def check_imports(budgets=None, repeat=3):
+    """Import every module in `budgets` cold; returns [(module, problem)] for budget or heavy-import violations."""
+    budgets = budgets or IMPORT_BUDGETS
+    violations = []
+    for module, budget in budgets.items():
+        result = measure_import(module, repeat)
+        if "error" in result:
+            violations.append((module, result["error"]))
+            continue
+        print(f"{module}: {result['import_s'] * 1000:.0f} ms (budget {budget * 1000:.0f} ms)", file=sys.stderr)
+        if result["import_s"] > budget:
+            violations.append((module, f"{result['import_s']:.2f}s is over the {budget:.2f}s budget"))
+        if result["heavy"]:
+            violations.append((module, f"imports {', '.join(result['heavy'])} at load time"))
+    return violations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the indicator -> signal -> PnL pipeline.")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="Bar counts and/or 'btc'")
+    parser.add_argument("--only", nargs="+", default=None, help="Benchmark names (default: all)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-isolate", action="store_true", help="Run cases in this process")
+    parser.add_argument("--out", default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", default=None, help="Compare against this results JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown (0.2 = 20%%)")
+    parser.add_argument("--list", action="store_true", help="List benchmark names and exit")
+    parser.add_argument("--imports", action="store_true", help="Check cold import times against IMPORT_BUDGETS")
+    parser.add_argument("--checks", action="store_true", help="Run the CHECKS instead of benchmarks")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    if args.checks:
+        failures = run_checks(args.only)
+        for name, problem in failures:
+            print(f"❌ {name}: {problem}")
+        if failures:
+            return 1
+        print("✅ All checks passed.")
+        return 0
+
+    if args.imports:
+        violations = check_imports(repeat=args.repeat)
+        for module, problem in violations:
+            print(f"❌ {module}: {problem}")
+        if violations:
+            return 1
+        print("✅ All modules within their import budgets.")
+        return 0
+
+    current = run_benchmarks(args.only, args.sizes, args.repeat, isolate=not args.no_isolate)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        for case, metric, before, after in regressions:
+            print(f"❌ Regression in {case} ({metric}): {before} -> {after}")
+        if regressions:
+            return 1
+        print("✅ No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
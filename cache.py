@@ -0,0 +1,150 @@
+"""
+Memoization for indicator results.
+
+Results are keyed on (fingerprint of the input columns the indicator reads,
+indicator function, parameters, resolved indicator backend, CACHE_VERSION), so recomputing an unchanged indicator - for
+example after moving an unrelated slider - is a dictionary lookup. The
+in-memory tier is an LRU bounded by bytes; an optional on-disk tier keeps
+results across processes and restarts.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from indicators import INDICATOR_INPUTS, get_backend
+
+# Part of every key; bump it when an indicator's output changes so old disk entries are not served
+# (2: MACD_S became the signal line instead of the histogram)
+CACHE_VERSION = 2
+
+
+def _hash_values(h, values):
+    values = np.asarray(values)
+    h.update(str(values.dtype).encode())
+    if values.dtype == object:
+        values = pd.util.hash_array(values)
+    h.update(np.ascontiguousarray(values).view(np.uint8))
+
+
+def fingerprint(df, columns):
+    """Hash the given columns (and the index) of a DataFrame."""
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(df.index, pd.RangeIndex):
+        h.update(repr((df.index.start, df.index.stop, df.index.step)).encode())
+    else:
+        _hash_values(h, df.index.to_numpy())
+
+    for col in columns:
+        h.update(col.encode())
+        _hash_values(h, df[col].to_numpy())
+    return h.hexdigest()
+
+
+def _result_nbytes(result):
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(index=True).sum())
+    if isinstance(result, pd.Series):
+        return int(result.memory_usage(index=True))
+    return 0
+
+
+class IndicatorCache:
+    """
+    Byte-bounded LRU cache of indicator results, with an optional disk tier.
+
+    Cached objects are returned as-is; callers must not mutate them.
+    """
+
+    def __init__(self, max_bytes=256 * 1024**2, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()  # key -> (result, nbytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def key(self, func, df, params):
+        name = func.__name__
+        columns = INDICATOR_INPUTS.get(name, ("Open", "High", "Low", "Close", "Volume"))
+        return (f"{func.__module__}.{name}", fingerprint(df, columns), tuple(sorted(params.items())),
+                get_backend(params.get("backend")), CACHE_VERSION)
+
+    def get_or_compute(self, func, df, params=None):
+        """Return func(df, **params), computing it only on a cache miss."""
+        params = params or {}
+        key = self.key(func, df, params)
+
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+        result = self._load(key)
+        if result is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            result = func(df, **params)
+            self._save(key, result)
+
+        self._store(key, result)
+        return result
+
+    def _store(self, key, result):
+        nbytes = _result_nbytes(result)
+        if nbytes > self.max_bytes:
+            return
+        self._entries[key] = (result, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            _, (_, evicted_bytes) = self._entries.popitem(last=False)
+            self.nbytes -= evicted_bytes
+            self.evictions += 1
+
+    def _disk_path(self, key):
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.pkl")
+
+    def _load(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return pd.read_pickle(path)
+        except Exception as e:
+            print(f"⚠️ Warning: could not read cached indicator {path}: {e}")
+            return None
+
+    def _save(self, key, result):
+        if not self.disk_dir or result is None:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        pd.to_pickle(result, tmp_path)
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
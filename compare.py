@@ -0,0 +1,129 @@
+"""
+Backtest every strategy in one pass over the same bars.
+
+Comparing strategies one at a time repeats generate_signals, calculate_pnl
+and the backtest metrics for each of them. Here the indicators every
+strategy needs are computed once (indicator_superset), generate_signal_matrix
+evaluates all the rules over shared input arrays, and the trades and
+mark-to-market equity of every strategy are computed together:
+- performance.match_trade_rows matches buys to sells for every row of the
+  signal matrix at once
+- one bincount over (strategy, bar) builds all the equity curves.
+
+Trades and metrics are the same as calculate_pnl and BacktestResult give for
+each strategy on its own.
+
+Example:
+    python compare.py --csv btc.csv --params '{"RSI": {"length": 14}}'
+"""
+import argparse
+import json
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from kernels import KERNELS
+from performance import equity_metrics, format_summary, match_trade_rows, periods_per_year
+from profiling import instrumented
+from signals import BUY, SELL, STRATEGY_NAMES, STRATEGY_RULES, generate_signal_matrix
+
+StrategyComparison = namedtuple("StrategyComparison", ["metrics", "dates", "equity", "trades"])
+
+
+def indicator_superset(strategies=None):
+    """The indicators (keys of strategies.INDICATOR_FUNCTIONS) whose columns `strategies` read."""
+    needed = {col for name in (strategies or STRATEGY_NAMES) for col in STRATEGY_RULES[name].requires}
+    return [indicator for indicator, (_, _, outputs) in KERNELS.items() if needed.intersection(outputs)]
+
+
+@instrumented()
+def compare_strategies(df, strategies=None, initial_balance=10000, trade_size_pct=0.10, risk_free_rate=0.0):
+    """
+    Backtest each of `strategies` (default: all) on df, which must already
+    hold the indicator columns they read; strategies missing a column never
+    trade, as with generate_signals.
+
+    Returns StrategyComparison(metrics, dates, equity, trades):
+    - metrics: one row per strategy, BacktestResult.metrics() columns
+    - dates: the bars' dates
+    - equity: (strategies x bars) mark-to-market equity, rows in metrics order
+    - trades: calculate_pnl's columns plus 'strategy', for every strategy
+    """
+    if len(df) == 0:
+        raise ValueError("❌ No bars to backtest.")
+    codes, strategies = generate_signal_matrix(df, strategies)
+    n_strategies, n = codes.shape
+
+    rows, entry_pos, exit_pos = match_trade_rows(codes == BUY, codes == SELL)
+    close = df["Close"].to_numpy(dtype=np.float64)
+    entry_price = close[entry_pos]
+    exit_price = close[exit_pos]
+    qty = trade_size_pct * initial_balance / entry_price
+    pnl = (exit_price - entry_price) * qty
+
+    # BacktestResult.equity for every strategy at once, indexed by strategy * n + bar
+    entry_flat = rows * n + entry_pos
+    exit_flat = rows * n + exit_pos
+    size = n_strategies * n
+    cash_flow = (
+        np.bincount(exit_flat, weights=qty * exit_price, minlength=size)
+        - np.bincount(entry_flat, weights=qty * entry_price, minlength=size)
+    ).reshape(n_strategies, n)
+    held = np.cumsum(
+        (np.bincount(entry_flat, weights=qty, minlength=size)
+         - np.bincount(exit_flat, weights=qty, minlength=size)).reshape(n_strategies, n),
+        axis=1,
+    )
+    equity = initial_balance + np.cumsum(cash_flow, axis=1) + held * close
+
+    dates = df["Date"].to_numpy()
+    num_trades = np.bincount(rows, minlength=n_strategies)
+    wins = np.bincount(rows, weights=pnl > 0, minlength=n_strategies)
+    metrics = pd.DataFrame({
+        "total_pnl": np.bincount(rows, weights=pnl, minlength=n_strategies),
+        **equity_metrics(equity, initial_balance, periods_per_year(dates), risk_free_rate),
+        "num_trades": num_trades,
+        "win_rate": np.where(num_trades > 0, wins / np.maximum(num_trades, 1) * 100, 0.0),
+    }, index=pd.Index(strategies, name="strategy"))
+
+    trades = pd.DataFrame({
+        "strategy": pd.Categorical.from_codes(rows, strategies),
+        "entry_time": df["Date"].iloc[entry_pos].reset_index(drop=True),
+        "exit_time": df["Date"].iloc[exit_pos].reset_index(drop=True),
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "qty": qty,
+        "pnl": pnl,
+    })
+    return StrategyComparison(metrics, dates, equity, trades)
+
+
+def summary_table(metrics):
+    """Metrics formatted the way the app shows one strategy's summary, best Sharpe first."""
+    ranked = metrics.sort_values("sharpe_ratio", ascending=False)
+    rows = []
+    for name, m in zip(ranked.index, ranked.to_dict("records")):
+        summary = format_summary(m)
+        del summary["Trades"]
+        rows.append({"Strategy": name, **summary})
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest every strategy on one data set and compare them.")
+    parser.add_argument("--csv", required=True, help="OHLCV CSV file")
+    parser.add_argument("--params", default="{}", help="Indicator params as JSON")
+    parser.add_argument("--strategies", nargs="+", default=None, help="Strategy names (default: all)")
+    args = parser.parse_args(argv)
+
+    from strategies import apply_selected_indicators
+    from utils import load_csv_data
+
+    df = apply_selected_indicators(load_csv_data(args.csv), indicator_superset(args.strategies), json.loads(args.params))
+    comparison = compare_strategies(df, args.strategies)
+    print(comparison.metrics.sort_values("sharpe_ratio", ascending=False).to_string(float_format="{:.4f}".format))
+
+
+if __name__ == "__main__":
+    main()
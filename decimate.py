@@ -0,0 +1,190 @@
+"""
+Downsampling of chart series to roughly what the screen can show.
+
+- Lines use largest-triangle-three-buckets (LTTB), which keeps the points
+  that carry the visual shape of the series.
+- Bars keep the min and max of each bucket so spikes survive.
+- Candles are aggregated into coarser OHLC bars (first open, max high,
+  min low, last close, summed volume).
+
+ChartData caches every decimated view of a frame, keyed by the columns,
+the pixel width and the visible index range, so redrawing or zooming back
+to a range already seen doesn't touch the raw arrays again. Frames are
+treated as read-only once plotted; derive a new frame to change values.
+"""
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_WIDTH = 1500
+PIXELS_PER_CANDLE = 4
+
+
+def lttb_indices(y, n_out):
+    """Positions of the `n_out` points LTTB keeps from `y` (NaNs are dropped)."""
+    y = np.asarray(y, dtype=np.float64)
+    finite = np.flatnonzero(np.isfinite(y))
+    n = len(finite)
+    if n <= n_out or n_out < 3:
+        return finite
+
+    x = finite.astype(np.float64)
+    v = y[finite]
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        if b + 2 < len(edges):
+            next_lo, next_hi = edges[b + 1], edges[b + 2]
+        else:
+            next_lo, next_hi = n - 1, n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = v[next_lo:next_hi].mean()
+
+        area = np.abs((x[a] - avg_x) * (v[lo:hi] - v[a]) - (x[a] - x[lo:hi]) * (avg_y - v[a]))
+        a = lo + int(np.argmax(area))
+        keep[b + 1] = a
+
+    return finite[keep]
+
+
+def minmax_indices(y, n_buckets):
+    """Sorted positions of each bucket's min and max in `y` (NaNs ignored)."""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.flatnonzero(np.isfinite(y))
+
+    size = -(-n // n_buckets)
+    rows = -(-n // size)
+    padded = np.full(rows * size, np.nan)
+    padded[:n] = y
+    blocks = padded.reshape(rows, size)
+    missing = np.isnan(blocks)
+
+    base = np.arange(rows) * size
+    lows = base + np.argmin(np.where(missing, np.inf, blocks), axis=1)
+    highs = base + np.argmax(np.where(missing, -np.inf, blocks), axis=1)
+
+    keep = np.unique(np.concatenate([lows, highs]))
+    keep = keep[keep < n]
+    return keep[np.isfinite(y[keep])]
+
+
+def ohlc_buckets(n, n_buckets):
+    """Start positions of `n_buckets` near-equal buckets over `n` bars."""
+    if n <= n_buckets:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n, n_buckets + 1).astype(np.int64)[:-1])
+
+
+class ChartData:
+    """
+    Decimated, cached views of one OHLCV/indicator frame.
+
+    The x axis is the 'Date' column when present, else the index. `x_range`
+    arguments are (start, end) in x units, inclusive; None means everything.
+    """
+
+    def __init__(self, df, max_entries=128):
+        # Weak so a cached ChartData doesn't keep a discarded frame alive
+        self._frame = weakref.ref(df)
+        self.x = df["Date"].to_numpy() if "Date" in df.columns else df.index.to_numpy()
+        self.max_entries = max_entries
+        self._views = OrderedDict()
+
+    def _column(self, col):
+        df = self._frame()
+        if df is None:
+            raise ValueError("❌ The frame behind this ChartData no longer exists.")
+        return df[col].to_numpy(dtype=np.float64)
+
+    def _to_x(self, value):
+        if self.x.dtype.kind == "M":
+            return pd.Timestamp(value).to_datetime64()
+        return value
+
+    def window(self, x_range=None):
+        """Positions [lo, hi) of the bars inside `x_range`."""
+        if x_range is None:
+            return 0, len(self.x)
+        start, end = x_range
+        lo = np.searchsorted(self.x, self._to_x(start), "left") if start is not None else 0
+        hi = np.searchsorted(self.x, self._to_x(end), "right") if end is not None else len(self.x)
+        return int(lo), int(hi)
+
+    def _cached(self, key, build):
+        if key in self._views:
+            self._views.move_to_end(key)
+            return self._views[key]
+        view = build()
+        self._views[key] = view
+        if len(self._views) > self.max_entries:
+            self._views.popitem(last=False)
+        return view
+
+    def line(self, col, width=DEFAULT_WIDTH, x_range=None):
+        """(x, y) of `col` reduced with LTTB to about `width` points."""
+        lo, hi = self.window(x_range)
+
+        def build():
+            y = self._column(col)[lo:hi]
+            keep = lo + lttb_indices(y, width)
+            return self.x[keep], y[keep - lo]
+
+        return self._cached(("line", col, width, lo, hi), build)
+
+    def bars(self, col, width=DEFAULT_WIDTH, x_range=None):
+        """(x, y) of `col` keeping each pixel bucket's min and max."""
+        lo, hi = self.window(x_range)
+
+        def build():
+            y = self._column(col)[lo:hi]
+            keep = lo + minmax_indices(y, width)
+            return self.x[keep], y[keep - lo]
+
+        return self._cached(("bars", col, width, lo, hi), build)
+
+    def ohlc(self, width=DEFAULT_WIDTH, x_range=None):
+        """OHLCV bars aggregated to about width / PIXELS_PER_CANDLE candles."""
+        lo, hi = self.window(x_range)
+
+        def build():
+            if hi <= lo:
+                return pd.DataFrame(columns=["Date", "Open", "High", "Low", "Close", "Volume"])
+            starts = ohlc_buckets(hi - lo, max(width // PIXELS_PER_CANDLE, 1))
+            ends = np.append(starts[1:], hi - lo) - 1
+            columns = {"Date": self.x[lo:hi][starts]}
+            columns["Open"] = self._column("Open")[lo:hi][starts]
+            columns["High"] = np.maximum.reduceat(self._column("High")[lo:hi], starts)
+            columns["Low"] = np.minimum.reduceat(self._column("Low")[lo:hi], starts)
+            columns["Close"] = self._column("Close")[lo:hi][ends]
+            df = self._frame()
+            if df is not None and "Volume" in df.columns:
+                columns["Volume"] = np.add.reduceat(self._column("Volume")[lo:hi], starts)
+            return pd.DataFrame(columns)
+
+        return self._cached(("ohlc", width, lo, hi), build)
+
+
+_chart_data = {}
+
+
+def chart_data(df):
+    """The ChartData for `df`, reused across calls while the frame (and its columns) stay the same."""
+    key = id(df)
+    signature = (tuple(df.columns), len(df))
+    entry = _chart_data.get(key)
+    if entry is not None and entry[0]() is df and entry[1] == signature:
+        return entry[2]
+
+    data = ChartData(df)
+    ref = weakref.ref(df, lambda _, key=key: _chart_data.pop(key, None))
+    _chart_data[key] = (ref, signature, data)
+    return data
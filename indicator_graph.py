@@ -0,0 +1,276 @@
+"""
+Indicator computation graph with shared intermediate series.
+
+Each indicator declares the primitive series it needs (EMA(n), SMA(n), rolling
+std, true range, rolling high/low, ...). An IndicatorGraph computes every
+primitive at most once per request and hands the same Series to every
+indicator that asks for it, so e.g. EMA(12) is shared by an "EMA" request and
+a "MACD" request, and ten Bollinger Band variants with the same length share
+one rolling mean.
+
+The formulas follow pandas_ta's native (non TA-Lib) implementations, so the
+results line up with the `compute_*` functions in indicators.py.
+
+Example:
+    graph = IndicatorGraph(df)
+    results = graph.compute_many([("EMA", {"length": 12}), ("MACD", {}), ("RSI", {"length": 14})])
+"""
+import inspect
+import sys
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from profiling import instrumented
+
+
+def _non_zero_range(x, y):
+    # Same guard pandas_ta uses to avoid dividing by a zero range
+    diff = x - y
+    if diff.eq(0).any():
+        diff += sys.float_info.epsilon
+    return diff
+
+
+def _ema(series, length):
+    """EMA seeded with the SMA of the first `length` values (TA-Lib style)."""
+    series = series.copy()
+    if len(series) < length:
+        # Not enough bars to seed; pandas_ta returns nothing here
+        return series * np.nan
+    sma_nth = series.iloc[0:length].mean()
+    series.iloc[:length - 1] = np.nan
+    series.iloc[length - 1] = sma_nth
+    return series.ewm(span=length, adjust=False).mean()
+
+
+def _rma(series, length):
+    """Wilder's moving average."""
+    return series.ewm(alpha=1.0 / length, adjust=False).mean()
+
+
+def _from_first_valid(series):
+    first = series.first_valid_index()
+    return series.loc[first:] if first is not None else series
+
+
+# Primitive series: key -> function(graph, *args). Primitives may depend on other primitives.
+
+def _p_ema(graph, length):
+    return _ema(graph.df["Close"], length)
+
+
+def _p_sma(graph, length):
+    return graph.df["Close"].rolling(length).mean()
+
+
+def _p_std(graph, length, ddof):
+    return graph.df["Close"].rolling(length).std(ddof=ddof)
+
+
+def _p_diff(graph):
+    return graph.df["Close"].diff()
+
+
+def _p_gain_rma(graph, length):
+    return _rma(graph.get(("diff",)).clip(lower=0), length)
+
+
+def _p_loss_rma(graph, length):
+    return _rma(graph.get(("diff",)).clip(upper=0), length)
+
+
+def _p_true_range(graph):
+    high, low = graph.df["High"], graph.df["Low"]
+    prev_close = graph.df["Close"].shift(1)
+    ranges = pd.concat([_non_zero_range(high, low), high - prev_close, prev_close - low], axis=1)
+    return ranges.abs().max(axis=1)
+
+
+def _p_atr(graph, length):
+    tr = graph.get(("true_range",)).copy()
+    if len(tr) < length:
+        return tr * np.nan
+    sma_nth = tr.iloc[0:length].mean()
+    tr.iloc[:length - 1] = np.nan
+    tr.iloc[length - 1] = sma_nth
+    return _rma(tr, length)
+
+
+def _p_rolling_low(graph, length):
+    return graph.df["Low"].rolling(length).min()
+
+
+def _p_rolling_high(graph, length):
+    return graph.df["High"].rolling(length).max()
+
+
+def _p_stoch_raw(graph, k):
+    ll = graph.get(("rolling_low", k))
+    hh = graph.get(("rolling_high", k))
+    return 100 * (graph.df["Close"] - ll) / _non_zero_range(hh, ll)
+
+
+def _p_macd_line(graph, fast, slow):
+    return graph.get(("ema", fast)) - graph.get(("ema", slow))
+
+
+def _p_obv(graph):
+    sign = np.sign(graph.df["Close"].diff())
+    return (sign * graph.df["Volume"]).cumsum()
+
+
+PRIMITIVES = {
+    "ema": _p_ema,
+    "sma": _p_sma,
+    "std": _p_std,
+    "diff": _p_diff,
+    "gain_rma": _p_gain_rma,
+    "loss_rma": _p_loss_rma,
+    "true_range": _p_true_range,
+    "atr": _p_atr,
+    "rolling_low": _p_rolling_low,
+    "rolling_high": _p_rolling_high,
+    "stoch_raw": _p_stoch_raw,
+    "macd_line": _p_macd_line,
+    "obv": _p_obv,
+}
+
+
+# Indicators: which primitives they need, and how to assemble the output from them.
+
+IndicatorSpec = namedtuple("IndicatorSpec", ["requires", "build"])
+
+
+def _build_ema(graph, length=14):
+    return graph.get(("ema", length)).rename("EMA")
+
+
+def _build_macd(graph, fast=12, slow=26, signal=9):
+    if slow < fast:
+        fast, slow = slow, fast
+    macd = graph.get(("macd_line", fast, slow))
+    signal_line = _ema(_from_first_valid(macd), signal).reindex(macd.index)
+    return pd.DataFrame({"MACD": macd, "MACD_S": signal_line, "MACD_H": macd - signal_line})
+
+
+def _build_rsi(graph, length=9):
+    gain = graph.get(("gain_rma", length))
+    loss = graph.get(("loss_rma", length))
+    return (100 * gain / (gain + loss.abs())).rename("RSI")
+
+
+def _build_stoch(graph, k=14, d=3, smooth_k=3):
+    stoch = graph.get(("stoch_raw", k))
+    if smooth_k == 1:
+        stoch_k = stoch
+    else:
+        stoch_k = _from_first_valid(stoch).rolling(smooth_k).mean().reindex(stoch.index)
+    stoch_d = _from_first_valid(stoch_k).rolling(d).mean().reindex(stoch.index)
+    return pd.DataFrame({"Stoch_K": stoch_k, "Stoch_D": stoch_d})
+
+
+def _build_bbands(graph, length=20, std=2, ddof=1):
+    mid = graph.get(("sma", length))
+    deviation = std * graph.get(("std", length, ddof))
+    lower = mid - deviation
+    upper = mid + deviation
+    ulr = _non_zero_range(upper, lower)
+    return pd.DataFrame({
+        "BBL": lower,
+        "BBM": mid,
+        "BBU": upper,
+        "BBB": 100 * ulr / mid,
+        "BBP": _non_zero_range(graph.df["Close"], lower) / ulr,
+    })
+
+
+def _build_atr(graph, length=14):
+    return graph.get(("atr", length)).rename("ATR")
+
+
+def _build_obv(graph):
+    return graph.get(("obv",)).rename("OBV")
+
+
+INDICATORS = {
+    "EMA": IndicatorSpec(lambda p: [("ema", p["length"])], _build_ema),
+    "MACD": IndicatorSpec(
+        lambda p: [("macd_line", min(p["fast"], p["slow"]), max(p["fast"], p["slow"]))],
+        _build_macd,
+    ),
+    "RSI": IndicatorSpec(lambda p: [("gain_rma", p["length"]), ("loss_rma", p["length"])], _build_rsi),
+    "Stochastic": IndicatorSpec(lambda p: [("stoch_raw", p["k"])], _build_stoch),
+    "Bollinger Bands": IndicatorSpec(
+        lambda p: [("sma", p["length"]), ("std", p["length"], p["ddof"])],
+        _build_bbands,
+    ),
+    "ATR": IndicatorSpec(lambda p: [("atr", p["length"])], _build_atr),
+    "OBV": IndicatorSpec(lambda p: [("obv",)], _build_obv),
+}
+
+
+def default_params(indicator):
+    """Default parameters of an indicator in the graph."""
+    signature = inspect.signature(INDICATORS[indicator].build)
+    return {name: p.default for name, p in list(signature.parameters.items())[1:]}
+
+
+class IndicatorGraph:
+    """
+    Computes indicators over one OHLCV frame, sharing primitive series between them.
+
+    `computed` / `reused` count primitive evaluations vs. lookups served from
+    the graph, which shows how much overlap a batch of requests had.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._series = {}
+        self.computed = 0
+        self.reused = 0
+
+    def get(self, key):
+        """Return the primitive series for `key`, e.g. ("ema", 12), computing it once."""
+        if key in self._series:
+            self.reused += 1
+            return self._series[key]
+
+        name, *args = key
+        series = PRIMITIVES[name](self, *args)
+        self._series[key] = series
+        self.computed += 1
+        return series
+
+    def compute(self, indicator, **params):
+        return self.compute_many([(indicator, params)])[0]
+
+    def compute_many(self, requests):
+        """
+        Compute a list of (indicator, params) requests.
+        All declared primitives are resolved up front, then each indicator is assembled.
+        """
+        requests = [(indicator, {**default_params(indicator), **(params or {})})
+                    for indicator, params in requests]
+        for indicator, params in requests:
+            for key in INDICATORS[indicator].requires(params):
+                self.get(key)
+        return [INDICATORS[indicator].build(self, **params) for indicator, params in requests]
+
+
+@instrumented()
+def apply_indicator_graph(df, selected_indicators, params):
+    """
+    Graph-backed equivalent of strategies.apply_selected_indicators: adds each
+    selected indicator's column(s) to df, sharing intermediates between them.
+    """
+    graph = IndicatorGraph(df)
+    requests = [(indicator, params.get(indicator, {})) for indicator in selected_indicators]
+    for (indicator, _), result in zip(requests, graph.compute_many(requests)):
+        if isinstance(result, pd.Series):
+            df[indicator] = result
+        else:
+            for col in result.columns:
+                df[col] = result[col]
+    return df
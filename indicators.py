@@ -1,38 +1,120 @@
+import os
+
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
+
+import kernels
+
+# Which implementation the compute_* functions use:
+# - "numba": the array kernels in kernels.py (needs numba to be fast)
+# - "pandas_ta": pandas_ta, the reference implementation
+# - "auto": numba when it is installed, pandas_ta otherwise
+BACKENDS = ("auto", "numba", "pandas_ta")
+_backend = os.environ.get("INDICATOR_BACKEND", "auto")
+
+
+def set_backend(name):
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"❌ Unknown indicator backend '{name}'. Choose from {BACKENDS}.")
+    _backend = name
+
+
+def get_backend(backend=None):
+    """Resolve `backend` (or the module default) to "numba" or "pandas_ta"."""
+    backend = backend or _backend
+    if backend == "auto":
+        return "numba" if kernels.HAVE_NUMBA else "pandas_ta"
+    if backend not in BACKENDS:
+        raise ValueError(f"❌ Unknown indicator backend '{backend}'. Choose from {BACKENDS}.")
+    return backend
+
+
+def _ta():
+    # pandas_ta is slow to import; only pay for it when it's used
+    import pandas_ta as ta
+    return ta
+
+
+def _arrays(df, *columns):
+    return [df[col].to_numpy(dtype=np.float64) for col in columns]
+
+
+def _frame(df, names, values):
+    return pd.DataFrame(dict(zip(names, values)), index=df.index)
+
+
+def _empty(df, names):
+    # pandas_ta returns None when there are fewer bars than the lookback
+    return _frame(df, names, [np.full(len(df), np.nan)] * len(names))
+
+
+def _named(series, df, name):
+    return _empty(df, [name])[name] if series is None else series.rename(name)
+
 
 # Trend
-def compute_ema(df, length=14):
-    ema_df = ta.ema(df['Close'], length=length)
-    ema_df.columns = ['EMA_14']
-    return ema_df
+def compute_ema(df, length=14, backend=None):
+    if get_backend(backend) == "pandas_ta":
+        return _named(_ta().ema(df['Close'], length=length), df, 'EMA')
+    return pd.Series(kernels.ema(*_arrays(df, 'Close'), length), index=df.index, name='EMA')
 # Momentum
-def compute_macd(df, fast=12, slow=26, signal=9):
-    macd_df = ta.macd(df['Close'], fast=fast, slow=slow, signal=signal)
-    macd_df.columns = ['MACD', 'MACD_S', 'MACD_H']
-    return macd_df
+def compute_macd(df, fast=12, slow=26, signal=9, backend=None):
+    if get_backend(backend) == "pandas_ta":
+        macd_df = _ta().macd(df['Close'], fast=fast, slow=slow, signal=signal)
+        if macd_df is None:
+            return _empty(df, ['MACD', 'MACD_S', 'MACD_H'])
+        # pandas_ta orders the columns macd, histogram, signal
+        macd_df.columns = ['MACD', 'MACD_H', 'MACD_S']
+        return macd_df[['MACD', 'MACD_S', 'MACD_H']]
+    return _frame(df, ['MACD', 'MACD_S', 'MACD_H'], kernels.macd(*_arrays(df, 'Close'), fast, slow, signal))
 
-def compute_rsi(df, length=9):
-    return ta.rsi(df['Close'], length=length)
+def compute_rsi(df, length=9, backend=None):
+    if get_backend(backend) == "pandas_ta":
+        return _named(_ta().rsi(df['Close'], length=length), df, 'RSI')
+    return pd.Series(kernels.rsi(*_arrays(df, 'Close'), length), index=df.index, name='RSI')
 
-def compute_stoch(df, k=14, d=3, smooth_k=3):
-    stoch_df = ta.stoch(df['High'], df['Low'], df['Close'], k=k, d=d, smooth_k=smooth_k)
-    stoch_df.columns = ['Stoch_K', 'Stoch_D']  # fixed names to match plot
-    return stoch_df
+def compute_stoch(df, k=14, d=3, smooth_k=3, backend=None):
+    if get_backend(backend) == "pandas_ta":
+        stoch_df = _ta().stoch(df['High'], df['Low'], df['Close'], k=k, d=d, smooth_k=smooth_k)
+        if stoch_df is None:
+            return _empty(df, ['Stoch_K', 'Stoch_D'])
+        # Newer pandas_ta adds a third (histogram) column after %K and %D
+        stoch_df = stoch_df.iloc[:, :2]
+        stoch_df.columns = ['Stoch_K', 'Stoch_D']  # fixed names to match plot
+        return stoch_df
+    return _frame(df, ['Stoch_K', 'Stoch_D'], kernels.stoch(*_arrays(df, 'High', 'Low', 'Close'), k, d, smooth_k))
 
 # Volatility
-def compute_bbands(df, length=20, std=2):
-    bbands_df = ta.bbands(df['Close'], length=length, std=std)
-    bbands_df.columns = ["BBL", "BBM", "BBU", "BBB", "BBP"]
-    return bbands_df
+def compute_bbands(df, length=20, std=2, backend=None):
+    if get_backend(backend) == "pandas_ta":
+        bbands_df = _ta().bbands(df['Close'], length=length, std=std)
+        if bbands_df is None:
+            return _empty(df, ["BBL", "BBM", "BBU", "BBB", "BBP"])
+        bbands_df.columns = ["BBL", "BBM", "BBU", "BBB", "BBP"]
+        return bbands_df
+    return _frame(df, ["BBL", "BBM", "BBU", "BBB", "BBP"], kernels.bbands(*_arrays(df, 'Close'), length, std))
 
-def compute_atr(df, length=14):
-    return ta.atr(df['High'], df['Low'], df['Close'], length=length)
+def compute_atr(df, length=14, backend=None):
+    if get_backend(backend) == "pandas_ta":
+        return _named(_ta().atr(df['High'], df['Low'], df['Close'], length=length), df, 'ATR')
+    return pd.Series(kernels.atr(*_arrays(df, 'High', 'Low', 'Close'), length), index=df.index, name='ATR')
 
 # Volume
-def compute_obv(df):
-    return ta.obv(df['Close'], df['Volume'])
+def compute_obv(df, backend=None):
+    if get_backend(backend) == "pandas_ta":
+        return _named(_ta().obv(df['Close'], df['Volume']), df, 'OBV')
+    return pd.Series(kernels.obv(*_arrays(df, 'Close', 'Volume')), index=df.index, name='OBV')
 
 # quantitative
 
-
+# Input columns each indicator reads, used to fingerprint data for caching
+INDICATOR_INPUTS = {
+    "compute_ema": ("Close",),
+    "compute_macd": ("Close",),
+    "compute_rsi": ("Close",),
+    "compute_stoch": ("High", "Low", "Close"),
+    "compute_bbands": ("Close",),
+    "compute_atr": ("High", "Low", "Close"),
+    "compute_obv": ("Close", "Volume"),
+}
@@ -0,0 +1,458 @@
+"""
+Array kernels for the indicators in indicators.py.
+
+Every function takes float64 numpy arrays and returns float64 arrays, with no
+pandas objects in between, so sweeps can compute indicators without building
+DataFrames. Inputs are 1-D series, or 2-D (bars x columns) arrays that are
+computed column by column in one call; columns shorter than the array are
+padded with NaN at the end and their bar counts passed as `lengths` (this is
+how portfolio.py computes a whole universe at once). The recurrences (EMA/RMA, rolling mean/var) repeat pandas' own
+arithmetic, which pandas_ta is built on, so results match the pandas_ta
+backend to within float rounding; run `python kernels.py` for a parity report
+(bench.py's kernels.parity check asserts it, on empty and all-NaN inputs too).
+
+The loops are compiled with numba when it is installed (pip install numba)
+and run as plain Python otherwise, which is only practical for small inputs.
+numba itself is only imported the first time a compiled loop runs, so
+importing this module (and indicators/strategies on top of it) stays cheap.
+"""
+import importlib.util
+import sys
+from contextlib import contextmanager
+
+import numpy as np
+
+EPSILON = sys.float_info.epsilon
+
+HAVE_NUMBA = importlib.util.find_spec("numba") is not None
+
+_interpreted = False
+
+
+class LazyJit:
+    """
+    `func` compiled with numba.njit(cache=True) on first call (plain `func`
+    without numba). `py_func` is always the uncompiled function.
+    """
+
+    def __init__(self, func):
+        self.py_func = func
+        self._compiled = None
+        self.__name__ = func.__name__
+        self.__doc__ = func.__doc__
+
+    def compile(self):
+        if self._compiled is None:
+            if HAVE_NUMBA:
+                import numba
+                self._compiled = numba.njit(cache=True)(self.py_func)
+            else:
+                self._compiled = self.py_func
+        return self._compiled
+
+    def __call__(self, *args):
+        if _interpreted:
+            return self.py_func(*args)
+        return self.compile()(*args)
+
+
+@contextmanager
+def interpreted():
+    """Run every LazyJit loop as plain Python inside the block, as it runs without numba."""
+    global _interpreted
+    previous, _interpreted = _interpreted, True
+    try:
+        yield
+    finally:
+        _interpreted = previous
+
+
+@LazyJit
+def _ewm(x, alpha, start, seed):
+    """
+    pandas ewm(alpha, adjust=False).mean() down each column j of x from row
+    start[j], with that row replaced by seed[j] (start[j] >= len(x): all NaN).
+    """
+    n, m = x.shape
+    out = np.full((n, m), np.nan)
+    factor = 1.0 - alpha
+    for j in range(m):
+        if start[j] >= n:
+            continue
+        old_wt = 1.0
+        value = seed[j]
+        out[start[j], j] = value
+        for i in range(start[j] + 1, n):
+            old_wt *= factor
+            xi = x[i, j]
+            if xi == xi:
+                if value != xi:
+                    value = (old_wt * value + alpha * xi) / (old_wt + alpha)
+                old_wt = 1.0
+            out[i, j] = value
+    return out
+
+
+@LazyJit
+def _rolling_mean(x, window, start):
+    """pandas rolling(window).mean() down each column j of x from row start[j]: Kahan-compensated running sum."""
+    n, m = x.shape
+    out = np.full((n, m), np.nan)
+    for j in range(m):
+        nobs = 0
+        total = 0.0
+        comp_add = 0.0
+        comp_remove = 0.0
+        neg_ct = 0
+        same_ct = 0
+        prev = np.nan
+        for i in range(start[j], n):
+            if i - start[j] >= window:
+                old = x[i - window, j]
+                if old == old:
+                    nobs -= 1
+                    y = -old - comp_remove
+                    t = total + y
+                    comp_remove = t - total - y
+                    total = t
+                    if np.signbit(old):
+                        neg_ct -= 1
+
+            xi = x[i, j]
+            if xi == xi:
+                nobs += 1
+                y = xi - comp_add
+                t = total + y
+                comp_add = t - total - y
+                total = t
+                if np.signbit(xi):
+                    neg_ct += 1
+                if xi == prev:
+                    same_ct += 1
+                else:
+                    same_ct = 1
+                prev = xi
+
+            if nobs >= window:
+                result = total / nobs
+                if same_ct >= nobs:
+                    result = prev
+                elif neg_ct == 0 and result < 0:
+                    result = 0.0
+                elif neg_ct == nobs and result > 0:
+                    result = 0.0
+                out[i, j] = result
+    return out
+
+
+@LazyJit
+def _rolling_var(x, window, ddof):
+    """pandas rolling(window).var(ddof) down each column of x: Welford with Kahan-compensated mean."""
+    n, m = x.shape
+    out = np.full((n, m), np.nan)
+    for j in range(m):
+        nobs = 0
+        mean = 0.0
+        ssqdm = 0.0
+        comp_add = 0.0
+        comp_remove = 0.0
+        same_ct = 0
+        prev = np.nan
+        for i in range(n):
+            if i >= window:
+                old = x[i - window, j]
+                if old == old:
+                    nobs -= 1
+                    if nobs:
+                        prev_mean = mean - comp_remove
+                        y = old - comp_remove
+                        t = y - mean
+                        comp_remove = t + mean - y
+                        mean -= t / nobs
+                        ssqdm -= (old - prev_mean) * (old - mean)
+                    else:
+                        mean = 0.0
+                        ssqdm = 0.0
+
+            xi = x[i, j]
+            if xi == xi:
+                if xi == prev:
+                    same_ct += 1
+                else:
+                    same_ct = 1
+                prev = xi
+                nobs += 1
+                prev_mean = mean - comp_add
+                y = xi - comp_add
+                t = y - mean
+                comp_add = t + mean - y
+                mean += t / nobs
+                ssqdm += (xi - prev_mean) * (xi - mean)
+
+            if nobs >= window and nobs > ddof:
+                if nobs == 1 or same_ct >= nobs:
+                    out[i, j] = 0.0
+                else:
+                    out[i, j] = max(ssqdm / (nobs - ddof), 0.0)
+    return out
+
+
+@LazyJit
+def _rolling_extreme(x, window, use_max):
+    """Rolling min/max over `window` values down each column of x (monotonic deque of positions)."""
+    n, m = x.shape
+    out = np.full((n, m), np.nan)
+    queue = np.empty(n, dtype=np.int64)
+    for j in range(m):
+        head = 0
+        tail = 0
+        for i in range(n):
+            xi = x[i, j]
+            if use_max:
+                while tail > head and x[queue[tail - 1], j] <= xi:
+                    tail -= 1
+            else:
+                while tail > head and x[queue[tail - 1], j] >= xi:
+                    tail -= 1
+            queue[tail] = i
+            tail += 1
+            if queue[head] <= i - window:
+                head += 1
+            if i >= window - 1:
+                out[i, j] = x[queue[head], j]
+    return out
+
+
+def _columns(x):
+    """x as a (bars x columns) float64 array; a 1-D series is one column."""
+    x = np.asarray(x, dtype=np.float64)
+    return x[:, None] if x.ndim == 1 else x
+
+
+def _bars(x, lengths):
+    """Bars in each column of x: every row, or `lengths` when columns are padded with NaN at the end."""
+    if lengths is None:
+        return np.full(x.shape[1], x.shape[0], dtype=np.int64)
+    return np.asarray(lengths, dtype=np.int64)
+
+
+def _finish(out, bars, shape):
+    """NaN over each column's padding rows, in the shape the inputs came in."""
+    padded = np.arange(len(out))[:, None] >= bars
+    if padded.any():
+        out[padded] = np.nan
+    return out.reshape(shape)
+
+
+def _first_valid(x, bars):
+    if len(x) == 0:
+        return bars
+    valid = ~np.isnan(x)
+    return np.where(valid.any(axis=0), valid.argmax(axis=0), bars)
+
+
+def _non_zero_range(a, b):
+    # pandas_ta's guard: nudge a whole column if any of its ranges is exactly zero
+    diff = a - b
+    zero = (diff == 0).any(axis=0)
+    if zero.any():
+        diff[:, zero] += EPSILON
+    return diff
+
+
+def _sma_seeded_ewm(x, length, alpha, bars):
+    """EWM seeded with the SMA of the first `length` valid values of each column (pandas_ta presma)."""
+    start = _first_valid(x, bars)
+    ok = bars - start >= length
+    seed = np.full(x.shape[1], np.nan)
+    cols = np.flatnonzero(ok)
+    if len(cols):
+        window = x[start[cols] + np.arange(length)[:, None], cols]
+        # Summed along contiguous rows so each seed rounds exactly as a 1-D sum would
+        seed[cols] = np.ascontiguousarray(window.T).sum(axis=1) / length
+    return _ewm(x, alpha, np.where(ok, start + length - 1, len(x)), seed)
+
+
+def _rma(x, length, bars):
+    start = _first_valid(x, bars)
+    ok = start < bars
+    seed = np.full(x.shape[1], np.nan)
+    seed[ok] = x[start[ok], np.flatnonzero(ok)]
+    return _ewm(x, 1.0 / length, np.where(ok, start, len(x)), seed)
+
+
+def _rolling_mean_from_first_valid(x, window, bars):
+    return _rolling_mean(x, window, _first_valid(x, bars))
+
+
+def ema(close, length=14, lengths=None):
+    x = _columns(close)
+    bars = _bars(x, lengths)
+    return _finish(_sma_seeded_ewm(x, length, 2.0 / (length + 1), bars), bars, np.shape(close))
+
+
+def macd(close, fast=12, slow=26, signal=9, lengths=None):
+    """(macd, signal line, histogram)."""
+    if slow < fast:
+        fast, slow = slow, fast
+    x = _columns(close)
+    bars = _bars(x, lengths)
+    line = ema(x, fast, bars) - ema(x, slow, bars)
+    signal_line = ema(line, signal, bars)
+    # pandas_ta returns nothing when the signal line can't be seeded
+    line[:, np.isnan(signal_line).all(axis=0)] = np.nan
+    shape = np.shape(close)
+    return _finish(line, bars, shape), _finish(signal_line, bars, shape), _finish(line - signal_line, bars, shape)
+
+
+def rsi(close, length=9, lengths=None):
+    x = _columns(close)
+    bars = _bars(x, lengths)
+    diff = np.empty_like(x)
+    diff[:1] = np.nan
+    np.subtract(x[1:], x[:-1], out=diff[1:])
+    gain = _rma(np.where(diff > 0, diff, np.where(np.isnan(diff), np.nan, 0.0)), length, bars)
+    loss = _rma(np.where(diff < 0, diff, np.where(np.isnan(diff), np.nan, 0.0)), length, bars)
+    out = 100 * gain / (gain + np.abs(loss))
+    # Same minimum history pandas_ta requires
+    out[:, bars <= length] = np.nan
+    return _finish(out, bars, np.shape(close))
+
+
+def stoch(high, low, close, k=14, d=3, smooth_k=3, lengths=None):
+    """(%K, %D)."""
+    high, low, x = _columns(high), _columns(low), _columns(close)
+    bars = _bars(x, lengths)
+    lowest = _rolling_extreme(low, k, False)
+    highest = _rolling_extreme(high, k, True)
+    raw = 100 * (x - lowest) / _non_zero_range(highest, lowest)
+    stoch_k = raw if smooth_k == 1 else _rolling_mean_from_first_valid(raw, smooth_k, bars)
+    stoch_d = _rolling_mean_from_first_valid(stoch_k, d, bars)
+    short = bars < k + d + smooth_k
+    stoch_k[:, short] = np.nan
+    stoch_d[:, short] = np.nan
+    return _finish(stoch_k, bars, np.shape(close)), _finish(stoch_d, bars, np.shape(close))
+
+
+def bbands(close, length=20, std=2, ddof=1, lengths=None):
+    """(lower, mid, upper, bandwidth, percent)."""
+    x = _columns(close)
+    bars = _bars(x, lengths)
+    mid = _rolling_mean(x, length, np.zeros(x.shape[1], dtype=np.int64))
+    deviation = std * np.sqrt(_rolling_var(x, length, ddof))
+    lower = mid - deviation
+    upper = mid + deviation
+    ulr = _non_zero_range(upper, lower)
+    outputs = lower, mid, upper, 100 * ulr / mid, _non_zero_range(x, lower) / ulr
+    return tuple(_finish(out, bars, np.shape(close)) for out in outputs)
+
+
+def true_range(high, low, close, lengths=None):
+    high, low, x = _columns(high), _columns(low), _columns(close)
+    bars = _bars(x, lengths)
+    prev_close = np.empty_like(x)
+    prev_close[:1] = np.nan
+    prev_close[1:] = x[:-1]
+    # fmax skips NaNs like nanmax, without warning on bars where all three are NaN
+    out = np.fmax(np.fmax(np.abs(_non_zero_range(high, low)), np.abs(high - prev_close)), np.abs(prev_close - low))
+    return _finish(out, bars, np.shape(close))
+
+
+def atr(high, low, close, length=14, lengths=None):
+    x = _columns(close)
+    bars = _bars(x, lengths)
+    out = _sma_seeded_ewm(true_range(_columns(high), _columns(low), x, bars), length, 1.0 / length, bars)
+    out[:, bars <= length] = np.nan
+    return _finish(out, bars, np.shape(close))
+
+
+def obv(close, volume, lengths=None):
+    x, volume = _columns(close), _columns(volume)
+    bars = _bars(x, lengths)
+    out = np.empty_like(x)
+    out[:1] = np.nan
+    out[1:] = np.sign(x[1:] - x[:-1]) * volume[1:]
+    out[1:] = np.cumsum(out[1:], axis=0)
+    return _finish(out, bars, np.shape(close))
+
+
+# Indicator -> (input columns, kernel, output names), for computing indicators straight from arrays
+KERNELS = {
+    "EMA": (("Close",), ema, ("EMA",)),
+    "MACD": (("Close",), macd, ("MACD", "MACD_S", "MACD_H")),
+    "RSI": (("Close",), rsi, ("RSI",)),
+    "Stochastic": (("High", "Low", "Close"), stoch, ("Stoch_K", "Stoch_D")),
+    "Bollinger Bands": (("Close",), bbands, ("BBL", "BBM", "BBU", "BBB", "BBP")),
+    "ATR": (("High", "Low", "Close"), atr, ("ATR",)),
+    "OBV": (("Close", "Volume"), obv, ("OBV",)),
+}
+
+
+def indicator_arrays(arrays, indicator, params=None, lengths=None):
+    """
+    Compute one indicator from a mapping of float64 column arrays (1-D, or
+    2-D with `lengths` as the kernels take them).
+    Returns {output name: array}, e.g. {"MACD": ..., "MACD_S": ..., "MACD_H": ...}.
+    """
+    inputs, kernel, names = KERNELS[indicator]
+    result = kernel(*(np.asarray(arrays[col], dtype=np.float64) for col in inputs), **(params or {}),
+                    lengths=lengths)
+    if len(names) == 1:
+        result = (result,)
+    return dict(zip(names, result))
+
+
+PARITY_BACKENDS = ("numba", "python", "pandas_ta")
+
+
+def _indicator_output(df, name, backend):
+    import indicators
+
+    func = getattr(indicators, name)
+    if backend == "python":
+        with interpreted():
+            return func(df, backend="numba")
+    return func(df, backend=backend)
+
+
+def parity_report(df, backend="numba", reference="pandas_ta"):
+    """
+    Max absolute difference of each indicator output computed with `backend`
+    vs `reference` on `df`, as (indicator, column, NaNs match, max |diff|)
+    rows. Backends are PARITY_BACKENDS; "python" is the kernels run without
+    numba. If the reference raises, the indicator gets one row with
+    NaNs match = None (pandas_ta fails on some degenerate inputs).
+    """
+    import indicators
+
+    for name in (backend, reference):
+        if name not in PARITY_BACKENDS:
+            raise ValueError(f"❌ Unknown parity backend '{name}'. Choose from {PARITY_BACKENDS}.")
+
+    rows = []
+    for name in indicators.INDICATOR_INPUTS:
+        ours = _indicator_output(df, name, backend)
+        try:
+            ref_output = _indicator_output(df, name, reference)
+        except Exception:
+            rows.append((name, "", None, float("nan")))
+            continue
+        if hasattr(ref_output, "columns"):
+            pairs = [(col, ref_output[col], ours[col]) for col in ref_output.columns]
+        else:
+            pairs = [(ref_output.name, ref_output, ours)]
+        for col, ref, new in pairs:
+            ref, new = ref.to_numpy(dtype=np.float64), new.to_numpy(dtype=np.float64)
+            same_nans = bool((np.isnan(ref) == np.isnan(new)).all())
+            valid = ~np.isnan(ref) & ~np.isnan(new)
+            max_diff = float(np.abs(ref[valid] - new[valid]).max()) if valid.any() else 0.0
+            rows.append((name, col, same_nans, max_diff))
+    return rows
+
+
+if __name__ == "__main__":
+    from utils import load_csv_data
+
+    for name, col, same_nans, max_diff in parity_report(load_csv_data("btc.csv")):
+        status = "⚠️" if same_nans is None else "✅" if same_nans and max_diff < 1e-9 else "❌"
+        print(f"{status} {name:16} {col:8} NaNs match: {same_nans}  max |diff|: {max_diff:.3g}")
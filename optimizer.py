@@ -0,0 +1,214 @@
+"""
+Batch parameter sweep over indicator settings and strategies.
+
+Every combination of indicator parameters is applied once per symbol and then
+scored against each requested strategy. Combinations are spread over a process
+pool; the OHLCV arrays live in shared memory so workers attach to them instead
+of receiving a pickled copy of the data with every task.
+
+Example:
+    python optimizer.py --csv btc.csv --grid '{"EMA": {"length": [10, 20, 50]}, "RSI": {"length": [9, 14]}}'
+"""
+import argparse
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from cache import IndicatorCache
+from compare import compare_strategies
+from strategies import INDICATOR_FUNCTIONS, apply_selected_indicators
+from signals import STRATEGY_NAMES
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# Per-worker views onto the shared OHLCV segments, filled in by init_worker
+_worker_data = {}
+_worker_segments = []
+# Indicator settings repeat across combinations, so each worker memoizes them
+_worker_cache = None
+
+
+def expand_grid(param_grid):
+    """
+    Turn {"EMA": {"length": [10, 20]}, "RSI": {"length": [9, 14]}} into the list
+    of every {"EMA": {"length": 10}, "RSI": {"length": 9}}-style combination.
+    """
+    for indicator in param_grid:
+        if not callable(INDICATOR_FUNCTIONS.get(indicator)):
+            raise ValueError(f"❌ '{indicator}' is not a sweepable indicator in INDICATOR_FUNCTIONS.")
+
+    per_indicator = []
+    for indicator, grid in param_grid.items():
+        names = list(grid)
+        values = [v if isinstance(v, (list, tuple)) else [v] for v in grid.values()]
+        per_indicator.append([
+            (indicator, dict(zip(names, combo))) for combo in itertools.product(*values)
+        ])
+
+    return [dict(combo) for combo in itertools.product(*per_indicator)]
+
+
+def share_frame(df):
+    """Copy a frame's OHLCV + Date into one shared memory segment."""
+    n = len(df)
+    shm = shared_memory.SharedMemory(create=True, size=max(8 * n * (len(OHLCV_COLUMNS) + 1), 1))
+    block = np.ndarray((len(OHLCV_COLUMNS), n), dtype=np.float64, buffer=shm.buf)
+    for i, col in enumerate(OHLCV_COLUMNS):
+        block[i] = df[col].to_numpy(dtype=np.float64)
+    dates = np.ndarray(n, dtype=np.int64, buffer=shm.buf, offset=block.nbytes)
+    dates[:] = pd.to_datetime(df["Date"]).to_numpy(dtype="datetime64[ns]").view(np.int64)
+    return shm, n
+
+
+def _attach(shm_name, n):
+    shm = shared_memory.SharedMemory(name=shm_name, track=False)
+    block = np.ndarray((len(OHLCV_COLUMNS), n), dtype=np.float64, buffer=shm.buf)
+    dates = np.ndarray(n, dtype=np.int64, buffer=shm.buf, offset=block.nbytes)
+    block.flags.writeable = False
+    dates.flags.writeable = False
+
+    columns = {"Date": dates.view("datetime64[ns]")}
+    for i, col in enumerate(OHLCV_COLUMNS):
+        columns[col] = block[i]
+    return shm, columns
+
+
+def init_worker(layout, cache_bytes):
+    global _worker_cache
+    _worker_cache = IndicatorCache(max_bytes=cache_bytes)
+    for symbol, (shm_name, n) in layout.items():
+        shm, columns = _attach(shm_name, n)
+        _worker_segments.append(shm)
+        _worker_data[symbol] = columns
+
+
+def worker_frame(key):
+    """A fresh DataFrame over the shared arrays registered under `key`, inside a pool worker."""
+    # Fresh frame each time so indicator columns don't leak between tasks
+    return pd.DataFrame(_worker_data[key], copy=False)
+
+
+def worker_cache():
+    """The IndicatorCache of the current pool worker (None outside one)."""
+    return _worker_cache
+
+
+def evaluate_combination(df, params, strategies, initial_balance=10000, trade_size_pct=0.10, cache=None):
+    """
+    Apply one parameter combination and score it against each strategy, with
+    BacktestResult's metrics (all strategies in one compare_strategies pass).
+    """
+    df = apply_selected_indicators(df, list(params), params, cache=cache)
+    metrics = compare_strategies(df, strategies, initial_balance, trade_size_pct).metrics
+    return [{"strategy": strategy, **row} for strategy, row in zip(metrics.index, metrics.to_dict("records"))]
+
+
+def _run_task(task):
+    symbol, params, strategies, initial_balance, trade_size_pct = task
+    df = worker_frame(symbol)
+    rows = evaluate_combination(df, params, strategies, initial_balance, trade_size_pct, cache=_worker_cache)
+    for row in rows:
+        row["symbol"] = symbol
+        row["params"] = json.dumps(params, sort_keys=True)
+    return rows
+
+
+def run_sweep(datasets, param_grid, strategies=None, max_workers=None, rank_by="sharpe_ratio",
+              initial_balance=10000, trade_size_pct=0.10, chunksize=None, cache_bytes=128 * 1024**2):
+    """
+    Evaluate every parameter combination x strategy x symbol on a process pool.
+
+    Parameters:
+    - datasets (dict | DataFrame): {symbol: OHLCV DataFrame}, or a single DataFrame
+    - param_grid (dict): {indicator: {param: [values, ...]}}, keys from INDICATOR_FUNCTIONS
+    - strategies (list): names accepted by generate_signals (defaults to all)
+    - max_workers (int): pool size (defaults to every core)
+    - rank_by (str): metric column to sort on, best first
+    - cache_bytes (int): per-worker indicator cache budget
+
+    Returns:
+    - DataFrame with one row per (symbol, params, strategy), ranked by `rank_by`
+    """
+    if isinstance(datasets, pd.DataFrame):
+        datasets = {"data": datasets}
+    strategies = list(strategies or STRATEGY_NAMES)
+    combos = expand_grid(param_grid)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    segments = []
+    try:
+        layout = {}
+        for symbol, df in datasets.items():
+            shm, n = share_frame(df)
+            segments.append(shm)
+            layout[symbol] = (shm.name, n)
+
+        tasks = [
+            (symbol, params, strategies, initial_balance, trade_size_pct)
+            for symbol in datasets for params in combos
+        ]
+        if chunksize is None:
+            chunksize = max(1, len(tasks) // (max_workers * 4))
+
+        rows = []
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker,
+                                 initargs=(layout, cache_bytes)) as executor:
+            for task_rows in executor.map(_run_task, tasks, chunksize=chunksize):
+                rows.extend(task_rows)
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
+    results = pd.DataFrame(rows, columns=[
+        "symbol", "strategy", "params", "total_pnl", "total_return",
+        "sharpe_ratio", "max_drawdown", "num_trades", "win_rate"
+    ])
+    return results.sort_values(rank_by, ascending=False, kind="stable").reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep indicator parameters and strategies in parallel.")
+    parser.add_argument("--csv", nargs="*", default=[], help="OHLCV CSV files (symbol = file name)")
+    parser.add_argument("--tickers", nargs="*", default=[], help="Tickers to download with yfinance")
+    parser.add_argument("--start", default="2022-01-01", help="Start date for downloaded tickers")
+    parser.add_argument("--grid", required=True, help="Parameter grid as JSON, or a path to a JSON file")
+    parser.add_argument("--strategies", nargs="*", default=None, help="Strategy names (default: all)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--rank-by", default="sharpe_ratio", help="Metric to rank by")
+    parser.add_argument("--top", type=int, default=20, help="Rows to print")
+    parser.add_argument("--out", default=None, help="Write the full results table to this CSV")
+    args = parser.parse_args(argv)
+
+    from utils import load_csv_data, load_stock_data
+
+    datasets = {}
+    for path in args.csv:
+        datasets[os.path.splitext(os.path.basename(path))[0]] = load_csv_data(path)
+    for ticker in args.tickers:
+        df = load_stock_data(ticker, start=args.start)
+        if not df.empty:
+            datasets[ticker] = df
+    if not datasets:
+        parser.error("no data: pass --csv and/or --tickers")
+
+    grid = args.grid
+    if os.path.exists(grid):
+        with open(grid) as f:
+            grid = f.read()
+    param_grid = json.loads(grid)
+
+    results = run_sweep(datasets, param_grid, strategies=args.strategies,
+                        max_workers=args.workers, rank_by=args.rank_by)
+    if args.out:
+        results.to_csv(args.out, index=False)
+    print(results.head(args.top).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,69 @@
-import plotly.express as px
 import pandas as pd
 import numpy as np
-
-def calculate_pnl(df, signals, trade_size_pct=0.10, initial_balance=10000):
+from functools import cached_property
+
+from profiling import instrumented
+from tradelog import TradeLog
+
+def match_trades(buy_pos, sell_pos):
+    """
+    Pair each buy with the next unused sell that comes after it.
+
+    Same greedy matching as walking both lists with two pointers, but done
+    with searchsorted + cummax on integer positions: the sell matched to
+    buy k is max(first sell after buy k, sell matched to buy k-1 + 1).
+    Returns (entry positions, exit positions).
+    """
+    buy_pos = np.asarray(buy_pos, dtype=np.int64)
+    sell_pos = np.asarray(sell_pos, dtype=np.int64)
+    if len(buy_pos) == 0 or len(sell_pos) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    first_after = np.searchsorted(sell_pos, buy_pos, side="right")
+    k = np.arange(len(buy_pos))
+    matched = np.maximum.accumulate(first_after - k) + k
+
+    valid = matched < len(sell_pos)
+    return buy_pos[valid], sell_pos[matched[valid]]
+
+
+def match_trade_rows(buy_mask, sell_mask):
+    """
+    match_trades for every row of two (rows x bars) boolean masks at once.
+
+    The rows are laid end to end, so one searchsorted covers them all; each
+    row is offset by more than the range of (first sell after - k) so the
+    running max restarts at every row and a buy only matches a sell in its
+    own row. Returns (row, entry position, exit position) per trade, by row.
+    """
+    n = buy_mask.shape[1]
+    buy_flat = np.flatnonzero(buy_mask)
+    sell_flat = np.flatnonzero(sell_mask)
+    if len(buy_flat) == 0 or len(sell_flat) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    first_after = np.searchsorted(sell_flat, buy_flat, side="right")
+    k = np.arange(len(buy_flat))
+    row = buy_flat // n
+    offset = row * (len(buy_flat) + len(sell_flat) + 1)
+    matched = np.maximum.accumulate(first_after - k + offset) - offset + k
+
+    # Sells before the end of each buy's row
+    row_end = np.searchsorted(sell_flat, (row + 1) * n)
+    valid = matched < row_end
+    entry_flat = buy_flat[valid]
+    exit_flat = sell_flat[matched[valid]]
+    return row[valid], entry_flat - row[valid] * n, exit_flat - row[valid] * n
+
+
+def trade_log(df, signals, trade_size_pct=0.10, initial_balance=10000, log=None, run=0):
+    """
+    The trades calculate_pnl makes, appended to `log` (a new TradeLog by
+    default) with bar positions into df. Sweeps can pass one log across runs,
+    tagging each run's trades with its own `run` number.
+    """
     if isinstance(signals, dict):
         buy_signals = signals.get('Buy', pd.DataFrame()).copy()
         sell_signals = signals.get('Sell', pd.DataFrame()).copy()
@@ -15,124 +76,243 @@ def calculate_pnl(df, signals, trade_size_pct=0.10, initial_balance=10000):
     if "Signal" not in signals.columns:
         raise ValueError("❌ 'Signal' column is missing from the signals DataFrame.")
 
-    buys = signals[signals["Signal"] == "Buy"]
-    sells = signals[signals["Signal"] == "Sell"]
-
-    trades = []
+    # Work on integer row positions instead of looking labels up one trade at a time
+    signal_values = signals["Signal"].to_numpy()
+    buy_pos = df.index.get_indexer(signals.index[signal_values == "Buy"])
+    sell_pos = df.index.get_indexer(signals.index[signal_values == "Sell"])
 
-    buy_times = buys.index.tolist()
-    sell_times = sells.index.tolist()
+    # Signals whose timestamp isn't in df can't be priced
+    buy_pos = np.sort(buy_pos[buy_pos >= 0])
+    sell_pos = np.sort(sell_pos[sell_pos >= 0])
 
-    i = j = 0
-    while i < len(buy_times) and j < len(sell_times):
-        buy_time = buy_times[i]
-        sell_time = sell_times[j]
+    entry_pos, exit_pos = match_trades(buy_pos, sell_pos)
+    log = log if log is not None else TradeLog(capacity=len(entry_pos))
 
-        if sell_time > buy_time and buy_time in df.index and sell_time in df.index:
-            entry_price = df.loc[buy_time, 'Close']
-            exit_price = df.loc[sell_time, 'Close']
-            entry_date = df.loc[buy_time, 'Date']
-            exit_date = df.loc[sell_time, 'Date']
+    close = df['Close'].to_numpy(dtype=np.float64)
+    entry_price = close[entry_pos]
+    exit_price = close[exit_pos]
 
-            trade_size = trade_size_pct * initial_balance
-            qty = trade_size / entry_price
-            pnl = (exit_price - entry_price) * qty
+    trade_size = trade_size_pct * initial_balance
+    qty = trade_size / entry_price
+    pnl = (exit_price - entry_price) * qty
+    return log.extend(entry_pos, exit_pos, entry_price, exit_price, qty, pnl, run=run)
 
-            trades.append({
-                'entry_time': entry_date,
-                'exit_time': exit_date,
-                'entry_price': entry_price,
-                'exit_price': exit_price,
-                'qty': qty,
-                'pnl': pnl
-            })
-            i += 1
-            j += 1
-        else:
-            j += 1  # Skip unmatched sell
 
-    trades_df = pd.DataFrame(trades)
+@instrumented()
+def calculate_pnl(df, signals, trade_size_pct=0.10, initial_balance=10000):
+    log = trade_log(df, signals, trade_size_pct, initial_balance)
+    if len(log) == 0:
+        return pd.DataFrame()
+
+    trades_df = pd.DataFrame({
+        'entry_time': df['Date'].iloc[log.column('entry_pos')].reset_index(drop=True),
+        'exit_time': df['Date'].iloc[log.column('exit_pos')].reset_index(drop=True),
+        'entry_price': log.column('entry_price'),
+        'exit_price': log.column('exit_price'),
+        'qty': log.column('qty'),
+        'pnl': log.column('pnl')
+    }, copy=False)
 
     return trades_df
 
 
-
-def calculate_performance(df, signals, initial_balance=10000, trade_size_pct=0.10, risk_free_rate=0.0):
-
-    buy_signals = signals[signals["Signal"] == "Buy"]
-    sell_signals = signals[signals["Signal"] == "Sell"]
-
-
-    if buy_signals.empty or sell_signals.empty:
-        return None
-
-
-    # Prepare signals dict expected by calculate_pnl (if it expects dict)
-    signals_dict = {"Buy": buy_signals, "Sell": sell_signals}
-
-    trades_df = calculate_pnl(df, signals_dict)
-    if trades_df.empty:
-        return None
-
-    balance = initial_balance
-    trade_size = trade_size_pct * initial_balance
-
-    for idx, row in trades_df.iterrows():
-        qty = trade_size / row["entry_price"]
-        pnl = (row["exit_price"] - row["entry_price"]) * qty
-        trades_df.at[idx, "pnl"] = pnl
-
-    total_pnl = trades_df["pnl"].sum()
-    total_return = total_pnl / initial_balance
-
-    daily_returns = trades_df["pnl"] / initial_balance
-
-    if daily_returns.std() == 0 or len(daily_returns) < 2:
-        sharpe_ratio = 0.0
+def backtest_metrics(equity, pnl, initial_balance, periods_per_year, risk_free_rate=0.0):
+    """BacktestResult.metrics for one equity curve and its trades' PnL."""
+    num_trades = len(pnl)
+    if len(equity) == 0:
+        equity_part = {"total_return": 0.0, "sharpe_ratio": 0.0, "max_drawdown": 0.0}
     else:
-        sharpe_ratio = ((daily_returns.mean() - risk_free_rate / 252) / daily_returns.std()) * (252**0.5)
-
-    equity_curve = trades_df["pnl"].cumsum() + initial_balance
-    rolling_max = equity_curve.cummax()
-    drawdown = (equity_curve - rolling_max) / rolling_max
-    max_drawdown = drawdown.min() if not drawdown.empty else 0.0
+        equity_part = {k: float(v) for k, v in
+                       equity_metrics(equity, initial_balance, periods_per_year, risk_free_rate).items()}
+    return {
+        "total_pnl": float(np.sum(pnl)),
+        **equity_part,
+        "num_trades": num_trades,
+        "win_rate": float((pnl > 0).sum() / num_trades * 100) if num_trades else 0.0,
+    }
 
-    num_trades = len(trades_df)
-    win_rate = (trades_df["pnl"] > 0).mean() * 100 if num_trades > 0 else 0.0
 
+def format_summary(m, trades_df=None):
     emojis = []
-    if total_return > 0.2:
+    if m["total_return"] > 0.2:
         emojis.append("📈")
-    if sharpe_ratio > 1.5:
+    if m["sharpe_ratio"] > 1.5:
         emojis.append("🏆")
-    if win_rate > 60:
+    if m["win_rate"] > 60:
         emojis.append("🔥")
 
     return {
-        "Total Return": f"{total_return * 100:.2f}%",
-        "Sharpe Ratio": f"{sharpe_ratio:.2f}",
-        "Max Drawdown": f"{max_drawdown * 100:.2f}%",
-        "# of Trades": num_trades,
-        "% Profitable": f"{win_rate:.1f}%",
+        "Total Return": f"{m['total_return'] * 100:.2f}%",
+        "Sharpe Ratio": f"{m['sharpe_ratio']:.2f}",
+        "Max Drawdown": f"{m['max_drawdown'] * 100:.2f}%",
+        "# of Trades": m["num_trades"],
+        "% Profitable": f"{m['win_rate']:.1f}%",
         "Badges": " ".join(emojis),
         "Trades": trades_df
     }
 
 
+def equity_curve(close, entry_pos, exit_pos, qty, entry_price, exit_price, initial_balance=10000):
+    """
+    Mark-to-market equity at every bar of `close` for trades entered and
+    exited at the given bar positions: cash moves at each entry and exit, and
+    open positions are marked at each bar's close.
+    """
+    n = len(close)
+    cash_flow = (
+        np.bincount(exit_pos, weights=qty * exit_price, minlength=n)
+        - np.bincount(entry_pos, weights=qty * entry_price, minlength=n)
+    )
+    held = np.cumsum(np.bincount(entry_pos, weights=qty, minlength=n) - np.bincount(exit_pos, weights=qty, minlength=n))
+    return initial_balance + np.cumsum(cash_flow) + held * close
+
+
+def bar_returns(equity, initial_balance=10000):
+    """
+    Per-bar PnL along the last axis of `equity`, as a fraction of initial_balance.
+
+    Trades are sized from initial_balance, so these stay meaningful when
+    overlapping positions take equity below zero; ratios of consecutive
+    equity values flip sign there.
+    """
+    return np.diff(equity, axis=-1, prepend=initial_balance) / initial_balance
+
+
+def drawdown_curve(equity, initial_balance=10000):
+    """
+    Fractional distance below the running equity peak (at least
+    initial_balance) along the last axis. Equity at or below zero is a total
+    loss, so the result is floored at -1.
+    """
+    peaks = np.maximum(np.maximum.accumulate(equity, axis=-1), initial_balance)
+    return np.maximum(equity / peaks - 1, -1.0)
+
+
+def sharpe_ratio(returns, periods_per_year=252, risk_free_rate=0.0):
+    """Annualised Sharpe ratio of per-bar returns along the last axis; 0 where they don't vary."""
+    returns = np.asarray(returns, dtype=np.float64)
+    if returns.shape[-1] < 2:
+        return np.zeros(returns.shape[:-1])
+    std = returns.std(axis=-1, ddof=1)
+    excess = returns.mean(axis=-1) - risk_free_rate / periods_per_year
+    return np.where(std > 0, excess / np.where(std > 0, std, 1.0) * periods_per_year**0.5, 0.0)
+
+
+def periods_per_year(dates):
+    """Bars per year implied by a sorted datetime64 array, or 252 when it can't be told."""
+    if len(dates) > 1 and np.issubdtype(np.asarray(dates).dtype, np.datetime64):
+        span = (dates[-1] - dates[0]) / np.timedelta64(1, "D")
+        if span > 0:
+            return (len(dates) - 1) / (span / 365.25)
+    return 252
+
+
+def equity_metrics(equity, initial_balance=10000, periods_per_year=252, risk_free_rate=0.0):
+    """
+    total_return, sharpe_ratio and max_drawdown of equity curves along the
+    last axis (one curve, or a (curves x bars) array), as BacktestResult reports them.
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    return {
+        "total_return": equity[..., -1] / initial_balance - 1,
+        "sharpe_ratio": sharpe_ratio(bar_returns(equity, initial_balance), periods_per_year, risk_free_rate),
+        "max_drawdown": drawdown_curve(equity, initial_balance).min(axis=-1),
+    }
+
+
+class BacktestResult:
+    """
+    A backtest's trades plus its mark-to-market per-bar equity curve.
+
+    equity, returns and drawdown are numpy arrays aligned with df's rows,
+    each computed on first access and cached; metrics and the visualizer's
+    performance charts all read from them. Returns are each bar's PnL as a
+    fraction of initial_balance (see bar_returns), and Sharpe is annualised
+    with the number of bars per year in df.
+
+    Pass `equity` to use a curve computed elsewhere (see from_simulation);
+    otherwise it is rebuilt from the trades: cash moves at each entry and
+    exit, and open positions are marked at each bar's Close.
+    """
+
+    def __init__(self, df, trades_df, initial_balance=10000, risk_free_rate=0.0, equity=None):
+        self.df = df
+        self.trades = trades_df if trades_df is not None else pd.DataFrame()
+        self.initial_balance = initial_balance
+        self.risk_free_rate = risk_free_rate
+        if equity is not None:
+            self.equity = np.asarray(equity, dtype=np.float64)
+
+    @classmethod
+    def from_simulation(cls, df, simulation, initial_balance=10000, risk_free_rate=0.0):
+        """Wrap a simulator.simulate result, reusing its equity curve."""
+        return cls(df, simulation.trades, initial_balance, risk_free_rate,
+                   equity=simulation.equity["equity"].to_numpy())
+
+    @cached_property
+    def dates(self):
+        return self.df["Date"].to_numpy() if "Date" in self.df.columns else self.df.index.to_numpy()
+
+    def _trade_positions(self, column):
+        return pd.Index(self.dates).get_indexer(self.trades[column])
+
+    @cached_property
+    def equity(self):
+        close = self.df["Close"].to_numpy(dtype=np.float64)
+        if self.trades.empty:
+            return np.full(len(close), float(self.initial_balance))
+        return equity_curve(
+            close, self._trade_positions("entry_time"), self._trade_positions("exit_time"),
+            self.trades["qty"].to_numpy(dtype=np.float64),
+            self.trades["entry_price"].to_numpy(dtype=np.float64),
+            self.trades["exit_price"].to_numpy(dtype=np.float64),
+            self.initial_balance,
+        )
+
+    @cached_property
+    def returns(self):
+        """Each bar's PnL as a fraction of initial_balance (see bar_returns)."""
+        return bar_returns(self.equity, self.initial_balance)
+
+    @cached_property
+    def drawdown(self):
+        """Fractional distance below the running equity peak, between -1 and 0."""
+        return drawdown_curve(self.equity, self.initial_balance)
+
+    @cached_property
+    def periods_per_year(self):
+        return periods_per_year(self.dates) if "Date" in self.df.columns else 252
+
+    def metrics(self):
+        """
+        Raw numeric metrics (fractions, not percentages): total_pnl,
+        total_return, sharpe_ratio, max_drawdown, num_trades, win_rate.
+        """
+        pnl = self.trades["pnl"].to_numpy() if not self.trades.empty else np.empty(0)
+        return backtest_metrics(self.equity, pnl, self.initial_balance, self.periods_per_year, self.risk_free_rate)
+
+    def summary(self):
+        """Metrics formatted the way the app displays them."""
+        return format_summary(self.metrics(), self.trades)
+
+
+@instrumented()
+def run_backtest(df, signals, initial_balance=10000, trade_size_pct=0.10, risk_free_rate=0.0):
+    """calculate_pnl wrapped in a BacktestResult, or None when no trades close."""
+    if "Signal" not in signals.columns:
+        raise ValueError("❌ 'Signal' column is missing from the signals DataFrame.")
+    if not ((signals["Signal"] == "Buy").any() and (signals["Signal"] == "Sell").any()):
+        return None
 
-def plot_win_rate(trades_df):
-    if trades_df.empty or "pnl" not in trades_df.columns:
+    trades_df = calculate_pnl(df, signals, trade_size_pct=trade_size_pct, initial_balance=initial_balance)
+    if trades_df.empty:
         return None
-    wins = trades_df[trades_df["pnl"] > 0].shape[0]
-    losses = trades_df[trades_df["pnl"] <= 0].shape[0]
+    return BacktestResult(df, trades_df, initial_balance=initial_balance, risk_free_rate=risk_free_rate)
+
 
-    # Avoid plot with no data
-    if wins + losses == 0:
+def calculate_performance(df, signals, initial_balance=10000, trade_size_pct=0.10, risk_free_rate=0.0):
+    result = run_backtest(df, signals, initial_balance, trade_size_pct, risk_free_rate)
+    if result is None:
         return None
+    return result.summary()
 
-    fig = px.pie(
-        values=[wins, losses],
-        names=["Wins", "Losses"],
-        title="🏆 Win vs Loss Distribution"
-    )
-    return fig
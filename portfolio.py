@@ -0,0 +1,470 @@
+"""
+Multi-asset portfolio backtests.
+
+N symbols are aligned on the union of their timestamps into an AssetPanel:
+one (time x asset) float64 array per OHLCV column, NaN where a symbol has no
+bar. The whole basket then goes through the pipeline together instead of one
+DataFrame per symbol:
+
+- Indicators are computed over each asset's own bars (so values match the
+  single-asset pipeline exactly) but for every asset in one call: each
+  asset's bars are packed to the top of its column and the kernels run down
+  all the columns at once, then the results are scattered back onto the
+  (time x asset) grid, with no per-symbol frames or joins. The pandas_ta
+  backend still goes asset by asset.
+- The signal rules in signals.py are elementwise, so each strategy is
+  evaluated once over the 2-D arrays for every asset at the same time.
+- simulate_portfolio walks the bars once with a shared cash balance: exits
+  first, then entries sized by the allocation rule, with stops, fees and
+  slippage as in simulator.py. Positions are marked at each asset's last
+  known close.
+
+Example:
+    python portfolio.py --csv data/btc.csv data/eth.csv data/sol.csv \\
+        --indicators EMA RSI --strategy "EMA + RSI" --allocation 0.05 --max-positions 10
+"""
+import argparse
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import indicators
+import kernels
+from barstore import PRICE_COLUMNS
+from kernels import HAVE_NUMBA, LazyJit
+from profiling import instrumented
+from signals import BUY, HOLD, SELL, STRATEGY_RULES, SignalInputs, evaluate_rule
+from simulator import EXIT_REASONS, EXIT_SIGNAL, EXIT_STOP_LOSS, EXIT_TAKE_PROFIT
+from strategies import INDICATOR_FUNCTIONS
+
+PortfolioResult = namedtuple("PortfolioResult", ["equity", "trades", "positions"])
+
+
+class AssetPanel:
+    """
+    Bars for several symbols on one time index.
+
+    `dates` is the shared index, `symbols` the asset order, and each column is
+    a (len(dates), len(symbols)) float64 array; `valid` marks the bars that
+    exist. panel["Close"] returns the 2-D array, so a panel can go wherever a
+    dict of column arrays is accepted (e.g. signals.SignalInputs).
+    """
+
+    def __init__(self, dates, symbols, columns, valid):
+        self.dates = dates
+        self.symbols = list(symbols)
+        self.columns = dict(columns)
+        self.valid = valid
+
+    @property
+    def shape(self):
+        return self.valid.shape
+
+    def __contains__(self, col):
+        return col in self.columns
+
+    def __getitem__(self, col):
+        return self.columns[col]
+
+    def __setitem__(self, col, values):
+        if values.shape != self.shape:
+            raise ValueError(f"❌ Column '{col}' has shape {values.shape}, expected {self.shape}.")
+        self.columns[col] = values
+
+    def asset(self, symbol):
+        """One symbol's bars as a Date + columns DataFrame (only the bars it has)."""
+        j = self.symbols.index(symbol)
+        rows = self.valid[:, j]
+        return pd.DataFrame({"Date": self.dates[rows], **{col: v[rows, j] for col, v in self.columns.items()}})
+
+
+def bar_dates(df):
+    """df's 'Date' column as a datetime64 array."""
+    dates = df["Date"]
+    # to_datetime's cache heuristics cost milliseconds per frame even on datetime columns
+    if not pd.api.types.is_datetime64_dtype(dates):
+        dates = pd.to_datetime(dates)
+    return dates.to_numpy()
+
+
+@instrumented()
+def align_assets(frames, how="outer"):
+    """
+    Align {symbol: OHLCV DataFrame} (e.g. from CachedBarLoader.load_many) into
+    an AssetPanel. how="outer" keeps every timestamp any symbol has; "inner"
+    keeps only timestamps all symbols share.
+    """
+    if not frames:
+        raise ValueError("❌ No symbols to align.")
+    if how not in ("outer", "inner"):
+        raise ValueError(f"❌ Unknown alignment '{how}'. Choose 'outer' or 'inner'.")
+
+    symbols = list(frames)
+    dates = {s: bar_dates(frames[s]) for s in symbols}
+    if how == "outer":
+        index = np.unique(np.concatenate(list(dates.values())))
+    else:
+        index = np.unique(dates[symbols[0]])
+        for s in symbols[1:]:
+            index = np.intersect1d(index, dates[s])
+
+    shape = (len(index), len(symbols))
+    columns = {col: np.full(shape, np.nan) for col in PRICE_COLUMNS}
+    valid = np.zeros(shape, dtype=bool)
+    for j, symbol in enumerate(symbols):
+        pos = np.searchsorted(index, dates[symbol])
+        found = pos < len(index)
+        found[found] = index[pos[found]] == dates[symbol][found]
+        for col in PRICE_COLUMNS:
+            columns[col][pos[found], j] = frames[symbol][col].to_numpy(dtype=np.float64)[found]
+        valid[pos[found], j] = True
+    return AssetPanel(index, symbols, columns, valid)
+
+
+def _asset_outputs(arrays, indicator, params, backend):
+    result = INDICATOR_FUNCTIONS[indicator](pd.DataFrame(arrays), backend=backend, **params)
+    if isinstance(result, pd.Series):
+        return {indicator: result.to_numpy(dtype=np.float64)}
+    return {col: result[col].to_numpy(dtype=np.float64) for col in result.columns}
+
+
+def _packed_outputs(panel, selected_indicators, params, needed):
+    """
+    Every indicator over the whole (time x asset) matrix in one kernel call:
+    each asset's bars are moved to the top of its column, NaN-padded below,
+    and the kernels get each column's bar count as `lengths`.
+    """
+    order = np.argsort(~panel.valid, axis=0, kind="stable")
+    counts = panel.valid.sum(axis=0)
+    padding = np.arange(panel.shape[0])[:, None] >= counts
+    arrays = {}
+    for col in needed:
+        arrays[col] = np.take_along_axis(panel[col], order, axis=0)
+        arrays[col][padding] = np.nan
+
+    outputs = {}
+    for name in selected_indicators:
+        for col, packed in kernels.indicator_arrays(arrays, name, params.get(name, {}), lengths=counts).items():
+            values = np.full(panel.shape, np.nan)
+            np.put_along_axis(values, order, packed, axis=0)
+            values[~panel.valid] = np.nan
+            outputs[col] = values
+    return outputs
+
+
+@instrumented()
+def apply_panel_indicators(panel, selected_indicators, params=None, backend=None):
+    """
+    Add the selected indicators' output columns to `panel` (same names as
+    strategies.apply_selected_indicators), each as a (time x asset) array.
+    The numba backend computes every asset at once; pandas_ta goes asset by asset.
+    """
+    params = params or {}
+    backend = indicators.get_backend(backend)
+    unknown = [name for name in selected_indicators if name not in kernels.KERNELS]
+    if unknown:
+        raise ValueError(f"❌ Unknown indicators {unknown}. Choose from {list(kernels.KERNELS)}.")
+
+    needed = sorted({col for name in selected_indicators for col in kernels.KERNELS[name][0]})
+    if backend == "numba":
+        outputs = _packed_outputs(panel, selected_indicators, params, needed)
+    else:
+        outputs = {}
+        for j in range(panel.shape[1]):
+            rows = panel.valid[:, j]
+            if not rows.any():
+                continue
+            arrays = {col: np.ascontiguousarray(panel[col][rows, j]) for col in needed}
+            for name in selected_indicators:
+                for col, values in _asset_outputs(arrays, name, params.get(name, {}), backend).items():
+                    if col not in outputs:
+                        outputs[col] = np.full(panel.shape, np.nan)
+                    outputs[col][rows, j] = values
+
+    for col, values in outputs.items():
+        panel[col] = values
+    return panel
+
+
+class PanelInputs(SignalInputs):
+    """SignalInputs over an AssetPanel; rolling means run over each asset's own bars."""
+
+    def __init__(self, panel):
+        super().__init__(panel)
+        self.valid = panel.valid
+
+    def rolling_mean(self, col, window):
+        key = (col, "rolling_mean", window)
+        if key not in self._arrays:
+            values = self[col]
+            if self.valid.all():
+                out = pd.DataFrame(values).rolling(window).mean().to_numpy()
+            else:
+                out = np.full(values.shape, np.nan)
+                for j in range(values.shape[1]):
+                    rows = self.valid[:, j]
+                    out[rows, j] = pd.Series(values[rows, j]).rolling(window).mean().to_numpy()
+            self._arrays[key] = out
+        return self._arrays[key]
+
+
+@instrumented()
+def panel_signal_codes(panel, strategy_name, inputs=None):
+    """
+    int8 (time x asset) codes for one strategy over every asset at once:
+    1 = Buy, -1 = Sell, 0 = Hold. Bars an asset doesn't have are Hold.
+    """
+    rule = STRATEGY_RULES.get(strategy_name)
+    if rule is None:
+        raise ValueError(f"❌ Unknown strategy '{strategy_name}'.")
+    codes = evaluate_rule(rule, inputs or PanelInputs(panel), panel.shape)
+    codes[~panel.valid] = HOLD
+    return codes
+
+
+def _portfolio_kernel(open_, high, low, close, valid, codes, alloc, initial_balance, max_positions,
+                      fee_pct, slippage_pct, stop_loss_pct, take_profit_pct, compound, max_trades):
+    n_bars, n_assets = close.shape
+    equity_curve = np.empty(n_bars)
+    cash_curve = np.empty(n_bars)
+    open_curve = np.empty(n_bars, dtype=np.int64)
+    positions = np.zeros((n_bars, n_assets))
+
+    trade_asset = np.empty(max_trades, dtype=np.int64)
+    entry_pos = np.empty(max_trades, dtype=np.int64)
+    exit_pos = np.empty(max_trades, dtype=np.int64)
+    entry_price = np.empty(max_trades)
+    exit_price = np.empty(max_trades)
+    trade_qty = np.empty(max_trades)
+    trade_pnl = np.empty(max_trades)
+    trade_fees = np.empty(max_trades)
+    exit_reason = np.empty(max_trades, dtype=np.int8)
+    # Open position per asset: its row in the trade arrays, or -1
+    slot = np.full(n_assets, -1, dtype=np.int64)
+
+    qty = np.zeros(n_assets)
+    cost = np.zeros(n_assets)
+    entry_fee = np.zeros(n_assets)
+    stop = np.zeros(n_assets)
+    target = np.zeros(n_assets)
+    last = np.zeros(n_assets)
+    cash = initial_balance
+    n_open = 0
+    k = 0
+
+    for i in range(n_bars):
+        # Exits first, so their cash can fund this bar's entries
+        for j in range(n_assets):
+            if not valid[i, j]:
+                continue
+            last[j] = close[i, j]
+            if qty[j] == 0.0:
+                continue
+            price = 0.0
+            reason = 0
+            if stop_loss_pct > 0.0 and low[i, j] <= stop[j]:
+                price = min(open_[i, j], stop[j])
+                reason = EXIT_STOP_LOSS
+            elif take_profit_pct > 0.0 and high[i, j] >= target[j]:
+                price = max(open_[i, j], target[j])
+                reason = EXIT_TAKE_PROFIT
+            elif codes[i, j] == SELL:
+                price = close[i, j]
+                reason = EXIT_SIGNAL
+
+            if reason != 0:
+                fill = price * (1.0 - slippage_pct)
+                proceeds = qty[j] * fill
+                fee = proceeds * fee_pct
+                cash += proceeds - fee
+
+                t = slot[j]
+                exit_pos[t] = i
+                exit_price[t] = fill
+                trade_pnl[t] = proceeds - fee - cost[j]
+                trade_fees[t] = entry_fee[j] + fee
+                exit_reason[t] = reason
+                slot[j] = -1
+                qty[j] = 0.0
+                n_open -= 1
+
+        if compound:
+            base = cash
+            for j in range(n_assets):
+                base += qty[j] * last[j]
+        else:
+            base = initial_balance
+
+        # Entries in asset order until cash or position slots run out
+        for j in range(n_assets):
+            if n_open >= max_positions:
+                break
+            if qty[j] != 0.0 or not valid[i, j] or codes[i, j] != BUY:
+                continue
+            notional = min(alloc[j] * base, cash)
+            if notional <= 0.0:
+                continue
+            fill = close[i, j] * (1.0 + slippage_pct)
+            qty[j] = notional / (fill * (1.0 + fee_pct))
+            entry_fee[j] = qty[j] * fill * fee_pct
+            cost[j] = qty[j] * fill + entry_fee[j]
+            cash -= cost[j]
+            stop[j] = fill * (1.0 - stop_loss_pct)
+            target[j] = fill * (1.0 + take_profit_pct)
+            n_open += 1
+
+            trade_asset[k] = j
+            entry_pos[k] = i
+            entry_price[k] = fill
+            trade_qty[k] = qty[j]
+            exit_pos[k] = -1
+            slot[j] = k
+            k += 1
+
+        held = 0.0
+        for j in range(n_assets):
+            positions[i, j] = qty[j]
+            held += qty[j] * last[j]
+        cash_curve[i] = cash
+        open_curve[i] = n_open
+        equity_curve[i] = cash + held
+
+    return (equity_curve, cash_curve, open_curve, positions, trade_asset[:k], entry_pos[:k], exit_pos[:k],
+            entry_price[:k], exit_price[:k], trade_qty[:k], trade_pnl[:k], trade_fees[:k], exit_reason[:k])
+
+
+_portfolio_compiled = LazyJit(_portfolio_kernel) if HAVE_NUMBA else None
+
+
+def _allocation(allocation, symbols, max_positions):
+    """Per-asset fraction of equity put into each new position."""
+    if allocation == "equal":
+        return np.full(len(symbols), 1.0 / max_positions)
+    if isinstance(allocation, dict):
+        unknown = set(allocation) - set(symbols)
+        if unknown:
+            raise ValueError(f"❌ Allocation given for unknown symbols {sorted(unknown)}.")
+        return np.array([float(allocation.get(s, 0.0)) for s in symbols])
+    return np.full(len(symbols), float(allocation))
+
+
+@instrumented()
+def simulate_portfolio(panel, codes, initial_balance=10000, allocation=0.10, max_positions=None,
+                       fee_pct=0.0, slippage_pct=0.0, stop_loss_pct=None, take_profit_pct=None,
+                       compound=True, backend="auto"):
+    """
+    Trade (time x asset) signal `codes` on `panel` from one shared cash balance.
+
+    Each asset holds at most one long position. A Buy opens one when cash and
+    a position slot are free, sized by `allocation`:
+    - a float: that fraction of current equity (of initial_balance with compound=False)
+    - a {symbol: fraction} dict: per-asset fractions; unlisted symbols aren't traded
+    - "equal": 1 / max_positions of equity per position
+    capped by available cash. When entries compete for cash or slots on the
+    same bar, assets earlier in panel.symbols go first. `max_positions`
+    defaults to the number of assets. Exits, stops, fees and slippage follow
+    simulator.simulate.
+
+    Returns PortfolioResult(equity, trades, positions):
+    - equity: per-bar DataFrame with Date, cash, equity and open_positions
+    - trades: closed trades with symbol plus simulator.simulate's trade columns
+    - positions: (time x asset) array of units held after each bar
+
+    BacktestResult.from_simulation(result.equity, result) gives the usual metrics.
+    """
+    n_bars, n_assets = panel.shape
+    max_positions = int(max_positions or n_assets)
+    if max_positions <= 0:
+        raise ValueError("❌ max_positions must be positive.")
+    codes = np.asarray(codes, dtype=np.int8)
+    if codes.shape != panel.shape:
+        raise ValueError(f"❌ Expected signal codes of shape {panel.shape}, got {codes.shape}.")
+
+    if backend == "auto":
+        backend = "numba" if _portfolio_compiled is not None else "python"
+    if backend == "numba":
+        if _portfolio_compiled is None:
+            raise ValueError("❌ The numba backend needs numba installed (pip install numba).")
+        kernel = _portfolio_compiled
+    elif backend == "python":
+        kernel = _portfolio_kernel
+    else:
+        raise ValueError(f"❌ Unknown simulator backend '{backend}'.")
+
+    alloc = _allocation(allocation, panel.symbols, max_positions)
+    # Every trade opens on a Buy bar
+    max_trades = int(np.count_nonzero(codes == BUY))
+    prices = [np.ascontiguousarray(panel[col]) for col in ("Open", "High", "Low", "Close")]
+
+    (equity, cash, n_open, positions, asset, entry_pos, exit_pos, entry_price, exit_price,
+     qty, pnl, fees, reason) = kernel(
+        *prices, np.ascontiguousarray(panel.valid), codes, alloc, float(initial_balance), max_positions,
+        float(fee_pct), float(slippage_pct), float(stop_loss_pct or 0.0), float(take_profit_pct or 0.0),
+        bool(compound), max_trades,
+    )
+
+    equity_df = pd.DataFrame({"Date": panel.dates, "cash": cash, "equity": equity, "open_positions": n_open})
+
+    closed = exit_pos >= 0
+    symbols = np.array(panel.symbols, dtype=object)
+    trades_df = pd.DataFrame({
+        "symbol": symbols[asset[closed]],
+        "entry_time": panel.dates[entry_pos[closed]],
+        "exit_time": panel.dates[exit_pos[closed]],
+        "entry_price": entry_price[closed],
+        "exit_price": exit_price[closed],
+        "qty": qty[closed],
+        "pnl": pnl[closed],
+        "fees": fees[closed],
+        "exit_reason": pd.Categorical.from_codes(reason[closed] - 1, list(EXIT_REASONS.values())),
+    })
+    trades_df = trades_df.sort_values("exit_time", kind="stable").reset_index(drop=True)
+    return PortfolioResult(equity_df, trades_df, positions)
+
+
+def run_portfolio(frames, strategy_name, selected_indicators, params=None, how="outer", **kwargs):
+    """align_assets -> apply_panel_indicators -> panel_signal_codes -> simulate_portfolio."""
+    panel = align_assets(frames, how=how)
+    apply_panel_indicators(panel, selected_indicators, params)
+    return simulate_portfolio(panel, panel_signal_codes(panel, strategy_name), **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest one strategy over a basket of symbols with shared cash.")
+    parser.add_argument("--csv", nargs="+", required=True, help="OHLCV CSV per symbol (symbol = file name)")
+    parser.add_argument("--strategy", required=True, help="Strategy name from signals.STRATEGY_NAMES")
+    parser.add_argument("--indicators", nargs="+", required=True, help="Indicators to compute")
+    parser.add_argument("--params", default="{}", help="Indicator params as JSON")
+    parser.add_argument("--allocation", default="0.10", help="Fraction of equity per position, or 'equal'")
+    parser.add_argument("--max-positions", type=int, default=None, help="Concurrent positions (default: all)")
+    parser.add_argument("--initial-balance", type=float, default=10000)
+    parser.add_argument("--fee", type=float, default=0.0, help="Fee per side as a fraction")
+    parser.add_argument("--inner", action="store_true", help="Keep only timestamps every symbol has")
+    parser.add_argument("--out", default=None, help="Write the trades to this CSV")
+    args = parser.parse_args(argv)
+
+    from performance import BacktestResult
+    from utils import load_csv_data
+
+    frames = {os.path.splitext(os.path.basename(path))[0]: load_csv_data(path) for path in args.csv}
+    allocation = args.allocation if args.allocation == "equal" else float(args.allocation)
+    result = run_portfolio(
+        frames, args.strategy, args.indicators, json.loads(args.params), how="inner" if args.inner else "outer",
+        initial_balance=args.initial_balance, allocation=allocation, max_positions=args.max_positions,
+        fee_pct=args.fee,
+    )
+    if args.out:
+        result.trades.to_csv(args.out, index=False)
+
+    summary = BacktestResult.from_simulation(result.equity, result, initial_balance=args.initial_balance).summary()
+    summary.pop("Trades")
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+    print(result.trades.groupby("symbol", observed=True)["pnl"].agg(["count", "sum"]).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Stage timing for the pipeline.
+
+Library entry points (data loading, indicators, signals, PnL, simulation,
+figure building) are wrapped in spans. Nothing is recorded unless a run is
+being recorded: a disabled span is a shared no-op context manager, and an
+@instrumented function costs one context-variable lookup per call.
+
+A recording aggregates every span by name: call count, wall time, rows
+processed and, with memory=True, bytes allocated (via tracemalloc, which
+slows the run down noticeably, so it's opt-in). With profile="cprofile" or
+"pyinstrument" the whole run is also captured by that profiler. The report
+is a plain dict ready for json.dump.
+
+Recordings are scoped to the current thread / async context, so concurrent
+Streamlit sessions each get their own.
+
+Example:
+    import profiling
+
+    with profiling.recording(memory=True, profile="cprofile") as run:
+        df = apply_selected_indicators(df, ["EMA", "RSI"], params)
+        trades = calculate_pnl(df, generate_signals(df, "EMA + RSI"))
+    run.to_json("run_report.json")
+"""
+import contextvars
+import functools
+import json
+import platform
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+PROFILERS = (None, "cprofile", "pyinstrument")
+
+_current = contextvars.ContextVar("profiling_recorder", default=None)
+_NULL_SPAN = nullcontext()
+
+
+class _Stage:
+    __slots__ = ("calls", "total_s", "max_s", "rows", "alloc_peak", "alloc_net")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.rows = 0
+        self.alloc_peak = 0
+        self.alloc_net = 0
+
+
+class _Span:
+    __slots__ = ("recorder", "name", "rows", "start", "mem_start", "child_peak")
+
+    def __init__(self, recorder, name, rows):
+        self.recorder = recorder
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        recorder = self.recorder
+        if recorder.memory:
+            self.mem_start = tracemalloc.get_traced_memory()[0]
+            self.child_peak = 0
+            # The peak counter is global; children reset it, so they report their peak back to us
+            tracemalloc.reset_peak()
+            recorder._stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        recorder = self.recorder
+        stage = recorder.stages.get(self.name)
+        if stage is None:
+            stage = recorder.stages[self.name] = _Stage()
+        stage.calls += 1
+        stage.total_s += elapsed
+        stage.max_s = max(stage.max_s, elapsed)
+        if self.rows is not None:
+            stage.rows += self.rows
+
+        if recorder.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self.child_peak)
+            stage.alloc_peak = max(stage.alloc_peak, peak - self.mem_start)
+            stage.alloc_net += current - self.mem_start
+            recorder._stack.pop()
+            if recorder._stack:
+                parent = recorder._stack[-1]
+                parent.child_peak = max(parent.child_peak, peak)
+        return False
+
+
+class Recorder:
+    """Collects spans for one run; see recording()."""
+
+    def __init__(self, memory=False, profile=None):
+        if profile not in PROFILERS:
+            raise ValueError(f"❌ Unknown profiler '{profile}'. Choose from {PROFILERS}.")
+        self.memory = memory
+        self.profile = profile
+        self.stages = {}
+        self._stack = []
+        self._profiler = None
+        self._started_tracemalloc = False
+        self._token = None
+        self.started = None
+        self.wall_s = None
+        self.profile_text = None
+
+    def span(self, name, rows=None):
+        return _Span(self, name, rows)
+
+    def start(self):
+        if self.profile == "cprofile":
+            import cProfile
+            self._profiler = cProfile.Profile()
+        elif self.profile == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                raise ValueError("❌ The pyinstrument profiler needs pyinstrument installed (pip install pyinstrument).")
+            self._profiler = Profiler()
+
+        # Only one profiler can run per process; enable() raises ValueError if one already is
+        if self.profile == "cprofile":
+            self._profiler.enable()
+        elif self.profile == "pyinstrument":
+            self._profiler.start()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self.started = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def stop(self, top=40):
+        if self._token is None:
+            return self
+        self.wall_s = time.perf_counter() - self._start
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Stopped from a different context than the one that started it
+            if _current.get() is self:
+                _current.set(None)
+        self._token = None
+
+        if self.profile == "cprofile":
+            import io
+            import pstats
+            self._profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(top)
+            self.profile_text = out.getvalue()
+        elif self.profile == "pyinstrument":
+            self._profiler.stop()
+            self.profile_text = self._profiler.output_text(unicode=True)
+        self._profiler = None
+
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        return self
+
+    def report(self):
+        """Per-stage aggregates plus run metadata, as a JSON-ready dict."""
+        stages = []
+        for name, s in sorted(self.stages.items(), key=lambda item: -item[1].total_s):
+            row = {
+                "stage": name,
+                "calls": s.calls,
+                "total_s": s.total_s,
+                "mean_s": s.total_s / s.calls,
+                "max_s": s.max_s,
+                "rows": s.rows,
+                "rows_per_s": s.rows / s.total_s if s.rows and s.total_s > 0 else None,
+            }
+            if self.memory:
+                row["alloc_peak_mb"] = s.alloc_peak / 1024**2
+                row["alloc_net_mb"] = s.alloc_net / 1024**2
+            stages.append(row)
+
+        return {
+            "meta": {
+                "started": self.started.isoformat() if self.started else None,
+                "wall_s": self.wall_s,
+                "python": platform.python_version(),
+                "memory": self.memory,
+                "profile": self.profile,
+            },
+            "stages": stages,
+            "profile": self.profile_text,
+        }
+
+    def to_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+@contextmanager
+def recording(memory=False, profile=None):
+    """Record every span in the block; yields the Recorder (report() once the block exits)."""
+    recorder = Recorder(memory=memory, profile=profile).start()
+    try:
+        yield recorder
+    finally:
+        recorder.stop()
+
+
+def active():
+    """The Recorder of the run being recorded in this context, or None."""
+    return _current.get()
+
+
+def span(name, rows=None):
+    """Time a block as stage `name` when a run is being recorded; a no-op otherwise."""
+    recorder = _current.get()
+    if recorder is None:
+        return _NULL_SPAN
+    return recorder.span(name, rows)
+
+
+def _rows(args, result):
+    # Rows processed: the first frame/array argument, else a frame/array result
+    for value in (args[0] if args else None, result):
+        if hasattr(value, "shape") and len(value.shape):
+            return value.shape[0]
+    return None
+
+
+def instrumented(name=None):
+    """Decorator: record each call as a span named `name` (default module.qualname)."""
+
+    def decorate(func):
+        label = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            recorder = _current.get()
+            if recorder is None:
+                return func(*args, **kwargs)
+            with recorder.span(label) as current:
+                result = func(*args, **kwargs)
+                current.rows = _rows(args, result)
+            return result
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,274 @@
+"""
+Multi-resolution OHLCV bar pyramids.
+
+A BarPyramid holds the base bars plus aggregated levels (e.g. 1h -> 4h -> 1D):
+open = first, high = max, low = min, close = last, volume = sum. Each level
+is built from the level below it with one vectorized reduceat pass (no
+groupby), so building every level costs about one pass over the base bars.
+Buckets are fixed-width and aligned to the Unix epoch (so daily-divisible
+rules start at midnight, as pandas' resample does, while 7D buckets start
+on Thursdays); empty buckets are skipped. Bars are labelled with their
+bucket's start time.
+
+Levels are stored in growable arrays. extend() appends new base bars (or
+replaces the latest ones, e.g. a still-forming bar) and only re-aggregates
+the last bucket of each level, so keeping a pyramid current is O(new bars).
+
+level(rule) returns a Date/Open/High/Low/Close/Volume DataFrame that
+apply_selected_indicators and generate_signals take as-is; align() maps a
+higher level's indicator values back onto the base bars for multi-timeframe
+strategies, and candles() picks the zoom level a chart of a given width
+needs.
+
+Example:
+    pyramid = BarPyramid(load_csv_data("btc_1h.csv"), rules=["4h", "1D"])
+    daily = apply_selected_indicators(pyramid.level("1D"), ["EMA"], {"EMA": {"length": 50}})
+    hourly = pyramid.level()
+    hourly["EMA_50"] = pyramid.align("1D", daily["EMA"])
+"""
+import numpy as np
+import pandas as pd
+
+from barstore import PRICE_COLUMNS
+from decimate import DEFAULT_WIDTH, PIXELS_PER_CANDLE, ohlc_buckets
+from profiling import instrumented
+
+COLUMNS = ["Date"] + PRICE_COLUMNS
+
+# Default chart zoom levels (each a multiple of the previous), used down to about MIN_ZOOM_BARS bars
+ZOOM_RULES = ["1min", "5min", "15min", "1h", "4h", "1D", "7D", "28D"]
+MIN_ZOOM_BARS = 500
+
+
+def _to_ns(dates):
+    return np.asarray(dates, dtype="datetime64[ns]").view(np.int64)
+
+
+def _step_ns(rule):
+    step = pd.Timedelta(rule)
+    if step <= pd.Timedelta(0):
+        raise ValueError(f"❌ Resampling rule '{rule}' must be a positive duration.")
+    return step.value
+
+
+def _reduce(columns, starts):
+    """One bar per run of bars beginning at each of `starts`, labelled with the run's first Date."""
+    ends = np.append(starts[1:], len(columns["Date"])) - 1
+    return {
+        "Date": columns["Date"][starts],
+        "Open": columns["Open"][starts],
+        "High": np.maximum.reduceat(columns["High"], starts),
+        "Low": np.minimum.reduceat(columns["Low"], starts),
+        "Close": columns["Close"][ends],
+        "Volume": np.add.reduceat(columns["Volume"], starts),
+    }
+
+
+def _aggregate(columns, step):
+    """Aggregate sorted bars (int64 ns dates) into `step`-ns buckets."""
+    if len(columns["Date"]) == 0:
+        return {col: values[:0] for col, values in columns.items()}
+    bucket = columns["Date"] // step
+    starts = np.flatnonzero(np.diff(bucket, prepend=bucket[0] - 1))
+    out = _reduce(columns, starts)
+    out["Date"] = bucket[starts] * step
+    return out
+
+
+def _columns(df):
+    return {"Date": _to_ns(df["Date"]), **{col: df[col].to_numpy(dtype=np.float64) for col in PRICE_COLUMNS}}
+
+
+def resample_ohlcv(df, rule):
+    """One-off aggregation of an OHLCV frame to `rule` (e.g. "4h"), same bucketing as BarPyramid."""
+    columns = _columns(df)
+    if (np.diff(columns["Date"]) < 0).any():
+        raise ValueError("❌ Bars must be sorted by Date.")
+    columns = _aggregate(columns, _step_ns(rule))
+    columns["Date"] = columns["Date"].view("datetime64[ns]")
+    return pd.DataFrame(columns)
+
+
+class _Level:
+    """One resolution's bars in growable arrays (dates as int64 ns)."""
+
+    def __init__(self, step, columns):
+        self.step = step
+        self.n = 0
+        self._data = {col: np.empty(0, dtype=np.int64 if col == "Date" else np.float64) for col in COLUMNS}
+        self.append(columns)
+
+    def __len__(self):
+        return self.n
+
+    def column(self, col):
+        return self._data[col][:self.n]
+
+    @property
+    def dates(self):
+        return self.column("Date")
+
+    def truncate(self, n):
+        self.n = min(self.n, n)
+
+    def append(self, columns):
+        extra = len(columns["Date"])
+        needed = self.n + extra
+        capacity = len(self._data["Date"])
+        if needed > capacity:
+            capacity = max(needed, 2 * capacity)
+            for col, values in self._data.items():
+                grown = np.empty(capacity, dtype=values.dtype)
+                grown[:self.n] = values[:self.n]
+                self._data[col] = grown
+        for col in COLUMNS:
+            self._data[col][self.n:needed] = columns[col]
+        self.n = needed
+
+    def window(self, lo, hi):
+        return {col: self.column(col)[lo:hi] for col in COLUMNS}
+
+    def tail(self, start):
+        """Columns of the bars dated at or after `start` (ns)."""
+        return self.window(int(np.searchsorted(self.dates, start, "left")), self.n)
+
+    def frame(self):
+        columns = {col: self.column(col) for col in PRICE_COLUMNS}
+        return pd.DataFrame({"Date": self.dates.view("datetime64[ns]"), **columns}, copy=False)
+
+
+class BarPyramid:
+    """
+    Base bars plus aggregated levels, coarsest last.
+
+    `rules` are durations pandas understands ("4h", "1D", "1W", or
+    Timedeltas), each a whole multiple of the one before it. With rules=None
+    the levels are the ZOOM_RULES coarser than the base bars, stopping at the
+    first with at most MIN_ZOOM_BARS bars.
+    """
+
+    def __init__(self, df, rules=None):
+        missing = [col for col in COLUMNS if col not in df.columns]
+        if missing:
+            raise ValueError(f"❌ Columns {missing} are missing from the bars.")
+        base = _columns(df)
+        if (np.diff(base["Date"]) <= 0).any():
+            raise ValueError("❌ Base bars must be sorted by Date with no duplicates.")
+
+        base_step = int(np.median(np.diff(base["Date"]))) if len(base["Date"]) > 1 else 0
+        self._base = _Level(base_step, base)
+        self._levels = {}
+
+        if rules is None:
+            steps = [step for step in map(_step_ns, ZOOM_RULES)
+                     if base_step and step > base_step and step % base_step == 0]
+        else:
+            steps = [_step_ns(rule) for rule in rules]
+
+        parent = self._base
+        for step in steps:
+            if rules is None and len(parent) <= MIN_ZOOM_BARS:
+                break
+            if base_step and step % base_step:
+                raise ValueError(f"❌ {pd.Timedelta(step)} is not a whole multiple of the base bar size.")
+            if parent is not self._base and step % parent.step:
+                raise ValueError(f"❌ {pd.Timedelta(step)} is not a whole multiple of {pd.Timedelta(parent.step)}.")
+            level = _Level(step, _aggregate(parent.window(0, len(parent)), step))
+            self._levels[step] = level
+            parent = level
+
+    @property
+    def rules(self):
+        """Level sizes, finest first."""
+        return [pd.Timedelta(step) for step in self._levels]
+
+    def _level(self, rule):
+        if rule is None:
+            return self._base
+        level = self._levels.get(_step_ns(rule))
+        if level is None:
+            raise ValueError(f"❌ No {pd.Timedelta(rule)} level. Levels: {[str(r) for r in self.rules]}.")
+        return level
+
+    def level(self, rule=None):
+        """
+        The bars of one level (None = base) as a new DataFrame over the
+        pyramid's arrays. Adding columns is fine; don't modify the prices.
+        extend() rewrites the latest bar of each level in place, so copy()
+        a frame to keep a snapshot of a still-forming bar.
+        """
+        return self._level(rule).frame()
+
+    def __len__(self):
+        return len(self._base)
+
+    @instrumented()
+    def extend(self, df):
+        """
+        Add base bars. Bars dated at or after the first new bar replace the
+        existing ones (so a still-forming bar can be re-sent); each level
+        re-aggregates only from the bucket the first new bar falls in.
+        """
+        if len(df) == 0:
+            return self
+        new = _columns(df)
+        if (np.diff(new["Date"]) <= 0).any():
+            raise ValueError("❌ New bars must be sorted by Date with no duplicates.")
+
+        changed_from = int(new["Date"][0])
+        self._base.truncate(int(np.searchsorted(self._base.dates, changed_from, "left")))
+        self._base.append(new)
+
+        parent = self._base
+        for level in self._levels.values():
+            # The bucket holding the first changed bar may now be incomplete or different
+            changed_from = changed_from // level.step * level.step
+            level.truncate(int(np.searchsorted(level.dates, changed_from, "left")))
+            level.append(_aggregate(parent.tail(changed_from), level.step))
+            parent = level
+        return self
+
+    def align(self, rule, values, dates=None):
+        """
+        Map per-bar `values` of the `rule` level onto `dates` (default: the
+        base bars) without lookahead: each date gets the value of the latest
+        level bar that had closed by the end of that base bar. NaN before the
+        first completed bar.
+        """
+        level = self._level(rule)
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) != len(level):
+            raise ValueError(f"❌ Expected {len(level)} values for the {pd.Timedelta(rule)} level, got {len(values)}.")
+
+        target = self._base.dates if dates is None else _to_ns(dates)
+        # A level bar closes at its bucket end; a base bar's data is complete at its own end
+        closes = level.dates + level.step
+        pos = np.searchsorted(closes, target + self._base.step, "right") - 1
+        out = np.full(len(target), np.nan)
+        known = pos >= 0
+        out[known] = values[pos[known]]
+        return out
+
+    def candles(self, width=DEFAULT_WIDTH, x_range=None):
+        """
+        Candles for a chart `width` pixels wide over `x_range` ((start, end),
+        inclusive): the finest level that fits width / PIXELS_PER_CANDLE bars
+        in the range, re-bucketed further only if even the coarsest level has
+        too many.
+        """
+        max_bars = max(width // PIXELS_PER_CANDLE, 1)
+        lo_t = _to_ns([x_range[0]])[0] if x_range and x_range[0] is not None else None
+        hi_t = _to_ns([x_range[1]])[0] if x_range and x_range[1] is not None else None
+
+        for level in [self._base, *self._levels.values()]:
+            dates = level.dates
+            lo = int(np.searchsorted(dates, lo_t, "left")) if lo_t is not None else 0
+            hi = int(np.searchsorted(dates, hi_t, "right")) if hi_t is not None else len(dates)
+            if hi - lo <= max_bars:
+                break
+
+        window = level.window(lo, hi)
+        if hi - lo > max_bars:
+            window = _reduce(window, ohlc_buckets(hi - lo, max_bars))
+        window["Date"] = window["Date"].view("datetime64[ns]")
+        return pd.DataFrame(window)
@@ -0,0 +1,234 @@
+"""
+Monte Carlo / bootstrap robustness of a backtest.
+
+One historical path gives one Sharpe and one max drawdown. Here the same
+trades (or per-bar returns) are resampled into thousands of alternative
+paths and every path is scored, giving a distribution and confidence
+intervals for each metric:
+
+- simulate_trades: the trades table from calculate_pnl, reordered
+  ("shuffle": same trades, different order, so only path-dependent metrics
+  like drawdown move) or resampled with replacement ("bootstrap", in blocks
+  of `block` consecutive trades to keep streaks). Each trade's PnL is
+  booked on its own bar out of the backtest's `bars`, and Sharpe and
+  drawdown are then computed as BacktestResult computes them.
+- simulate_returns: per-bar returns (e.g. BacktestResult.returns),
+  circular block bootstrap; metrics as BacktestResult computes them. Return
+  paths whose equity reaches zero are refused: they can't be resampled
+  meaningfully, so use simulate_trades for those.
+
+Paths are scored as a 2-D (simulations x trades/bars) array, in chunks
+sized to stay under `chunk_bytes`. Chunks are spread over a process pool
+when there is more than one; each chunk has its own seed derived from
+`seed`, so results don't depend on the number of workers. Pass
+max_workers=1 when calling from inside a sweep worker.
+
+Example:
+    python robustness.py --csv btc.csv --indicators EMA RSI --strategy "EMA + RSI" --sims 20000
+"""
+import argparse
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from performance import drawdown_curve, equity_metrics
+from profiling import instrumented
+
+RobustnessResult = namedtuple("RobustnessResult", ["samples", "intervals", "prob_loss"])
+
+TRADE_METHODS = ("bootstrap", "shuffle")
+
+# Temporaries alive per path element while scoring (paths, equity, peaks, drawdown)
+_ARRAYS_PER_ELEMENT = 4
+
+
+def block_indices(n, n_sims, block, rng):
+    """(n_sims, n) positions for a circular moving-block bootstrap of a length-n series."""
+    block = max(1, min(int(block), n))
+    n_blocks = -(-n // block)
+    starts = rng.integers(0, n, size=(n_sims, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block)) % n
+    return idx.reshape(n_sims, n_blocks * block)[:, :n]
+
+
+def trade_metrics(paths, initial_balance=10000, risk_free_rate=0.0, bars=None, periods_per_year=252):
+    """
+    BacktestResult's metrics for each row of a (simulations x trades) PnL
+    array, with every trade's PnL realised on its own bar out of `bars`
+    (default: one bar per trade) and no change on the others. Sharpe is
+    that per-bar series' sharpe_ratio, without building it bar by bar. Open
+    positions aren't marked to market here, so it runs higher than
+    BacktestResult's Sharpe for the same trades.
+    """
+    n = paths.shape[1]
+    bars = bars or n
+    if bars < n:
+        raise ValueError(f"❌ {n} trades don't fit in {bars} bars.")
+    returns = paths / initial_balance
+    if bars > 1:
+        total = returns.sum(axis=1)
+        std = np.sqrt(np.maximum((returns**2).sum(axis=1) - total**2 / bars, 0.0) / (bars - 1))
+        excess = total / bars - risk_free_rate / periods_per_year
+        sharpe = np.where(std > 0, excess / np.where(std > 0, std, 1.0) * periods_per_year**0.5, 0.0)
+    else:
+        sharpe = np.zeros(len(paths))
+
+    equity = initial_balance + np.cumsum(paths, axis=1)
+    return {
+        "total_return": equity[:, -1] / initial_balance - 1,
+        "sharpe_ratio": sharpe,
+        "max_drawdown": drawdown_curve(equity, initial_balance).min(axis=1),
+        "win_rate": (paths > 0).mean(axis=1) * 100,
+    }
+
+
+def return_metrics(paths, initial_balance=10000, risk_free_rate=0.0, periods_per_year=252):
+    """
+    BacktestResult's metrics for each row of a (simulations x bars) array of
+    per-bar returns as BacktestResult.returns defines them (bar PnL over initial_balance).
+    """
+    equity = initial_balance * (1 + np.cumsum(paths, axis=1))
+    return equity_metrics(equity, initial_balance, periods_per_year, risk_free_rate)
+
+
+def _run_chunk(task):
+    kind, values, n_sims, seed, method, block, kwargs = task
+    rng = np.random.default_rng(seed)
+    n = len(values)
+    if method == "shuffle":
+        paths = rng.permuted(np.broadcast_to(values, (n_sims, n)), axis=1)
+    elif block > 1:
+        paths = values[block_indices(n, n_sims, block, rng)]
+    else:
+        paths = values[rng.integers(0, n, size=(n_sims, n))]
+    if kind == "trades":
+        return trade_metrics(paths, **kwargs)
+    return return_metrics(paths, **kwargs)
+
+
+def _simulate(kind, values, observed, n_sims, method, block, confidence, seed, chunk_bytes, max_workers, kwargs):
+    if not 0 < confidence < 1:
+        raise ValueError("❌ confidence must be between 0 and 1.")
+    n = len(values)
+    chunk_sims = max(1, chunk_bytes // (n * 8 * _ARRAYS_PER_ELEMENT))
+    sizes = [min(chunk_sims, n_sims - start) for start in range(0, n_sims, chunk_sims)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(kind, values, size, s, method, block, kwargs) for size, s in zip(sizes, seeds)]
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            chunks = list(executor.map(_run_chunk, tasks))
+    else:
+        chunks = [_run_chunk(task) for task in tasks]
+
+    samples = pd.DataFrame({name: np.concatenate([c[name] for c in chunks]) for name in chunks[0]})
+    tail = (1 - confidence) / 2
+    intervals = pd.DataFrame({
+        "observed": pd.Series(observed),
+        "mean": samples.mean(),
+        "lower": samples.quantile(tail),
+        "median": samples.median(),
+        "upper": samples.quantile(1 - tail),
+    })
+    return RobustnessResult(samples, intervals, float((samples["total_return"] < 0).mean()))
+
+
+@instrumented()
+def simulate_trades(trades_df, n_sims=10000, method="bootstrap", block=1, initial_balance=10000,
+                    risk_free_rate=0.0, bars=None, periods_per_year=252, confidence=0.95, seed=None,
+                    chunk_bytes=64 * 1024**2, max_workers=None):
+    """
+    Resample the trade sequence in `trades_df` (needs a 'pnl' column) `n_sims` times.
+    Pass the backtest's bar count and bars per year (len(result.equity) and
+    result.periods_per_year) so Sharpe is on BacktestResult's scale.
+
+    Returns RobustnessResult(samples, intervals, prob_loss):
+    - samples: one row of metrics per simulated path
+    - intervals: per metric, the observed value, the mean, the `confidence`
+      interval bounds (lower/upper) and the median
+    - prob_loss: fraction of paths ending below initial_balance
+    """
+    if method not in TRADE_METHODS:
+        raise ValueError(f"❌ Unknown method '{method}'. Choose from {TRADE_METHODS}.")
+    if trades_df is None or trades_df.empty or "pnl" not in trades_df.columns:
+        raise ValueError("❌ Need a trades table with a 'pnl' column and at least one trade.")
+
+    pnl = trades_df["pnl"].to_numpy(dtype=np.float64)
+    kwargs = {"initial_balance": initial_balance, "risk_free_rate": risk_free_rate, "bars": bars,
+              "periods_per_year": periods_per_year}
+    observed = {name: float(v[0]) for name, v in trade_metrics(pnl[None, :], **kwargs).items()}
+    return _simulate("trades", pnl, observed, n_sims, method, block, confidence, seed, chunk_bytes,
+                     max_workers, kwargs)
+
+
+@instrumented()
+def simulate_returns(returns, n_sims=10000, block=20, initial_balance=10000, risk_free_rate=0.0,
+                     periods_per_year=252, confidence=0.95, seed=None, chunk_bytes=64 * 1024**2, max_workers=None):
+    """
+    Circular block bootstrap of per-bar `returns` (e.g. BacktestResult.returns,
+    with periods_per_year=result.periods_per_year). `block` bars are kept
+    together to preserve volatility clustering. Returns RobustnessResult as
+    simulate_trades does.
+
+    Raises ValueError when the equity these returns trace from
+    initial_balance reaches zero or below.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    if len(returns) == 0:
+        raise ValueError("❌ Need at least one return to resample.")
+    if (np.cumsum(returns) <= -1).any():
+        # Overlapping fixed-size trades can take equity through zero; resampled paths would start from a wipe-out
+        raise ValueError("❌ Equity reaches zero or below on this path, so its per-bar returns "
+                         "can't be meaningfully resampled; use simulate_trades instead.")
+    kwargs = {"initial_balance": initial_balance, "risk_free_rate": risk_free_rate,
+              "periods_per_year": periods_per_year}
+    observed = {name: float(v[0]) for name, v in return_metrics(returns[None, :], **kwargs).items()}
+    return _simulate("returns", returns, observed, n_sims, "bootstrap", block, confidence, seed, chunk_bytes,
+                     max_workers, kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo robustness of one strategy's backtest.")
+    parser.add_argument("--csv", required=True, help="OHLCV CSV file")
+    parser.add_argument("--indicators", nargs="+", required=True, help="Indicators to compute")
+    parser.add_argument("--strategy", required=True, help="Strategy name from signals.STRATEGY_NAMES")
+    parser.add_argument("--sims", type=int, default=10000)
+    parser.add_argument("--method", choices=TRADE_METHODS, default="bootstrap", help="How trades are resampled")
+    parser.add_argument("--block", type=int, default=20,
+                        help="Block length: trades for the trade bootstrap, bars for the return bootstrap")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    from performance import run_backtest
+    from signals import generate_signals
+    from strategies import apply_selected_indicators
+    from utils import load_csv_data
+
+    df = apply_selected_indicators(load_csv_data(args.csv), args.indicators, {})
+    result = run_backtest(df, generate_signals(df, args.strategy))
+    if result is None:
+        raise SystemExit("⚠️ The strategy made no trades on this data.")
+
+    trades = simulate_trades(result.trades, args.sims, method=args.method, block=args.block,
+                             bars=len(result.equity), periods_per_year=result.periods_per_year,
+                             confidence=args.confidence, seed=args.seed, max_workers=args.workers)
+    print(f"Trade {args.method} ({len(result.trades)} trades), P(loss) = {trades.prob_loss:.1%}")
+    print(trades.intervals.to_string(float_format="{:.4f}".format))
+    try:
+        bars = simulate_returns(result.returns, args.sims, block=args.block, periods_per_year=result.periods_per_year,
+                                confidence=args.confidence, seed=args.seed, max_workers=args.workers)
+    except ValueError as e:
+        print(f"\n⚠️ Warning: skipping the bootstrap of bar returns. {str(e).removeprefix('❌ ')}")
+        return
+    print(f"\nBlock bootstrap of bar returns ({len(result.returns)} bars), P(loss) = {bars.prob_loss:.1%}")
+    print(bars.intervals.to_string(float_format="{:.4f}".format))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Screen a universe of symbols on their latest bar.
+
+Each symbol's indicators run as the streaming versions in streaming.py, so
+the screener keeps only their state plus the last HISTORY_BARS rows of
+indicator values per symbol. The first screen of a symbol processes just the
+trailing window its indicators need to settle: the window length for rolling
+indicators, and for EMA/RMA-based ones enough bars that the starting point's
+weight drops below WARMUP_TOLERANCE, which makes the latest values match a
+full-history run. Only the "store" source reads just that window from disk;
+"csv" and "yahoo" load the symbol's whole history and keep its tail. OBV is
+counted from the start of the window, so its level differs from a
+full-history OBV: rules only compare it with its own recent mean, and `where`
+filters may not use it. Later refreshes process only the bars after the last
+one seen. A bar that is re-sent with the same date (e.g. one still forming)
+replaces the previous version.
+
+The latest bar of every symbol is then one row of a (symbols,) array per
+column, and each strategy's signals.STRATEGY_RULES rule is evaluated once
+over the whole universe. Symbols are ranked by score (Buy strategies minus
+Sell strategies). Pass `where` to filter with a DataFrame.query expression
+over the result columns.
+
+With `cache_path` the state is kept on disk between runs. It is discarded
+when the source, indicators or params change.
+
+Example:
+    python screener.py --symbols-file universe.txt --source store:data/bars \\
+        --indicators RSI MACD --strategies "MACD + RSI" RSI --where "RSI < 30 and MACD > MACD_S"
+"""
+import argparse
+import json
+import math
+import os
+import pickle
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch import load_symbol
+from kernels import KERNELS
+from portfolio import bar_dates
+from profiling import instrumented
+from signals import SIGNAL_LABELS, STRATEGY_NAMES, STRATEGY_RULES, SignalInputs, evaluate_rule
+from streaming import STREAMING_INDICATORS
+
+# Rows of indicator values kept per symbol: the longest rolling_mean a STRATEGY_RULES rule takes
+HISTORY_BARS = 10
+
+# EMA/RMA-based indicators are warmed up until the first bar's weight is below this
+WARMUP_TOLERANCE = 1e-10
+
+# Columns the streaming indicators read
+BAR_FIELDS = ["High", "Low", "Close", "Volume"]
+
+# Columns whose level depends on where the screening window starts, so `where` can't filter on them
+WINDOW_RELATIVE_COLUMNS = ["OBV"]
+
+
+def _decay_bars(alpha):
+    if alpha >= 1:
+        return 0
+    return math.ceil(math.log(WARMUP_TOLERANCE) / math.log(1 - alpha))
+
+
+# Indicator -> bars a new stream needs before its value is settled, from the stream's parameters
+_WARMUP = {
+    "EMA": lambda s: s.length + _decay_bars(2 / (s.length + 1)),
+    "MACD": lambda s: s.slow + _decay_bars(2 / (s.slow + 1)) + s.signal + _decay_bars(2 / (s.signal + 1)),
+    "RSI": lambda s: 1 + _decay_bars(1 / s.length),
+    "Stochastic": lambda s: s.k + s.smooth_k + s.d - 2,
+    "Bollinger Bands": lambda s: s.length,
+    "ATR": lambda s: s.length + _decay_bars(1 / s.length),
+    "OBV": lambda s: 2,
+}
+
+
+def warmup_bars(indicator, params=None):
+    """Bars of history `indicator` needs before its latest value matches a full-history run."""
+    return _WARMUP[indicator](STREAMING_INDICATORS[indicator](**(params or {})))
+
+
+class _SymbolState:
+    """One symbol's indicator streams, its last HISTORY_BARS rows of values and its last bar's date."""
+
+    def __init__(self, streams, n_columns):
+        self.streams = streams
+        self.history = np.empty((0, n_columns))
+        self.last_date = None
+        self.last_bar = None
+        # The streams (pickled) as they were before the last bar, in case that bar is re-sent changed
+        self.before_last = None
+
+
+class _LatestInputs(SignalInputs):
+    """SignalInputs over the latest bar of every symbol; rolling means come from the kept history."""
+
+    def __init__(self, history, columns):
+        super().__init__({col: history[:, -1, i] for i, col in enumerate(columns)})
+        self.history = history
+        self.positions = {col: i for i, col in enumerate(columns)}
+
+    def rolling_mean(self, col, window):
+        if window > self.history.shape[1]:
+            raise ValueError(f"❌ The screener keeps {self.history.shape[1]} bars of history; "
+                             f"a rule needs a {window}-bar mean.")
+        key = (col, "rolling_mean", window)
+        if key not in self._arrays:
+            self._arrays[key] = self.history[:, -window:, self.positions[col]].mean(axis=1)
+        return self._arrays[key]
+
+
+class Screener:
+    """
+    Latest-bar screen of a universe that keeps each symbol's indicator state
+    between refreshes; see the module docstring. `source` is as for
+    batch.load_symbol ("store:<root>", "csv:<dir>" or "yahoo").
+    """
+
+    def __init__(self, source, indicators, params=None, strategies=None, cache_path=None):
+        params = params or {}
+        self.source = source
+        self.indicators = list(dict.fromkeys(indicators))
+        unknown = [name for name in self.indicators if name not in STREAMING_INDICATORS]
+        if unknown:
+            raise ValueError(f"❌ Unknown indicators {unknown}. Choose from {list(STREAMING_INDICATORS)}.")
+        self.strategies = list(strategies or STRATEGY_NAMES)
+        unknown = [name for name in self.strategies if name not in STRATEGY_RULES]
+        if unknown:
+            raise ValueError(f"❌ Unknown strategies {unknown}. Choose from {STRATEGY_NAMES}.")
+
+        self.params = {name: dict(params.get(name, {})) for name in self.indicators}
+        self.outputs = {name: KERNELS[name][2] for name in self.indicators}
+        self.columns = ["Close"] + [col for names in self.outputs.values() for col in names]
+        self.warmup = {name: warmup_bars(name, self.params[name]) for name in self.indicators}
+        self.window = max(self.warmup.values(), default=1) + HISTORY_BARS - 1
+
+        self.cache_path = cache_path
+        self.bars_processed = 0
+        self._states = {}
+        if cache_path and os.path.exists(cache_path):
+            self._load_cache()
+
+    def _config(self):
+        return json.dumps({"source": self.source, "indicators": self.indicators, "params": self.params},
+                          sort_keys=True)
+
+    def _load_cache(self):
+        try:
+            cached = pd.read_pickle(self.cache_path)
+        except Exception as e:
+            print(f"⚠️ Warning: could not read screener cache {self.cache_path}: {e}")
+            return
+        if cached.get("config") == self._config():
+            self._states = cached["states"]
+
+    def save(self, path=None):
+        """Write the per-symbol state to `path` (default: cache_path)."""
+        path = path or self.cache_path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        pd.to_pickle({"config": self._config(), "states": self._states}, tmp_path)
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return len(self._states)
+
+    def _load_bars(self, symbol, state):
+        """The bars to process as {"Date": datetime64 array, field: array}, or None."""
+        kind, _, location = self.source.partition(":")
+        if kind == "store":
+            from barstore import BarStore
+
+            store = BarStore(location)
+            if state is not None:
+                return store.arrays(symbol, start=state.last_date, fields=BAR_FIELDS)
+            df = store.tail(symbol, self.window)
+        else:
+            df = load_symbol(self.source, symbol, start=None if state is None else pd.Timestamp(state.last_date))
+            if state is None:
+                df = df.iloc[-self.window:]
+        if len(df) == 0:
+            return None
+        return {"Date": bar_dates(df), **{col: df[col].to_numpy() for col in BAR_FIELDS}}
+
+    def _feed(self, state, bars, record_from=0, starts=None):
+        """Run the bars through the streams, keeping values from row `record_from` on."""
+        starts = starts or {}
+        high, low, close, volume = (np.asarray(bars[col], dtype=np.float64).tolist() for col in BAR_FIELDS)
+        streams = [(state.streams[name], starts.get(name, 0), self.outputs[name]) for name in self.indicators]
+        n = len(close)
+        rows = []
+        for i in range(n):
+            if i == n - 1:
+                state.before_last = pickle.dumps(state.streams, pickle.HIGHEST_PROTOCOL)
+                state.last_bar = (high[i], low[i], close[i], volume[i])
+            bar = {"High": high[i], "Low": low[i], "Close": close[i], "Volume": volume[i]}
+            row = [close[i]]
+            for stream, start, names in streams:
+                if i < start:
+                    continue
+                value = stream.update(bar)
+                if len(names) == 1:
+                    row.append(value)
+                else:
+                    row.extend(value[col] for col in names)
+            if i >= record_from:
+                rows.append(row)
+        if rows:
+            state.history = np.concatenate([state.history, np.array(rows)])[-HISTORY_BARS:]
+
+    def _update(self, symbol):
+        """Bring one symbol up to date; returns the number of bars processed."""
+        state = self._states.get(symbol)
+        bars = self._load_bars(symbol, state)
+        if bars is None or len(bars["Date"]) == 0:
+            return 0
+        dates = bars["Date"]
+
+        if state is None:
+            state = _SymbolState({name: STREAMING_INDICATORS[name](**self.params[name]) for name in self.indicators},
+                                 len(self.columns))
+            n = len(dates)
+            starts = {name: max(n - (warmup + HISTORY_BARS - 1), 0) for name, warmup in self.warmup.items()}
+            self._feed(state, bars, record_from=max(n - HISTORY_BARS, 0), starts=starts)
+            self._states[symbol] = state
+        else:
+            start = int(np.searchsorted(dates, state.last_date, "left"))
+            if start < len(dates) and dates[start] == state.last_date:
+                if tuple(float(bars[col][start]) for col in BAR_FIELDS) == state.last_bar:
+                    start += 1
+                else:
+                    # The last bar was re-sent with new values: undo it and process it again
+                    state.streams = pickle.loads(state.before_last)
+                    state.history = state.history[:-1]
+            if start == len(dates):
+                return 0
+            bars = {col: values[start:] for col, values in bars.items()}
+            dates = bars["Date"]
+            self._feed(state, bars)
+
+        state.last_date = dates[-1]
+        return len(dates)
+
+    def table(self, symbols=None, where=None):
+        """
+        Ranked latest-bar table for `symbols` (default: every symbol screened
+        so far): symbol, Date, Close, each indicator column, a Buy/Sell/Hold
+        "<strategy> signal" column per strategy and score. Highest score first.
+        """
+        if where:
+            used = [col for col in WINDOW_RELATIVE_COLUMNS if re.search(rf"\b{col}\b", where)]
+            if used:
+                raise ValueError(f"❌ {used} are counted from the start of each symbol's screening window, "
+                                 "not its full history, so `where` can't filter on them.")
+        symbols = [s for s in (self._states if symbols is None else symbols) if s in self._states]
+        history = np.full((len(symbols), HISTORY_BARS, len(self.columns)), np.nan)
+        for i, symbol in enumerate(symbols):
+            rows = self._states[symbol].history
+            if len(rows):
+                history[i, HISTORY_BARS - len(rows):] = rows
+
+        inputs = _LatestInputs(history, self.columns)
+        table = pd.DataFrame({
+            "symbol": symbols,
+            "Date": pd.to_datetime([self._states[s].last_date for s in symbols]),
+            **{col: inputs[col] for col in self.columns},
+        })
+        score = np.zeros(len(symbols), dtype=np.int64)
+        for name in self.strategies:
+            codes = evaluate_rule(STRATEGY_RULES[name], inputs, len(symbols))
+            table[f"{name} signal"] = SIGNAL_LABELS[codes + 1]
+            score += codes
+        table["score"] = score
+
+        if where:
+            table = table.query(where)
+        return table.sort_values(["score", "symbol"], ascending=[False, True], ignore_index=True)
+
+    @instrumented()
+    def refresh(self, symbols, where=None):
+        """
+        Bring every symbol in `symbols` up to date and return table(symbols, where).
+        Symbols that fail to load are reported and left out; the state is
+        saved to cache_path afterwards.
+        """
+        symbols = list(dict.fromkeys(symbols))
+        failures = {}
+        self.bars_processed = 0
+        for symbol in symbols:
+            try:
+                self.bars_processed += self._update(symbol)
+            except Exception as e:
+                failures[symbol] = repr(e)
+        for symbol, error in failures.items():
+            print(f"⚠️ Warning: {symbol} failed: {error}")
+
+        if self.cache_path:
+            self.save()
+        return self.table(symbols, where)
+
+
+def screen(symbols, source, indicators, params=None, strategies=None, where=None, cache_path=None):
+    """One-shot Screener(...).refresh(symbols, where)."""
+    return Screener(source, indicators, params, strategies, cache_path).refresh(symbols, where)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank a universe of symbols by strategy signals on the latest bar.")
+    parser.add_argument("--symbols", nargs="*", default=[], help="Symbols to screen")
+    parser.add_argument("--symbols-file", default=None, help="File with one symbol per line")
+    parser.add_argument("--source", default="store:data/bars",
+                        help="store:<root>, csv:<dir> or yahoo; only store reads just the trailing window, "
+                             "the others load the full history on a symbol's first screen")
+    parser.add_argument("--indicators", nargs="+", required=True, help="Keys of streaming.STREAMING_INDICATORS")
+    parser.add_argument("--params", default="{}", help="Indicator params as JSON")
+    parser.add_argument("--strategies", nargs="+", default=None, help="Strategy names (default: all)")
+    parser.add_argument("--where", default=None,
+                        help='Filter, e.g. "RSI < 30 and MACD > MACD_S" (OBV is window-relative and not allowed)')
+    parser.add_argument("--cache", default="data/screener.pkl", help="State file kept between runs ('' to disable)")
+    parser.add_argument("--top", type=int, default=50, help="Rows to print")
+    args = parser.parse_args(argv)
+
+    symbols = list(args.symbols)
+    if args.symbols_file:
+        with open(args.symbols_file) as f:
+            symbols.extend(line.strip() for line in f if line.strip())
+
+    started = time.perf_counter()
+    screener = Screener(args.source, args.indicators, json.loads(args.params), args.strategies,
+                        cache_path=args.cache or None)
+    table = screener.refresh(symbols, where=args.where)
+    print(f"✅ {len(symbols)} symbols, {screener.bars_processed:,} new bars in {time.perf_counter() - started:.1f}s",
+          file=sys.stderr)
+    print(table.head(args.top).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,92 +1,170 @@
-import pandas as pd
+from collections import namedtuple
 
+import numpy as np
 import pandas as pd
 
-def generate_signals(df, strategy_name):
+from profiling import instrumented
+
+BUY, HOLD, SELL = 1, 0, -1
+SIGNAL_LABELS = np.array(["Sell", "Hold", "Buy"], dtype=object)  # indexed by code + 1
+
+
+class SignalInputs:
     """
-    Generate buy/sell signals based on selected strategy.
-    Returns a DataFrame with a new 'Signal' column: 'Buy', 'Sell', or 'Hold'.
+    Contiguous float64 views of the columns rules read, plus derived series
+    (rolling means), each extracted/computed once and shared by every rule.
+    `df` may also be a plain dict of column arrays (e.g. from kernels.indicator_arrays).
     """
-    signals = pd.DataFrame(index=df.index)
-    signals['Signal'] = 0  # Default to no signal
 
+    def __init__(self, df):
+        self.df = df
+        self._arrays = {}
+
+    def __contains__(self, col):
+        return col in (self.df.columns if isinstance(self.df, pd.DataFrame) else self.df)
+
+    def __getitem__(self, col):
+        if col not in self._arrays:
+            self._arrays[col] = np.ascontiguousarray(np.asarray(self.df[col], dtype=np.float64))
+        return self._arrays[col]
+
+    def rolling_mean(self, col, window):
+        key = (col, "rolling_mean", window)
+        if key not in self._arrays:
+            self._arrays[key] = pd.Series(self[col]).rolling(window).mean().to_numpy()
+        return self._arrays[key]
+
+
+# A strategy is the columns it needs plus its buy and sell conditions over SignalInputs.
+# Sell wins where both conditions hold.
+SignalRule = namedtuple("SignalRule", ["requires", "buy", "sell"])
+
+STRATEGY_RULES = {
     # Pairs
-    if strategy_name == "EMA + RSI":
-        if "EMA" in df.columns and "RSI" in df.columns:
-            signals.loc[(df["EMA"] > df["Close"]) & (df["RSI"] < 30), 'Signal'] = 1
-            signals.loc[(df["EMA"] < df["Close"]) & (df["RSI"] > 70), 'Signal'] = -1
-
-    elif strategy_name == "MACD + RSI":
-        if "MACD" in df.columns and "RSI" in df.columns:
-            signals.loc[(df["MACD"] > df['MACD_S']) & (df["RSI"] < 30), 'Signal'] = 1
-            signals.loc[(df["MACD"] < df['MACD_S']) & (df["RSI"] > 70), 'Signal'] = -1
-
-    elif strategy_name == "EMA Crossover":
-        if "EMA" in df.columns and "EMA_50" in df.columns:
-            signals.loc[df["EMA"] > df["EMA_50"], 'Signal'] = 1
-            signals.loc[df["EMA"] < df["EMA_50"], 'Signal'] = -1
-
-    elif strategy_name == "MACD + BBands":
-        if {"MACD", "BB_upper", "BB_lower"}.issubset(df.columns):
-            signals.loc[(df["MACD"] > 0) & (df["Close"] < df["BB_lower"]), 'Signal'] = 1
-            signals.loc[(df["MACD"] < 0) & (df["Close"] > df["BB_upper"]), 'Signal'] = -1
-
-    elif strategy_name == "Stoch + ATR":
-        if {"Stoch_K", "ATR"}.issubset(df.columns):
-            atr_mean = df["ATR"].rolling(5).mean()
-            signals.loc[(df["Stoch_K"] < 20) & (df["ATR"] > atr_mean), 'Signal'] = 1
-            signals.loc[(df["Stoch_K"] > 80) & (df["ATR"] > atr_mean), 'Signal'] = -1
-
-    elif strategy_name == "OBV + RSI":
-        if {"OBV", "RSI"}.issubset(df.columns):
-            obv_mean = df["OBV"].rolling(10).mean()
-            signals.loc[(df["OBV"] > obv_mean) & (df["RSI"] < 30), 'Signal'] = 1
-            signals.loc[(df["OBV"] < obv_mean) & (df["RSI"] > 70), 'Signal'] = -1
-
-    elif strategy_name == "EMA + MACD":
-        if {"EMA", "MACD"}.issubset(df.columns):
-            signals.loc[(df["EMA"] > df["Close"]) & (df["MACD"] > 0), 'Signal'] = 1
-            signals.loc[(df["EMA"] < df["Close"]) & (df["MACD"] < 0), 'Signal'] = -1
+    "EMA + RSI": SignalRule(
+        ("EMA", "RSI"),
+        lambda c: (c["EMA"] > c["Close"]) & (c["RSI"] < 30),
+        lambda c: (c["EMA"] < c["Close"]) & (c["RSI"] > 70),
+    ),
+    "MACD + RSI": SignalRule(
+        ("MACD", "MACD_S", "RSI"),
+        lambda c: (c["MACD"] > c["MACD_S"]) & (c["RSI"] < 30),
+        lambda c: (c["MACD"] < c["MACD_S"]) & (c["RSI"] > 70),
+    ),
+    "EMA Crossover": SignalRule(
+        ("EMA", "EMA_50"),
+        lambda c: c["EMA"] > c["EMA_50"],
+        lambda c: c["EMA"] < c["EMA_50"],
+    ),
+    "MACD + BBands": SignalRule(
+        ("MACD", "BBU", "BBL"),
+        lambda c: (c["MACD"] > 0) & (c["Close"] < c["BBL"]),
+        lambda c: (c["MACD"] < 0) & (c["Close"] > c["BBU"]),
+    ),
+    "Stoch + ATR": SignalRule(
+        ("Stoch_K", "ATR"),
+        lambda c: (c["Stoch_K"] < 20) & (c["ATR"] > c.rolling_mean("ATR", 5)),
+        lambda c: (c["Stoch_K"] > 80) & (c["ATR"] > c.rolling_mean("ATR", 5)),
+    ),
+    "OBV + RSI": SignalRule(
+        ("OBV", "RSI"),
+        lambda c: (c["OBV"] > c.rolling_mean("OBV", 10)) & (c["RSI"] < 30),
+        lambda c: (c["OBV"] < c.rolling_mean("OBV", 10)) & (c["RSI"] > 70),
+    ),
+    "EMA + MACD": SignalRule(
+        ("EMA", "MACD"),
+        lambda c: (c["EMA"] > c["Close"]) & (c["MACD"] > 0),
+        lambda c: (c["EMA"] < c["Close"]) & (c["MACD"] < 0),
+    ),
 
     # Individual indicators
-    elif strategy_name == "EMA":
-        if "EMA" in df.columns:
-            signals.loc[df["Close"] > df["EMA"], 'Signal'] = 1
-            signals.loc[df["Close"] < df["EMA"], 'Signal'] = -1
-
-    elif strategy_name == "RSI":
-        if "RSI" in df.columns:
-            signals.loc[df["RSI"] < 30, 'Signal'] = 1
-            signals.loc[df["RSI"] > 70, 'Signal'] = -1
-
-    elif strategy_name == "MACD":
-        if "MACD" in df.columns and "MACD_S" in df.columns:
-            signals.loc[df["MACD"] > df["MACD_S"], 'Signal'] = 1
-            signals.loc[df["MACD"] < df["MACD_S"], 'Signal'] = -1
-
-    elif strategy_name == "Stochastic":
-        if "Stoch_K" in df.columns:
-            signals.loc[df["Stoch_K"] < 20, 'Signal'] = 1
-            signals.loc[df["Stoch_K"] > 80, 'Signal'] = -1
-
-    elif strategy_name == "ATR":
-        if "ATR" in df.columns:
-            atr_mean = df["ATR"].rolling(5).mean()
-            signals.loc[df["ATR"] > atr_mean, 'Signal'] = 1
-            signals.loc[df["ATR"] < atr_mean, 'Signal'] = -1
-
-    elif strategy_name == "OBV":
-        if "OBV" in df.columns:
-            obv_mean = df["OBV"].rolling(10).mean()
-            signals.loc[df["OBV"] > obv_mean, 'Signal'] = 1
-            signals.loc[df["OBV"] < obv_mean, 'Signal'] = -1
-
-    else:
+    "EMA": SignalRule(
+        ("EMA",),
+        lambda c: c["Close"] > c["EMA"],
+        lambda c: c["Close"] < c["EMA"],
+    ),
+    "RSI": SignalRule(
+        ("RSI",),
+        lambda c: c["RSI"] < 30,
+        lambda c: c["RSI"] > 70,
+    ),
+    "MACD": SignalRule(
+        ("MACD", "MACD_S"),
+        lambda c: c["MACD"] > c["MACD_S"],
+        lambda c: c["MACD"] < c["MACD_S"],
+    ),
+    "Stochastic": SignalRule(
+        ("Stoch_K",),
+        lambda c: c["Stoch_K"] < 20,
+        lambda c: c["Stoch_K"] > 80,
+    ),
+    "ATR": SignalRule(
+        ("ATR",),
+        lambda c: c["ATR"] > c.rolling_mean("ATR", 5),
+        lambda c: c["ATR"] < c.rolling_mean("ATR", 5),
+    ),
+    "OBV": SignalRule(
+        ("OBV",),
+        lambda c: c["OBV"] > c.rolling_mean("OBV", 10),
+        lambda c: c["OBV"] < c.rolling_mean("OBV", 10),
+    ),
+}
+
+# Strategy names understood by generate_signals
+STRATEGY_NAMES = list(STRATEGY_RULES)
+
+
+def _num_bars(df):
+    return len(df) if isinstance(df, pd.DataFrame) else len(df["Close"])
+
+
+def evaluate_rule(rule, inputs, n):
+    if not all(col in inputs for col in rule.requires):
+        return np.zeros(n, dtype=np.int8)
+    return np.select([rule.sell(inputs), rule.buy(inputs)], [SELL, BUY], HOLD).astype(np.int8)
+
+
+def generate_signal_codes(df, strategy_name, inputs=None):
+    """
+    Evaluate a strategy's rule and return an int8 array: 1 = Buy, -1 = Sell, 0 = Hold.
+    Strategies whose indicator columns are missing produce all Hold.
+    """
+    rule = STRATEGY_RULES.get(strategy_name)
+    if rule is None:
         print(f"⚠️ Warning: Strategy '{strategy_name}' not recognized or missing indicators.")
+        return np.zeros(_num_bars(df), dtype=np.int8)
+    if inputs is None:
+        inputs = SignalInputs(df)
+    return evaluate_rule(rule, inputs, _num_bars(df))
+
+
+@instrumented()
+def generate_signal_matrix(df, strategies=None):
+    """
+    Evaluate several strategies (default: all registered) in one call.
+    Returns an int8 array of shape (len(strategies), len(df)), one row per strategy,
+    and the list of strategy names in row order.
+    """
+    strategies = list(strategies or STRATEGY_NAMES)
+    inputs = SignalInputs(df)
+    matrix = np.zeros((len(strategies), _num_bars(df)), dtype=np.int8)
+    for row, name in enumerate(strategies):
+        matrix[row] = generate_signal_codes(df, name, inputs=inputs)
+    return matrix, strategies
+
 
-    signals["Signal"] = signals["Signal"].map({1: "Buy", -1: "Sell"}).fillna("Hold")
+def signal_labels(codes, index=None):
+    """String view of signal codes for display: a 'Signal' column of 'Buy'/'Sell'/'Hold'."""
+    return pd.DataFrame({"Signal": SIGNAL_LABELS[np.asarray(codes) + 1]}, index=index)
 
-    return signals
+
+@instrumented()
+def generate_signals(df, strategy_name):
+    """
+    Generate buy/sell signals based on selected strategy.
+    Returns a DataFrame with a new 'Signal' column: 'Buy', 'Sell', or 'Hold'.
+    """
+    return signal_labels(generate_signal_codes(df, strategy_name), index=df.index)
 
 
 # was used to generate dummy signals during an earlier bug
@@ -0,0 +1,189 @@
+"""
+Bar-by-bar portfolio simulation.
+
+Unlike calculate_pnl, which prices matched buy/sell pairs independently at a
+fixed size, the simulator walks the bars once and tracks cash and a single
+long position:
+
+- Buy signals open a position at the bar's close when flat, sized as
+  trade_size_pct of current equity (or of initial_balance with
+  compound=False), capped by available cash.
+- Sell signals close it at the bar's close.
+- Stop-loss and take-profit levels are checked against each later bar's
+  Low/High. A gap through the level fills at the open; if both levels are hit
+  in the same bar the stop is assumed to fill first.
+- Slippage moves every fill against us; fees are charged on both sides.
+
+The loop is compiled with numba when it is installed (pip install numba) and
+runs as plain Python otherwise; numba is imported on the first simulation.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from kernels import HAVE_NUMBA, LazyJit
+from profiling import instrumented
+from signals import BUY, SELL
+
+EXIT_SIGNAL, EXIT_STOP_LOSS, EXIT_TAKE_PROFIT = 1, 2, 3
+EXIT_REASONS = {EXIT_SIGNAL: "signal", EXIT_STOP_LOSS: "stop_loss", EXIT_TAKE_PROFIT: "take_profit"}
+
+Simulation = namedtuple("Simulation", ["equity", "trades"])
+
+
+def _simulate_kernel(open_, high, low, close, codes, initial_balance, trade_size_pct,
+                     fee_pct, slippage_pct, stop_loss_pct, take_profit_pct, compound, max_trades):
+    n = len(close)
+    equity = np.empty(n)
+    cash_curve = np.empty(n)
+    position_curve = np.empty(n)
+
+    entry_pos = np.empty(max_trades, dtype=np.int64)
+    exit_pos = np.empty(max_trades, dtype=np.int64)
+    entry_price = np.empty(max_trades)
+    exit_price = np.empty(max_trades)
+    trade_qty = np.empty(max_trades)
+    trade_pnl = np.empty(max_trades)
+    trade_fees = np.empty(max_trades)
+    exit_reason = np.empty(max_trades, dtype=np.int8)
+
+    cash = initial_balance
+    qty = 0.0
+    cost = 0.0
+    entry_fee = 0.0
+    stop = 0.0
+    target = 0.0
+    k = 0
+
+    for i in range(n):
+        if qty > 0.0:
+            price = 0.0
+            reason = 0
+            if stop_loss_pct > 0.0 and low[i] <= stop:
+                price = min(open_[i], stop)
+                reason = EXIT_STOP_LOSS
+            elif take_profit_pct > 0.0 and high[i] >= target:
+                price = max(open_[i], target)
+                reason = EXIT_TAKE_PROFIT
+            elif codes[i] == SELL:
+                price = close[i]
+                reason = EXIT_SIGNAL
+
+            if reason != 0:
+                fill = price * (1.0 - slippage_pct)
+                proceeds = qty * fill
+                fee = proceeds * fee_pct
+                cash += proceeds - fee
+
+                exit_pos[k] = i
+                exit_price[k] = fill
+                trade_pnl[k] = proceeds - fee - cost
+                trade_fees[k] = entry_fee + fee
+                exit_reason[k] = reason
+                k += 1
+                qty = 0.0
+
+        if qty == 0.0 and codes[i] == BUY:
+            base = cash if compound else initial_balance
+            notional = min(trade_size_pct * base, cash)
+            if notional > 0.0:
+                fill = close[i] * (1.0 + slippage_pct)
+                qty = notional / (fill * (1.0 + fee_pct))
+                entry_fee = qty * fill * fee_pct
+                cost = qty * fill + entry_fee
+                cash -= cost
+                stop = fill * (1.0 - stop_loss_pct)
+                target = fill * (1.0 + take_profit_pct)
+
+                entry_pos[k] = i
+                entry_price[k] = fill
+                trade_qty[k] = qty
+
+        cash_curve[i] = cash
+        position_curve[i] = qty
+        equity[i] = cash + qty * close[i]
+
+    return (equity, cash_curve, position_curve, entry_pos[:k], exit_pos[:k], entry_price[:k],
+            exit_price[:k], trade_qty[:k], trade_pnl[:k], trade_fees[:k], exit_reason[:k])
+
+
+_simulate_compiled = LazyJit(_simulate_kernel) if HAVE_NUMBA else None
+
+
+def signal_codes(df, signals):
+    """
+    int8 signal codes aligned to df's rows, from a generate_signals DataFrame
+    ('Signal' column of 'Buy'/'Sell'/'Hold') or an array of codes.
+    Rows without a signal are Hold.
+    """
+    if isinstance(signals, pd.DataFrame):
+        if "Signal" not in signals.columns:
+            raise ValueError("❌ 'Signal' column is missing from the signals DataFrame.")
+        labels = signals["Signal"].reindex(df.index).to_numpy()
+        return np.select([labels == "Buy", labels == "Sell"], [BUY, SELL], 0).astype(np.int8)
+
+    codes = np.asarray(signals, dtype=np.int8)
+    if len(codes) != len(df):
+        raise ValueError(f"❌ Expected {len(df)} signal codes, got {len(codes)}.")
+    return codes
+
+
+@instrumented()
+def simulate(df, signals, initial_balance=10000, trade_size_pct=0.10, fee_pct=0.0,
+             slippage_pct=0.0, stop_loss_pct=None, take_profit_pct=None, compound=True,
+             backend="auto"):
+    """
+    Simulate trading `signals` on the OHLC bars in `df`.
+
+    Percentages are fractions (0.001 = 0.1%). `backend` is "numba", "python"
+    or "auto" (numba when available).
+
+    Returns Simulation(equity, trades):
+    - equity: per-bar DataFrame with Date, cash, position (units held) and equity
+    - trades: closed trades with entry_time, exit_time, entry_price, exit_price,
+      qty, pnl (net of fees), fees and exit_reason. A position still open on
+      the last bar is valued in the equity curve but not listed as a trade.
+    """
+    if backend == "auto":
+        backend = "numba" if _simulate_compiled is not None else "python"
+    if backend == "numba":
+        if _simulate_compiled is None:
+            raise ValueError("❌ The numba backend needs numba installed (pip install numba).")
+        kernel = _simulate_compiled
+    elif backend == "python":
+        kernel = _simulate_kernel
+    else:
+        raise ValueError(f"❌ Unknown simulator backend '{backend}'.")
+
+    codes = signal_codes(df, signals)
+    # Every trade opens on a Buy bar; a stop or target can close one and a new one open on the same bar
+    max_trades = int(np.count_nonzero(codes == BUY))
+    prices = [np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)) for col in ("Open", "High", "Low", "Close")]
+
+    (equity, cash, position, entry_pos, exit_pos, entry_price, exit_price,
+     qty, pnl, fees, reason) = kernel(
+        *prices, codes, float(initial_balance), float(trade_size_pct), float(fee_pct),
+        float(slippage_pct), float(stop_loss_pct or 0.0), float(take_profit_pct or 0.0), bool(compound),
+        max_trades,
+    )
+
+    dates = df["Date"].to_numpy() if "Date" in df.columns else df.index.to_numpy()
+    equity_df = pd.DataFrame({
+        "Date": dates,
+        "cash": cash,
+        "position": position,
+        "equity": equity,
+    }, index=df.index)
+
+    trades_df = pd.DataFrame({
+        "entry_time": dates[entry_pos],
+        "exit_time": dates[exit_pos],
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "qty": qty,
+        "pnl": pnl,
+        "fees": fees,
+        "exit_reason": pd.Categorical.from_codes(reason - 1, list(EXIT_REASONS.values())),
+    })
+    return Simulation(equity_df, trades_df)
@@ -4,6 +4,8 @@ from indicators import (
 )
 import pandas as pd
 
+from profiling import instrumented, span
+
 INDICATOR_FUNCTIONS = {
     "EMA": compute_ema,
     "MACD": compute_macd,
@@ -19,11 +21,20 @@ INDICATOR_FUNCTIONS = {
     "EMA + MACD": ("ema", "macd")
 }
 
-def apply_selected_indicators(df, selected_indicators, params):
+@instrumented()
+def apply_selected_indicators(df, selected_indicators, params, cache=None):
+    """
+    Compute each selected indicator and add its column(s) to df.
+    Pass an IndicatorCache as `cache` to reuse results for unchanged data/params.
+    """
     for indicator in selected_indicators:
         func = INDICATOR_FUNCTIONS[indicator]
         args = params.get(indicator, {})
-        result = func(df, **args)
+        with span(f"indicator.{indicator}", rows=len(df)):
+            if cache is not None:
+                result = cache.get_or_compute(func, df, args)
+            else:
+                result = func(df, **args)
 
         if isinstance(result, pd.Series):
             df[indicator] = result
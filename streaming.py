@@ -0,0 +1,485 @@
+"""
+Streaming (bar-by-bar) versions of the indicators.
+
+Each class keeps just enough state to advance its indicator by one bar in O(1)
+via `update(bar)`, where `bar` is anything indexable by "High"/"Low"/"Close"/
+"Volume" (a dict, or a row of the OHLCV DataFrame). `from_batch(df, ...)` seeds
+an instance from history so live updates continue where the batch run ended.
+
+The recurrences reproduce pandas' own `ewm(adjust=False)` and `rolling()`
+mean/var arithmetic step for step, so streamed values are bit-identical to
+indicator_graph run over the same bars. The one exception is pandas_ta's
+zero-range guard (an epsilon added to the *whole* series if any high-low
+range is exactly zero), which can only be mirrored for bars seen so far.
+
+from_batch takes the EWM-based indicators' state straight from the batch
+run. The rolling ones (Stochastic, Bollinger Bands) replay only the last bars
+their windows reach; their running sums then start from that window instead
+of the whole history, so later values match a batch run to float rounding
+rather than bit for bit.
+
+Example:
+    rsi = StreamingRSI.from_batch(df, length=14)
+    for bar in feed:
+        value = rsi.update(bar)
+"""
+import math
+import sys
+from collections import deque
+
+import numpy as np
+
+from indicator_graph import IndicatorGraph
+
+NAN = float("nan")
+EPSILON = sys.float_info.epsilon
+
+
+def _div(a, b):
+    if b == 0:
+        return NAN if a == 0 or a != a else math.copysign(math.inf, a)
+    return a / b
+
+
+class _EWM:
+    """pandas `ewm(com=..., adjust=False).mean()`, optionally SMA-seeded (pandas_ta presma)."""
+
+    def __init__(self, com, presma=None):
+        alpha = 1.0 / (1.0 + com)
+        self._factor = 1.0 - alpha
+        self._new_wt = alpha
+        self._old_wt = 1.0
+        self._presma = presma
+        self._seed = []
+        self.value = NAN
+
+    @classmethod
+    def span(cls, span, presma=False):
+        return cls((span - 1) / 2.0, presma=span if presma else None)
+
+    @classmethod
+    def alpha(cls, alpha, presma_length=None):
+        return cls((1.0 - alpha) / alpha, presma=presma_length)
+
+    def update(self, x):
+        if self.value != self.value:
+            if x != x:
+                return NAN
+            if self._presma:
+                self._seed.append(x)
+                if len(self._seed) < self._presma:
+                    return NAN
+                x = float(np.sum(self._seed)) / len(self._seed)
+                self._seed = []
+            self.value = x
+            return x
+
+        self._old_wt *= self._factor
+        if x == x:
+            if self.value != x:
+                self.value = (self._old_wt * self.value + self._new_wt * x) / (self._old_wt + self._new_wt)
+            self._old_wt = 1.0
+        return self.value
+
+    def seed(self, inputs, outputs):
+        """Continue from a batch run: `inputs` fed to the EWM, `outputs` what it produced."""
+        inputs = np.asarray(inputs, dtype=np.float64)
+        valid = np.flatnonzero(~np.isnan(inputs))
+        if self._presma and len(valid) < self._presma:
+            # Batch was too short to finish the SMA seed; finish it while streaming
+            self._seed = [float(v) for v in inputs[valid]]
+            return
+        last = float(outputs[-1]) if len(outputs) else NAN
+        if last == last:
+            self.value = last
+            # pandas keeps decaying the old weight over missing inputs; carry the decay of the trailing ones
+            for _ in range(len(inputs) - 1 - valid[-1] if len(valid) else 0):
+                self._old_wt *= self._factor
+
+
+class _RollingMean:
+    """pandas `rolling(window).mean()` (Kahan-compensated add/remove), from the first valid value."""
+
+    def __init__(self, window):
+        self.window = window
+        self._values = deque()
+        self._started = False
+        self._nobs = 0
+        self._sum = 0.0
+        self._comp_add = 0.0
+        self._comp_remove = 0.0
+        self._neg_ct = 0
+        self._same_ct = 0
+        self._prev = NAN
+
+    def update(self, x):
+        if not self._started:
+            if x != x:
+                return NAN
+            self._started = True
+            self._prev = x
+
+        if len(self._values) == self.window:
+            old = self._values.popleft()
+            if old == old:
+                self._nobs -= 1
+                y = -old - self._comp_remove
+                t = self._sum + y
+                self._comp_remove = t - self._sum - y
+                self._sum = t
+                if math.copysign(1.0, old) < 0:
+                    self._neg_ct -= 1
+
+        self._values.append(x)
+        if x == x:
+            self._nobs += 1
+            y = x - self._comp_add
+            t = self._sum + y
+            self._comp_add = t - self._sum - y
+            self._sum = t
+            if math.copysign(1.0, x) < 0:
+                self._neg_ct += 1
+            self._same_ct = self._same_ct + 1 if x == self._prev else 1
+            self._prev = x
+
+        if self._nobs < self.window:
+            return NAN
+        result = self._sum / self._nobs
+        if self._same_ct >= self._nobs:
+            result = self._prev
+        elif self._neg_ct == 0 and result < 0:
+            result = 0.0
+        elif self._neg_ct == self._nobs and result > 0:
+            result = 0.0
+        return result
+
+
+class _RollingVar:
+    """pandas `rolling(window).var(ddof)` (Welford with Kahan compensation)."""
+
+    def __init__(self, window, ddof=1):
+        self.window = window
+        self.ddof = ddof
+        self._values = deque()
+        self._started = False
+        self._nobs = 0
+        self._mean = 0.0
+        self._ssqdm = 0.0
+        self._comp_add = 0.0
+        self._comp_remove = 0.0
+        self._same_ct = 0
+        self._prev = NAN
+
+    def update(self, x):
+        if not self._started:
+            if x != x:
+                return NAN
+            self._started = True
+            self._prev = x
+
+        if len(self._values) == self.window:
+            old = self._values.popleft()
+            if old == old:
+                self._nobs -= 1
+                if self._nobs:
+                    prev_mean = self._mean - self._comp_remove
+                    y = old - self._comp_remove
+                    t = y - self._mean
+                    self._comp_remove = t + self._mean - y
+                    self._mean -= t / self._nobs
+                    self._ssqdm -= (old - prev_mean) * (old - self._mean)
+                else:
+                    self._mean = 0.0
+                    self._ssqdm = 0.0
+
+        self._values.append(x)
+        if x == x:
+            self._same_ct = self._same_ct + 1 if x == self._prev else 1
+            self._prev = x
+            self._nobs += 1
+            prev_mean = self._mean - self._comp_add
+            y = x - self._comp_add
+            t = y - self._mean
+            self._comp_add = t + self._mean - y
+            self._mean += t / self._nobs
+            self._ssqdm += (x - prev_mean) * (x - self._mean)
+
+        if self._nobs < self.window or self._nobs <= self.ddof:
+            return NAN
+        if self._nobs == 1 or self._same_ct >= self._nobs:
+            return 0.0
+        return max(self._ssqdm / (self._nobs - self.ddof), 0.0)
+
+
+class _RollingExtreme:
+    """Rolling min or max over the last `window` values (monotonic deque)."""
+
+    def __init__(self, window, use_max):
+        self.window = window
+        self.use_max = use_max
+        self._count = 0
+        self._deque = deque()  # (position, value)
+
+    def update(self, x):
+        position = self._count
+        self._count += 1
+        if self.use_max:
+            while self._deque and self._deque[-1][1] <= x:
+                self._deque.pop()
+        else:
+            while self._deque and self._deque[-1][1] >= x:
+                self._deque.pop()
+        self._deque.append((position, x))
+        if self._deque[0][0] <= position - self.window:
+            self._deque.popleft()
+        return self._deque[0][1] if self._count >= self.window else NAN
+
+
+class StreamingEMA:
+    def __init__(self, length=14):
+        self.length = length
+        self._ema = _EWM.span(length, presma=True)
+
+    @classmethod
+    def from_batch(cls, df, length=14):
+        self = cls(length)
+        self._ema.seed(df["Close"].to_numpy(), IndicatorGraph(df).get(("ema", length)).to_numpy())
+        return self
+
+    @property
+    def value(self):
+        return self._ema.value
+
+    def update(self, bar):
+        return self._ema.update(float(bar["Close"]))
+
+
+class StreamingMACD:
+    def __init__(self, fast=12, slow=26, signal=9):
+        if slow < fast:
+            fast, slow = slow, fast
+        self.fast, self.slow, self.signal = fast, slow, signal
+        self._fast = _EWM.span(fast, presma=True)
+        self._slow = _EWM.span(slow, presma=True)
+        self._signal = _EWM.span(signal, presma=True)
+        self.value = {"MACD": NAN, "MACD_S": NAN, "MACD_H": NAN}
+
+    @classmethod
+    def from_batch(cls, df, fast=12, slow=26, signal=9):
+        self = cls(fast, slow, signal)
+        graph = IndicatorGraph(df)
+        close = df["Close"].to_numpy()
+        self._fast.seed(close, graph.get(("ema", self.fast)).to_numpy())
+        self._slow.seed(close, graph.get(("ema", self.slow)).to_numpy())
+        macd = graph.compute("MACD", fast=fast, slow=slow, signal=signal)
+        self._signal.seed(macd["MACD"].to_numpy(), macd["MACD_S"].to_numpy())
+        if len(macd):
+            self.value = macd.iloc[-1].to_dict()
+        return self
+
+    def update(self, bar):
+        close = float(bar["Close"])
+        macd = self._fast.update(close) - self._slow.update(close)
+        signal = self._signal.update(macd)
+        self.value = {"MACD": macd, "MACD_S": signal, "MACD_H": macd - signal}
+        return self.value
+
+
+class StreamingRSI:
+    """RSI with Wilder smoothing of gains and losses."""
+
+    def __init__(self, length=9):
+        self.length = length
+        self._gain = _EWM.alpha(1.0 / length)
+        self._loss = _EWM.alpha(1.0 / length)
+        self._prev_close = NAN
+        self.value = NAN
+
+    @classmethod
+    def from_batch(cls, df, length=9):
+        self = cls(length)
+        if len(df):
+            graph = IndicatorGraph(df)
+            diff = graph.get(("diff",))
+            self._gain.seed(diff.clip(lower=0).to_numpy(), graph.get(("gain_rma", length)).to_numpy())
+            self._loss.seed(diff.clip(upper=0).to_numpy(), graph.get(("loss_rma", length)).to_numpy())
+            self._prev_close = float(df["Close"].iloc[-1])
+            self.value = float(graph.compute("RSI", length=length).iloc[-1])
+        return self
+
+    def update(self, bar):
+        close = float(bar["Close"])
+        change = close - self._prev_close
+        self._prev_close = close
+        gain = self._gain.update(max(change, 0.0) if change == change else NAN)
+        loss = self._loss.update(min(change, 0.0) if change == change else NAN)
+        self.value = _div(100 * gain, gain + abs(loss))
+        return self.value
+
+
+class StreamingStochastic:
+    def __init__(self, k=14, d=3, smooth_k=3):
+        self.k, self.d, self.smooth_k = k, d, smooth_k
+        self._low = _RollingExtreme(k, use_max=False)
+        self._high = _RollingExtreme(k, use_max=True)
+        self._smooth = _RollingMean(smooth_k) if smooth_k != 1 else None
+        self._signal = _RollingMean(d)
+        self._zero_range = False
+        self.value = {"Stoch_K": NAN, "Stoch_D": NAN}
+
+    @classmethod
+    def from_batch(cls, df, k=14, d=3, smooth_k=3):
+        self = cls(k, d, smooth_k)
+        if len(df):
+            graph = IndicatorGraph(df)
+            self._zero_range = bool((graph.get(("rolling_high", k)) == graph.get(("rolling_low", k))).any())
+            # %D at the last bar reaches back k + smooth_k + d - 2 bars; only those are replayed
+            tail = df.iloc[-(k + smooth_k + d - 2):]
+            for high, low, close in zip(tail["High"].to_numpy(), tail["Low"].to_numpy(), tail["Close"].to_numpy()):
+                self._step(float(high), float(low), float(close))
+            self.value = graph.compute("Stochastic", k=k, d=d, smooth_k=smooth_k).iloc[-1].to_dict()
+        return self
+
+    def _step(self, high, low, close):
+        ll = self._low.update(low)
+        hh = self._high.update(high)
+        rng = hh - ll
+        if rng == 0:
+            self._zero_range = True
+        if self._zero_range:
+            rng += EPSILON
+        raw = _div(100 * (close - ll), rng)
+        stoch_k = self._smooth.update(raw) if self._smooth else raw
+        stoch_d = self._signal.update(stoch_k)
+        self.value = {"Stoch_K": stoch_k, "Stoch_D": stoch_d}
+        return self.value
+
+    def update(self, bar):
+        return self._step(float(bar["High"]), float(bar["Low"]), float(bar["Close"]))
+
+
+class StreamingBBands:
+    def __init__(self, length=20, std=2, ddof=1):
+        self.length, self.std, self.ddof = length, std, ddof
+        self._mean = _RollingMean(length)
+        self._var = _RollingVar(length, ddof)
+        self._zero_band = False
+        self._zero_percent = False
+        self.value = dict.fromkeys(["BBL", "BBM", "BBU", "BBB", "BBP"], NAN)
+
+    @classmethod
+    def from_batch(cls, df, length=20, std=2, ddof=1):
+        self = cls(length, std, ddof)
+        if len(df):
+            graph = IndicatorGraph(df)
+            mid = graph.get(("sma", length))
+            deviation = std * graph.get(("std", length, ddof))
+            self._zero_band = bool((deviation == 0).any())
+            self._zero_percent = bool((df["Close"] == mid - deviation).any())
+            # The bands at the last bar only reach back `length` bars; only those are replayed
+            for close in df["Close"].to_numpy()[-length:]:
+                self._step(float(close))
+            self.value = graph.compute("Bollinger Bands", length=length, std=std, ddof=ddof).iloc[-1].to_dict()
+        return self
+
+    def _step(self, close):
+        mid = self._mean.update(close)
+        var = self._var.update(close)
+        deviation = self.std * (math.sqrt(var) if var == var else NAN)
+        lower = mid - deviation
+        upper = mid + deviation
+
+        ulr = upper - lower
+        if ulr == 0:
+            self._zero_band = True
+        if self._zero_band:
+            ulr += EPSILON
+        above = close - lower
+        if above == 0:
+            self._zero_percent = True
+        if self._zero_percent:
+            above += EPSILON
+
+        self.value = {
+            "BBL": lower,
+            "BBM": mid,
+            "BBU": upper,
+            "BBB": _div(100 * ulr, mid),
+            "BBP": _div(above, ulr),
+        }
+        return self.value
+
+    def update(self, bar):
+        return self._step(float(bar["Close"]))
+
+
+class StreamingATR:
+    def __init__(self, length=14):
+        self.length = length
+        self._atr = _EWM.alpha(1.0 / length, presma_length=length)
+        self._prev_close = NAN
+        self._zero_range = False
+
+    @classmethod
+    def from_batch(cls, df, length=14):
+        self = cls(length)
+        if len(df):
+            graph = IndicatorGraph(df)
+            self._atr.seed(graph.get(("true_range",)).to_numpy(), graph.get(("atr", length)).to_numpy())
+            self._prev_close = float(df["Close"].iloc[-1])
+            self._zero_range = bool((df["High"] == df["Low"]).any())
+        return self
+
+    @property
+    def value(self):
+        return self._atr.value
+
+    def update(self, bar):
+        high, low, close = float(bar["High"]), float(bar["Low"]), float(bar["Close"])
+        hl = high - low
+        if hl == 0:
+            self._zero_range = True
+        if self._zero_range:
+            hl += EPSILON
+        ranges = [abs(r) for r in (hl, high - self._prev_close, self._prev_close - low) if r == r]
+        self._prev_close = close
+        return self._atr.update(max(ranges))
+
+
+class StreamingOBV:
+    def __init__(self):
+        self._prev_close = NAN
+        self.value = NAN
+
+    @classmethod
+    def from_batch(cls, df):
+        self = cls()
+        if len(df):
+            self._prev_close = float(df["Close"].iloc[-1])
+            # The running total carries on over bars with a missing close; the batch shows NaN there
+            valid = IndicatorGraph(df).get(("obv",)).dropna()
+            if len(valid):
+                self.value = float(valid.iloc[-1])
+        return self
+
+    def update(self, bar):
+        close, volume = float(bar["Close"]), float(bar["Volume"])
+        change = close - self._prev_close
+        self._prev_close = close
+        if change != change:
+            return NAN
+        signed = float(np.sign(change)) * volume
+        self.value = signed if self.value != self.value else self.value + signed
+        return self.value
+
+
+# Keyed like strategies.INDICATOR_FUNCTIONS
+STREAMING_INDICATORS = {
+    "EMA": StreamingEMA,
+    "MACD": StreamingMACD,
+    "RSI": StreamingRSI,
+    "Stochastic": StreamingStochastic,
+    "Bollinger Bands": StreamingBBands,
+    "ATR": StreamingATR,
+    "OBV": StreamingOBV,
+}
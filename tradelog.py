@@ -0,0 +1,222 @@
+"""
+Compact, typed trade logs.
+
+A TradeLog keeps closed trades in preallocated NumPy columns (int32 run,
+int64 bar positions, int8 side, float64 prices/qty/pnl/fees) that double in
+capacity when full, so appending is amortized O(1) and a million trades take
+about 61 MB instead of a million Python objects. `run` tells apart the trades
+of different runs (strategies, parameter combinations) sharing one log.
+to_frame() and to_arrow() wrap the filled part of the columns without copying
+them.
+
+Sweeps that produce more trades than fit in memory can hand the log to a
+TradeLogWriter every so often and clear() it: the writer streams each batch
+to Parquet (one row group per chunk) or CSV and the buffer is reused.
+
+Example:
+    log = TradeLog()
+    with TradeLogWriter("trades.parquet") as writer:
+        for i, params in enumerate(grid):
+            entry, exit_ = run(params)
+            log.extend(entry, exit_, close[entry], close[exit_], qty, pnl, run=i)
+            if len(log) >= 1_000_000:
+                writer.write(log)
+                log.clear()
+        writer.write(log)
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+LONG = 1
+SHORT = -1
+
+# Column -> dtype, in export order
+COLUMNS = {
+    "run": np.int32,
+    "entry_pos": np.int64,
+    "exit_pos": np.int64,
+    "side": np.int8,
+    "entry_price": np.float64,
+    "exit_price": np.float64,
+    "qty": np.float64,
+    "pnl": np.float64,
+    "fees": np.float64,
+}
+
+FORMATS = ("parquet", "csv")
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise ValueError("❌ Arrow/Parquet export needs pyarrow installed (pip install pyarrow).")
+    return pyarrow
+
+
+class TradeLog:
+    """Closed trades in growable typed columns; see the module docstring."""
+
+    def __init__(self, capacity=1024):
+        self.n = 0
+        self._data = {col: np.empty(max(int(capacity), 1), dtype=dtype) for col, dtype in COLUMNS.items()}
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def capacity(self):
+        return len(self._data["pnl"])
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self._data.values())
+
+    def column(self, col):
+        """View of one column's filled rows (valid until the next append grows the log)."""
+        return self._data[col][:self.n]
+
+    def columns(self):
+        return {col: self.column(col) for col in COLUMNS}
+
+    def _reserve(self, needed):
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, 2 * self.capacity)
+        for col, values in self._data.items():
+            grown = np.empty(capacity, dtype=values.dtype)
+            grown[:self.n] = values[:self.n]
+            self._data[col] = grown
+
+    def append(self, entry_pos, exit_pos, entry_price, exit_price, qty, pnl, fees=0.0, side=LONG, run=0):
+        """Add one trade."""
+        self._reserve(self.n + 1)
+        i = self.n
+        data = self._data
+        data["run"][i] = run
+        data["entry_pos"][i] = entry_pos
+        data["exit_pos"][i] = exit_pos
+        data["side"][i] = side
+        data["entry_price"][i] = entry_price
+        data["exit_price"][i] = exit_price
+        data["qty"][i] = qty
+        data["pnl"][i] = pnl
+        data["fees"][i] = fees
+        self.n = i + 1
+
+    def extend(self, entry_pos, exit_pos, entry_price, exit_price, qty, pnl, fees=0.0, side=LONG, run=0):
+        """Add a batch of trades; scalars (e.g. fees, side, run) are broadcast over the batch."""
+        count = len(entry_pos)
+        if count == 0:
+            return self
+        values = {
+            "run": run, "entry_pos": entry_pos, "exit_pos": exit_pos, "side": side, "entry_price": entry_price,
+            "exit_price": exit_price, "qty": qty, "pnl": pnl, "fees": fees,
+        }
+        for col, value in values.items():
+            if np.ndim(value) and len(value) != count:
+                raise ValueError(f"❌ Expected {count} values for '{col}', got {len(value)}.")
+
+        self._reserve(self.n + count)
+        for col, value in values.items():
+            self._data[col][self.n:self.n + count] = value
+        self.n += count
+        return self
+
+    def clear(self):
+        """Drop every trade but keep the allocated capacity."""
+        self.n = 0
+        return self
+
+    def to_frame(self, dates=None):
+        """
+        The trades as a DataFrame over the log's own arrays (no copy). With
+        `dates` (the bars' dates, indexed by position) entry_time and
+        exit_time columns are added in front.
+        """
+        columns = self.columns()
+        if dates is not None:
+            dates = np.asarray(dates)
+            columns = {"entry_time": dates[columns["entry_pos"]], "exit_time": dates[columns["exit_pos"]], **columns}
+        return pd.DataFrame(columns, copy=False)
+
+    def to_arrow(self):
+        """The trades as a pyarrow Table sharing the log's memory."""
+        pa = _pyarrow()
+        return pa.table({col: pa.array(values) for col, values in self.columns().items()})
+
+    def write_parquet(self, path, chunk_rows=DEFAULT_CHUNK_ROWS):
+        with TradeLogWriter(path, "parquet", chunk_rows) as writer:
+            writer.write(self)
+
+    def write_csv(self, path, chunk_rows=DEFAULT_CHUNK_ROWS):
+        with TradeLogWriter(path, "csv", chunk_rows) as writer:
+            writer.write(self)
+
+
+class TradeLogWriter:
+    """
+    Streams trades to one Parquet or CSV file (format from the extension
+    unless given), `chunk_rows` rows at a time, so neither the log nor the
+    file contents need to be held in memory at once. With `dates` (the bars'
+    dates, indexed by position) entry_time and exit_time columns are written
+    in front, as TradeLog.to_frame adds them. Use as a context manager.
+    """
+
+    def __init__(self, path, format=None, chunk_rows=DEFAULT_CHUNK_ROWS, dates=None):
+        if format is None:
+            format = "csv" if os.fspath(path).endswith(".csv") else "parquet"
+        if format not in FORMATS:
+            raise ValueError(f"❌ Unknown trade log format '{format}'. Choose from {FORMATS}.")
+        self.path = path
+        self.format = format
+        self.chunk_rows = max(int(chunk_rows), 1)
+        self.rows = 0
+        self.dates = np.asarray(dates) if dates is not None else None
+        self._writer = None
+        self._file = None
+        types = dict(COLUMNS)
+        if self.dates is not None:
+            types = {"entry_time": self.dates.dtype, "exit_time": self.dates.dtype, **types}
+        if format == "parquet":
+            pa = _pyarrow()
+            schema = pa.schema([(col, pa.from_numpy_dtype(dtype)) for col, dtype in types.items()])
+            self._writer = pa.parquet.ParquetWriter(path, schema)
+        else:
+            self._file = open(path, "w", newline="")
+            self._file.write(",".join(types) + "\n")
+
+    def write(self, log):
+        """Append every trade currently in `log`."""
+        for start in range(0, len(log), self.chunk_rows):
+            stop = min(start + self.chunk_rows, len(log))
+            chunk = {col: values[start:stop] for col, values in log.columns().items()}
+            if self.dates is not None:
+                chunk = {"entry_time": self.dates[chunk["entry_pos"]], "exit_time": self.dates[chunk["exit_pos"]],
+                         **chunk}
+            if self._writer is not None:
+                self._writer.write_table(_pyarrow().table(chunk))
+            else:
+                pd.DataFrame(chunk, copy=False).to_csv(self._file, header=False, index=False)
+            self.rows += stop - start
+        return self
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
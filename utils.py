@@ -1,6 +1,20 @@
-import yfinance as yf
+import asyncio
+import json
+import os
+
 import pandas as pd
 
+from barstore import BarStore, PRICE_COLUMNS
+from profiling import instrumented
+
+
+def _yf():
+    # yfinance pulls in requests/curl_cffi and friends; only load it when fetching
+    import yfinance as yf
+    return yf
+
+
+@instrumented()
 def load_stock_data(ticker="AAPL", start="2022-01-01", end=None):
     """
     Load OHLCV data from Yahoo Finance.
@@ -14,7 +28,7 @@ def load_stock_data(ticker="AAPL", start="2022-01-01", end=None):
     - DataFrame with columns: ['Open', 'High', 'Low', 'Close', 'Volume']
     """
     try:
-        df = yf.download(ticker, start=start, end=end, progress=False)
+        df = _yf().download(ticker, start=start, end=end, progress=False)
         df = df[['Open', 'High', 'Low', 'Close', 'Volume']]
         df.dropna(inplace=True)
         df.reset_index(inplace=True)
@@ -22,3 +36,229 @@ def load_stock_data(ticker="AAPL", start="2022-01-01", end=None):
     except Exception as e:
         print(f"Error loading data for {ticker}: {e}")
         return pd.DataFrame()
+
+
+@instrumented()
+def load_csv_data(path):
+    """
+    Load OHLCV data from a CSV file.
+
+    Accepts both a plain Date/Open/High/Low/Close/Volume CSV and the
+    three-header-row layout written by yfinance's `to_csv` (e.g. btc.csv).
+
+    Returns:
+    - DataFrame with columns: ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+    """
+    df = pd.read_csv(path)
+    if "Price" in df.columns:
+        # yfinance export: "Ticker" and "Date" header rows sit under the column names
+        df = df.iloc[2:].rename(columns={"Price": "Date"})
+
+    df["Date"] = pd.to_datetime(df["Date"])
+    df = df[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']]
+    df = df.astype({col: float for col in ['Open', 'High', 'Low', 'Close', 'Volume']})
+    df.dropna(inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    return df
+
+
+class DataSource:
+    """
+    Where bars come from. Subclasses implement `fetch(symbol, start, end)`
+    returning a Date/Open/High/Low/Close/Volume frame for [start, end), and
+    raise on failure rather than returning an empty frame.
+    """
+
+    def fetch(self, symbol, start, end):
+        raise NotImplementedError
+
+    async def fetch_async(self, symbol, start, end):
+        # Sources are blocking (HTTP, disk); run them off the event loop
+        return await asyncio.to_thread(self.fetch, symbol, start, end)
+
+
+class YahooSource(DataSource):
+    def __init__(self, interval="1d"):
+        self.interval = interval
+
+    def fetch(self, symbol, start, end):
+        # Ticker.history can raise on failure; yf.download only logs it and returns an empty frame
+        df = _yf().Ticker(symbol).history(start=start, end=end, interval=self.interval,
+                                         auto_adjust=False, raise_errors=True)
+        return yahoo_frame(df)
+
+
+def yahoo_frame(df):
+    """
+    A Date/Open/High/Low/Close/Volume frame from a yfinance result indexed by
+    date: flat columns (Ticker.history) or yf.download's (Price, Ticker)
+    MultiIndex for one ticker, with tz-aware dates made naive.
+    """
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+    df = df[PRICE_COLUMNS].dropna()
+    df.index.name = "Date"
+    df = df.reset_index()
+    if isinstance(df["Date"].dtype, pd.DatetimeTZDtype):
+        df["Date"] = df["Date"].dt.tz_localize(None)
+    return df
+
+
+class LocalFileSource(DataSource):
+    """Reads <directory>/<symbol>.csv (see load_csv_data); a stand-in for Yahoo offline and in tests."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, symbol, start, end):
+        df = load_csv_data(os.path.join(self.directory, f"{symbol}.csv"))
+        mask = (df["Date"] >= start) & (df["Date"] < end)
+        return df[mask].reset_index(drop=True)
+
+
+def _subtract_intervals(start, end, covered):
+    """Parts of [start, end) not inside any of the sorted, disjoint `covered` intervals."""
+    missing = []
+    cursor = start
+    for lo, hi in covered:
+        if hi <= cursor:
+            continue
+        if lo >= end:
+            break
+        if lo > cursor:
+            missing.append((cursor, lo))
+        cursor = max(cursor, hi)
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+
+def _merge_intervals(intervals):
+    """
+    Merge overlapping (start, end, fetched_at) intervals. A merged interval
+    keeps the fetch time of the part that reaches its end.
+    """
+    merged = []
+    for lo, hi, fetched in sorted(intervals):
+        if merged and lo <= merged[-1][1]:
+            last_lo, last_hi, last_fetched = merged[-1]
+            if hi > last_hi or (hi == last_hi and fetched > last_fetched):
+                merged[-1] = (last_lo, hi, fetched)
+        else:
+            merged.append((lo, hi, fetched))
+    return merged
+
+
+class CachedBarLoader:
+    """
+    Bars from a DataSource, cached on disk in a BarStore.
+
+    Each symbol remembers which time ranges have already been fetched and
+    when (<root>/<SYMBOL>/coverage.json), so a request only fetches the
+    ranges it doesn't cover yet. A range that reached bars less than
+    `max_age` seconds old when it was fetched ends in bars still forming: for
+    `max_age` after that fetch it counts as covering everything up to now,
+    so reruns are served entirely from disk, and after that its last
+    `max_age` is refetched once.
+
+    If a fetch fails but the store already holds bars for the symbol, a
+    warning is printed and the cached bars are returned.
+    """
+
+    def __init__(self, source=None, root="data/cache", max_age=15 * 60):
+        self.source = source or YahooSource()
+        self.store = BarStore(root)
+        self.max_age = pd.Timedelta(seconds=max_age)
+
+    def _coverage_path(self, symbol):
+        return os.path.join(self.store.root, symbol, "coverage.json")
+
+    def coverage(self, symbol):
+        """Fetched ranges for `symbol` as sorted (start, end, fetched_at) Timestamps; end is exclusive."""
+        path = self._coverage_path(symbol)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            # Files written before fetch times were kept: treat each range as fetched at its end
+            return [(pd.Timestamp(lo), pd.Timestamp(hi), pd.Timestamp(fetched[0] if fetched else hi))
+                    for lo, hi, *fetched in json.load(f)]
+
+    def _save_coverage(self, symbol, intervals):
+        path = self._coverage_path(symbol)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, "w") as f:
+            json.dump([[lo.isoformat(), hi.isoformat(), fetched.isoformat()] for lo, hi, fetched in intervals], f)
+        os.replace(tmp, path)
+
+    def _fresh(self, intervals, now):
+        """The ranges in `intervals` that don't need refetching at `now`, as sorted (start, end) pairs."""
+        fresh = []
+        for lo, hi, fetched in intervals:
+            if hi > fetched - self.max_age:
+                # Ends in bars that were still forming at fetch time
+                hi = pd.Timestamp.max if now - fetched < self.max_age else max(lo, fetched - self.max_age)
+            fresh.append((lo, hi))
+        return sorted(fresh)
+
+    def missing(self, symbol, start, end=None):
+        """Ranges of [start, end) that would be fetched by `load`."""
+        start, end = self._bounds(start, end)
+        return _subtract_intervals(start, end, self._fresh(self.coverage(symbol), pd.Timestamp.now()))
+
+    @staticmethod
+    def _bounds(start, end):
+        start = pd.Timestamp(start)
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp.now().normalize() + pd.Timedelta(days=1)
+        return start, end
+
+    async def load_async(self, symbol, start="2022-01-01", end=None):
+        start, end = self._bounds(start, end)
+        now = pd.Timestamp.now()
+        covered = self.coverage(symbol)
+
+        try:
+            for lo, hi in self.missing(symbol, start, end):
+                # Refetch from the start of the day so a partial bar gets replaced
+                bars = await self.source.fetch_async(symbol, lo.normalize(), hi)
+                await asyncio.to_thread(self.store.write, symbol, bars)
+                covered = _merge_intervals(covered + [(lo, min(hi, now), now)])
+                self._save_coverage(symbol, covered)
+        except Exception as e:
+            if not self.store.years(symbol):
+                raise
+            print(f"⚠️ Warning: fetching {symbol} failed ({e}); using cached bars.")
+
+        return self.store.load(symbol, start=start, end=end - pd.Timedelta(1, "ns"))
+
+    @instrumented()
+    def load(self, symbol, start="2022-01-01", end=None):
+        """Bars for `symbol` in [start, end), fetching only what isn't cached yet."""
+        return asyncio.run(self.load_async(symbol, start, end))
+
+    async def load_many_async(self, symbols, start="2022-01-01", end=None, max_concurrency=8):
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def load_one(symbol):
+            async with semaphore:
+                return await self.load_async(symbol, start, end)
+
+        symbols = list(dict.fromkeys(symbols))
+        results = await asyncio.gather(*(load_one(s) for s in symbols), return_exceptions=True)
+
+        frames = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                print(f"⚠️ Warning: could not load {symbol}: {result}")
+            else:
+                frames[symbol] = result
+        return frames
+
+    @instrumented()
+    def load_many(self, symbols, start="2022-01-01", end=None, max_concurrency=8):
+        """
+        Load several symbols concurrently, at most `max_concurrency` fetches at a time.
+        Returns {symbol: DataFrame}; symbols that fail are reported and left out.
+        """
+        return asyncio.run(self.load_many_async(symbols, start, end, max_concurrency))
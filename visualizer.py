@@ -1,14 +1,27 @@
 import plotly.graph_objs as go
 import pandas as pd
 
-def plot_price_with_indicators(df, indicators=[], title="Price Chart with Indicators", signals=None):
+from decimate import DEFAULT_WIDTH, ChartData, chart_data
+from profiling import instrumented
+
+# Every chart takes `width` (pixels) and `x_range` ((start, end) dates) and
+# only ships about as many points as fit; see decimate.py.
+
+@instrumented()
+def plot_price_with_indicators(df, indicators=[], title="Price Chart with Indicators", signals=None,
+                               width=DEFAULT_WIDTH, x_range=None, pyramid=None):
+    """Pass a resample.BarPyramid of df's bars to draw candles from its pre-aggregated zoom levels."""
     fig = go.Figure()
+    if pyramid is not None:
+        candles = pyramid.candles(width, x_range)
+    else:
+        candles = chart_data(df).ohlc(width, x_range)
 
     # Price line
     fig.add_trace(go.Candlestick(
-        x=df['Date'],
-        open=df['Open'], high=df['High'], 
-        low=df['Low'], close=df['Close'], 
+        x=candles['Date'],
+        open=candles['Open'], high=candles['High'], 
+        low=candles['Low'], close=candles['Close'], 
         name='Candle stick'
         
     ))
@@ -46,103 +59,148 @@ def plot_price_with_indicators(df, indicators=[], title="Price Chart with Indica
 
 
 
-def plot_volume(df):
+def _line(fig, data, col, width, x_range, **kwargs):
+    x, y = data.line(col, width, x_range)
+    fig.add_trace(go.Scatter(x=x, y=y, **kwargs))
+
+
+@instrumented()
+def plot_volume(df, width=DEFAULT_WIDTH, x_range=None):
+    x, y = chart_data(df).bars('Volume', width, x_range)
     return go.Figure(data=[
-        go.Bar(x=df.index, y=df['Volume'], name='Volume', marker_color='blue')
+        go.Bar(x=x, y=y, name='Volume', marker_color='blue')
     ]).update_layout(title='Volume', xaxis_title='Date', yaxis_title='Volume')
 
 
-def plot_rsi(df):
-    if 'RSI' in df.columns or 'RSI' in df.columns:
+@instrumented()
+def plot_rsi(df, width=DEFAULT_WIDTH, x_range=None):
+    if 'RSI' in df.columns:
+        data = chart_data(df)
         fig = go.Figure()
-        if 'RSI' in df.columns:
-            fig.add_trace(go.Scatter(x=df.index, y=df['RSI'], name='RSI'))
-        if 'RSI' in df.columns:
-            fig.add_trace(go.Scatter(x=df.index, y=df['RSI'], name='RSI'))
-        fig.add_shape(type='line', x0=df.index[0], x1=df.index[-1], y0=70, y1=70, line=dict(dash='dash', color='red'))
-        fig.add_shape(type='line', x0=df.index[0], x1=df.index[-1], y0=30, y1=30, line=dict(dash='dash', color='green'))
+        _line(fig, data, 'RSI', width, x_range, name='RSI')
+        lo, hi = data.window(x_range)
+        if hi > lo:
+            x0, x1 = data.x[lo], data.x[hi - 1]
+            fig.add_shape(type='line', x0=x0, x1=x1, y0=70, y1=70, line=dict(dash='dash', color='red'))
+            fig.add_shape(type='line', x0=x0, x1=x1, y0=30, y1=30, line=dict(dash='dash', color='green'))
         fig.update_layout(title='RSI', yaxis_title='Value')
         return fig
     return None
 
 
-def plot_macd(df):
+@instrumented()
+def plot_macd(df, width=DEFAULT_WIDTH, x_range=None):
     if 'MACD' in df.columns and 'MACD_S' in df.columns:
+        data = chart_data(df)
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=df.index, y=df['MACD'], name='MACD'))
-        fig.add_trace(go.Scatter(x=df.index, y=df['MACD_S'], name='Signal'))
+        _line(fig, data, 'MACD', width, x_range, name='MACD')
+        _line(fig, data, 'MACD_S', width, x_range, name='Signal')
         if 'MACD_H' in df.columns:
-            fig.add_trace(go.Bar(x=df.index, y=df['MACD_H'], name='Histogram'))
+            x, y = data.bars('MACD_H', width, x_range)
+            fig.add_trace(go.Bar(x=x, y=y, name='Histogram'))
         fig.update_layout(title='MACD', yaxis_title='MACD Value')
         return fig
     return None
 
-def plot_ema(df):
+@instrumented()
+def plot_ema(df, width=DEFAULT_WIDTH, x_range=None):
     if 'EMA' in df.columns:
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=df.index, y=df['EMA'], name='EMA'))
+        _line(fig, chart_data(df), 'EMA', width, x_range, name='EMA')
         return fig
     return None
-def plot_stoch(df):
+@instrumented()
+def plot_stoch(df, width=DEFAULT_WIDTH, x_range=None):
     if 'Stoch_K' in df.columns and 'Stoch_D' in df.columns:
+        data = chart_data(df)
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=df.index, y=df['Stoch_K'], name='Stoch_K'))  # fixed key
-        fig.add_trace(go.Scatter(x=df.index, y=df['Stoch_D'], name='Stoch_D'))
+        _line(fig, data, 'Stoch_K', width, x_range, name='Stoch_K')
+        _line(fig, data, 'Stoch_D', width, x_range, name='Stoch_D')
         return fig
     return None
 
-def plot_bbands(df):
+@instrumented()
+def plot_bbands(df, width=DEFAULT_WIDTH, x_range=None):
     if 'BBL' in df.columns and 'BBM' in df.columns and 'BBU' in df.columns:
+        data = chart_data(df)
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=df['Date'], y=df['BBU'], name='Upper', line=dict(color='teal')))
-        fig.add_trace(go.Scatter(x=df['Date'], y=df['BBM'], name='Middle', line=dict(color='green')))
-        fig.add_trace(go.Scatter(x=df['Date'], y=df['BBL'], name='Lower', line=dict(color='pink')))
+        _line(fig, data, 'BBU', width, x_range, name='Upper', line=dict(color='teal'))
+        _line(fig, data, 'BBM', width, x_range, name='Middle', line=dict(color='green'))
+        _line(fig, data, 'BBL', width, x_range, name='Lower', line=dict(color='pink'))
         return fig
     return None
 
-def plot_atr(df):
-    if 'ATRr_14' in df.columns:
+@instrumented()
+def plot_atr(df, width=DEFAULT_WIDTH, x_range=None):
+    if 'ATR' in df.columns:
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=df.index, y=df['ATRr_14'], name='ATR'))
+        _line(fig, chart_data(df), 'ATR', width, x_range, name='ATR')
         return fig
     return None
 
-def plot_obv(df):
+@instrumented()
+def plot_obv(df, width=DEFAULT_WIDTH, x_range=None):
     if 'OBV' in df.columns:
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=df.index, y=df['OBV'], name='OBV'))
+        _line(fig, chart_data(df), 'OBV', width, x_range, name='OBV')
         return fig
     return None
 
 
 
-def plot_cumulative_return(trades_df, initial_balance=10000):
-    trades_df["cumulative_pnl"] = trades_df["pnl"].cumsum() + initial_balance
+def _curves(dates, **columns):
+    """ChartData over per-bar series that aren't frame columns, e.g. an equity curve; keep the frame alive while using it."""
+    frame = pd.DataFrame({"Date": dates, **columns}, copy=False)
+    return frame, ChartData(frame)
+
+
+@instrumented()
+def plot_cumulative_return(result, width=DEFAULT_WIDTH, x_range=None):
+    """Per-bar equity curve of a performance.BacktestResult."""
+    frame, data = _curves(result.dates, equity=result.equity)
     fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=trades_df["exit_time"],
-        y=trades_df["cumulative_pnl"],
-        mode='lines+markers',
-        name="Cumulative Return",
-        line=dict(color='green')
-    ))
+    _line(fig, data, 'equity', width, x_range, mode='lines', name="Cumulative Return", line=dict(color='green'))
     fig.update_layout(title="📈 Cumulative Return Over Time", xaxis_title="Date", yaxis_title="Equity")
     return fig
 
 
-def plot_drawdown(trades_df, initial_balance=10000):
-    equity_curve = trades_df["pnl"].cumsum() + initial_balance
-    rolling_max = equity_curve.cummax()
-    drawdown = (equity_curve - rolling_max) / rolling_max * 100
-
+@instrumented()
+def plot_drawdown(result, width=DEFAULT_WIDTH, x_range=None):
+    """Per-bar drawdown (%) of a performance.BacktestResult."""
+    frame, data = _curves(result.dates, drawdown=result.drawdown * 100)
     fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=trades_df["exit_time"],
-        y=drawdown,
-        mode='lines',
-        name="Drawdown",
-        line=dict(color='red')
-    ))
+    _line(fig, data, 'drawdown', width, x_range, mode='lines', name="Drawdown", line=dict(color='red'))
     fig.update_layout(title="📉 Drawdown Chart", xaxis_title="Date", yaxis_title="Drawdown (%)")
     return fig
 
+
+@instrumented()
+def plot_strategy_equity(comparison, width=DEFAULT_WIDTH, strategies=None, x_range=None):
+    """Overlaid equity curves of a compare.StrategyComparison (default: the strategies that traded)."""
+    metrics = comparison.metrics
+    shown = [
+        (name, comparison.equity[i]) for i, name in enumerate(metrics.index)
+        if ((name in strategies) if strategies is not None else metrics["num_trades"].iloc[i] > 0)
+    ]
+    frame, data = _curves(comparison.dates, **dict(shown))
+    fig = go.Figure()
+    for name, _ in shown:
+        _line(fig, data, name, width, x_range, mode='lines', name=name)
+    fig.update_layout(title="📈 Equity by Strategy", xaxis_title="Date", yaxis_title="Equity")
+    return fig
+
+
+@instrumented()
+def plot_win_rate(trades_df):
+    if trades_df.empty or "pnl" not in trades_df.columns:
+        return None
+    wins = trades_df[trades_df["pnl"] > 0].shape[0]
+    losses = trades_df[trades_df["pnl"] <= 0].shape[0]
+
+    # Avoid plot with no data
+    if wins + losses == 0:
+        return None
+
+    fig = go.Figure(go.Pie(values=[wins, losses], labels=["Wins", "Losses"]))
+    fig.update_layout(title="🏆 Win vs Loss Distribution")
+    return fig
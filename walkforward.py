@@ -0,0 +1,211 @@
+"""
+Walk-forward backtesting over rolling train/test windows.
+
+History is split into consecutive windows; on each one the parameter
+combination x strategy with the best train-window score is picked and then
+scored on the test window that follows it. Test windows don't overlap, so the
+out-of-sample record counts every bar once.
+
+Each window is traded on its own: only trades whose buy and sell signals both
+fall inside the window count, so a position still open at the window's end is
+dropped rather than carried into the next one.
+
+Indicators only look backwards, so each parameter combination is computed
+once over the whole history and every window reads a slice of it (indicator
+values inside a window are warmed up on the bars before it instead of
+restarting cold). Signals are evaluated once per combination as well, and a
+window only has to match the buy/sell positions that fall inside it. Total
+work is O(combinations x bars) for indicators and signals plus
+O(trades per window) per window, instead of recomputing everything for every
+window. Combinations are spread over a process pool sharing the OHLCV arrays
+(see optimizer.py).
+
+Example:
+    python walkforward.py --csv btc.csv --train 365 --test 90 \\
+        --grid '{"EMA": {"length": [10, 20, 50]}, "RSI": {"length": [9, 14]}}'
+"""
+import argparse
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from optimizer import expand_grid, init_worker, share_frame, worker_cache, worker_frame
+from performance import backtest_metrics, equity_curve, match_trades, periods_per_year
+from signals import BUY, SELL, STRATEGY_NAMES, generate_signal_matrix
+from strategies import apply_selected_indicators
+
+WalkForwardResult = namedtuple("WalkForwardResult", ["windows", "out_of_sample"])
+
+
+def make_windows(n_bars, train_size, test_size, step=None, anchored=False):
+    """
+    (train_lo, train_hi, test_lo, test_hi) bar positions, half-open, for every
+    full window that fits in `n_bars`. Windows advance by `step` bars
+    (default `test_size`, at least `test_size` so test windows don't overlap);
+    with anchored=True the train window always starts at bar 0 and grows.
+    """
+    if train_size <= 0 or test_size <= 0:
+        raise ValueError("❌ train_size and test_size must be positive.")
+    step = step or test_size
+    if step < test_size:
+        raise ValueError(f"❌ step ({step}) must be at least test_size ({test_size}) so test windows don't overlap.")
+
+    windows = []
+    train_lo = 0
+    while True:
+        train_hi = train_lo + train_size
+        test_hi = train_hi + test_size
+        if test_hi > n_bars:
+            break
+        windows.append((0 if anchored else train_lo, train_hi, train_hi, test_hi))
+        train_lo += step
+    return windows
+
+
+def window_pnl(buy_pos, sell_pos, close, lo, hi, trade_size):
+    """
+    The trades calculate_pnl would make using only the signals in bars
+    [lo, hi), as (mark-to-market PnL of each bar in the window, PnL of each trade).
+    """
+    buys = buy_pos[np.searchsorted(buy_pos, lo):np.searchsorted(buy_pos, hi)]
+    sells = sell_pos[np.searchsorted(sell_pos, lo):np.searchsorted(sell_pos, hi)]
+    entry, exit_ = match_trades(buys, sells)
+    entry_price = close[entry]
+    exit_price = close[exit_]
+    qty = trade_size / entry_price
+    cumulative = equity_curve(close[lo:hi], entry - lo, exit_ - lo, qty, entry_price, exit_price, 0.0)
+    return np.diff(cumulative, prepend=0.0), (exit_price - entry_price) * qty
+
+
+def _window_metrics(window, initial_balance, bars_per_year):
+    """BacktestResult's metrics for a window_pnl result (or several strung together)."""
+    bar_pnl, pnl = window
+    return backtest_metrics(initial_balance + np.cumsum(bar_pnl), pnl, initial_balance, bars_per_year)
+
+
+def score_windows(df, params, strategies, windows, initial_balance=10000, trade_size_pct=0.10, cache=None):
+    """
+    Apply one parameter combination over the full history and score every
+    window. Returns [(strategy, train metrics per window, test window_pnl per window)].
+    Sharpe is annualised with the bars per year of the whole history.
+    """
+    df = apply_selected_indicators(df, list(params), params, cache=cache)
+    matrix, names = generate_signal_matrix(df, strategies)
+    close = df["Close"].to_numpy(dtype=np.float64)
+    trade_size = trade_size_pct * initial_balance
+    bars_per_year = periods_per_year(df["Date"].to_numpy())
+
+    scored = []
+    for codes, strategy in zip(matrix, names):
+        buy_pos = np.flatnonzero(codes == BUY)
+        sell_pos = np.flatnonzero(codes == SELL)
+        train = [
+            _window_metrics(window_pnl(buy_pos, sell_pos, close, lo, hi, trade_size), initial_balance, bars_per_year)
+            for lo, hi, _, _ in windows
+        ]
+        test = [window_pnl(buy_pos, sell_pos, close, lo, hi, trade_size) for _, _, lo, hi in windows]
+        scored.append((strategy, train, test))
+    return scored
+
+
+def _run_task(task):
+    params, strategies, windows, initial_balance, trade_size_pct = task
+    return score_windows(worker_frame("data"), params, strategies, windows, initial_balance, trade_size_pct,
+                         cache=worker_cache())
+
+
+def walk_forward(df, param_grid, train_size, test_size, step=None, anchored=False, strategies=None,
+                 rank_by="sharpe_ratio", max_workers=None, initial_balance=10000, trade_size_pct=0.10,
+                 cache_bytes=128 * 1024**2):
+    """
+    Walk-forward optimisation of `param_grid` (as in optimizer.run_sweep) over `df`.
+    Window sizes are in bars.
+
+    Returns WalkForwardResult(windows, out_of_sample):
+    - windows: one row per window with its dates, the chosen params/strategy,
+      the train score and the test metrics
+    - out_of_sample: metrics over all test windows strung together
+
+    Trades are matched within each window only (see the module docstring).
+    """
+    strategies = list(strategies or STRATEGY_NAMES)
+    windows = make_windows(len(df), train_size, test_size, step, anchored)
+    if not windows:
+        raise ValueError(f"❌ {len(df)} bars is too short for a {train_size}+{test_size} bar window.")
+    combos = expand_grid(param_grid)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    shm, n = share_frame(df)
+    try:
+        tasks = [(params, strategies, windows, initial_balance, trade_size_pct) for params in combos]
+        candidates = []
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker,
+                                 initargs=({"data": (shm.name, n)}, cache_bytes)) as executor:
+            for params, scored in zip(combos, executor.map(_run_task, tasks)):
+                for strategy, train, test in scored:
+                    candidates.append((json.dumps(params, sort_keys=True), strategy, train, test))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    dates = pd.to_datetime(df["Date"]).to_numpy()
+    bars_per_year = periods_per_year(dates)
+    rows = []
+    chosen = []
+    for w, (train_lo, train_hi, test_lo, test_hi) in enumerate(windows):
+        params, strategy, train, test = max(candidates, key=lambda c: c[2][w][rank_by])
+        chosen.append(test[w])
+        rows.append({
+            "window": w,
+            "train_start": dates[train_lo],
+            "train_end": dates[train_hi - 1],
+            "test_start": dates[test_lo],
+            "test_end": dates[test_hi - 1],
+            "params": params,
+            "strategy": strategy,
+            f"train_{rank_by}": train[w][rank_by],
+            **_window_metrics(test[w], initial_balance, bars_per_year),
+        })
+
+    out_of_sample = (np.concatenate([bar_pnl for bar_pnl, _ in chosen]), np.concatenate([pnl for _, pnl in chosen]))
+    return WalkForwardResult(pd.DataFrame(rows), _window_metrics(out_of_sample, initial_balance, bars_per_year))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Walk-forward optimisation over rolling train/test windows.")
+    parser.add_argument("--csv", required=True, help="OHLCV CSV file")
+    parser.add_argument("--grid", required=True, help="Parameter grid as JSON, or a path to a JSON file")
+    parser.add_argument("--train", type=int, required=True, help="Train window length in bars")
+    parser.add_argument("--test", type=int, required=True, help="Test window length in bars")
+    parser.add_argument("--step", type=int, default=None,
+                        help="Bars between windows, at least --test (default: --test)")
+    parser.add_argument("--anchored", action="store_true", help="Grow the train window from the first bar")
+    parser.add_argument("--strategies", nargs="*", default=None, help="Strategy names (default: all)")
+    parser.add_argument("--rank-by", default="sharpe_ratio", help="Train metric to pick parameters by")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--out", default=None, help="Write the per-window table to this CSV")
+    args = parser.parse_args(argv)
+
+    from utils import load_csv_data
+
+    grid = args.grid
+    if os.path.exists(grid):
+        with open(grid) as f:
+            grid = f.read()
+
+    result = walk_forward(
+        load_csv_data(args.csv), json.loads(grid), args.train, args.test, step=args.step,
+        anchored=args.anchored, strategies=args.strategies, rank_by=args.rank_by, max_workers=args.workers,
+    )
+    if args.out:
+        result.windows.to_csv(args.out, index=False)
+    print(result.windows.to_string(index=False))
+    print("Out of sample:", json.dumps(result.out_of_sample, indent=2))
+
+
+if __name__ == "__main__":
+    main()